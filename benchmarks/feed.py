@@ -0,0 +1,290 @@
+# benchmarks/feed.py
+"""
+Deterministic synthetic USGS catalog and a local stand-in for the FDSN feed.
+
+The catalog is generated from a seed, so the same size and seed always give
+the same quakes: magnitudes follow a Gutenberg-Richter distribution with
+b = 1, most depths are shallow with a deep tail, and epicentres cluster
+around a fixed set of towns so the city histogram has realistic counts.
+
+FeedServer answers the two URLs the app uses, relative to USGS_BASE_URL:
+    /query.geojson?starttime=...&endtime=...&orderby=time   (ingest, city histogram)
+    /query?format=geojson&starttime=...&limit=...           (closest quake)
+
+Usage:
+    python3 benchmarks/feed.py --size 100000 --port 8089
+    USGS_BASE_URL=http://localhost:8089/fdsnws/event/1 python3 src/api.py
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import threading
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, Optional
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+BASE_PATH = '/fdsnws/event/1'
+
+# Default catalog window: the month POST /data loads
+CATALOG_START = datetime(2025, 3, 1, tzinfo=timezone.utc)
+CATALOG_END = datetime(2025, 3, 31, 23, 59, 59, tzinfo=timezone.utc)
+
+NETWORKS = ['ci', 'nc', 'ak', 'us', 'hv', 'nn', 'uw', 'pr']
+MAG_TYPES = ['ml', 'md', 'mb', 'mww', 'mwr']
+DIRECTIONS = ['N', 'NNE', 'NE', 'ENE', 'E', 'ESE', 'SE', 'SSE',
+              'S', 'SSW', 'SW', 'WSW', 'W', 'WNW', 'NW', 'NNW']
+TOWN_COUNT = 60
+
+# Features rendered per write when streaming a large response
+RENDER_CHUNK = 5000
+
+
+class SyntheticCatalog:
+    """
+    Columns of a synthetic catalog, sorted by time ascending.
+    """
+
+    def __init__(self, size: int, seed: int = 332,
+                 start: datetime = CATALOG_START, end: datetime = CATALOG_END) -> None:
+        self.size = size
+        self.seed = seed
+        rng = np.random.default_rng(seed)
+
+        start_ms = int(start.timestamp() * 1000)
+        end_ms = int(end.timestamp() * 1000)
+        self.time = np.sort(rng.integers(start_ms, end_ms, size, endpoint=True))
+
+        # Gutenberg-Richter with b = 1 above magnitude -0.5
+        self.mag = np.round(-0.5 + rng.exponential(1 / np.log(10), size), 2)
+
+        deep = rng.random(size) < 0.05
+        self.depth = np.round(np.where(deep, rng.uniform(70, 650, size),
+                                       np.minimum(rng.gamma(2.0, 6.0, size), 70)), 2)
+
+        town_lon = rng.uniform(-170, 170, TOWN_COUNT)
+        town_lat = rng.uniform(-60, 65, TOWN_COUNT)
+        # a few towns see most of the activity
+        weights = rng.pareto(1.2, TOWN_COUNT) + 0.05
+        self.town = rng.choice(TOWN_COUNT, size, p=weights / weights.sum())
+        self.longitude = np.round(np.clip(town_lon[self.town] + rng.normal(0, 0.3, size), -180, 180), 4)
+        self.latitude = np.round(np.clip(town_lat[self.town] + rng.normal(0, 0.3, size), -85, 85), 4)
+
+        self.net = rng.integers(0, len(NETWORKS), size)
+        self.mag_type = rng.integers(0, len(MAG_TYPES), size)
+        self.distance = rng.integers(1, 80, size)
+        self.direction = rng.integers(0, len(DIRECTIONS), size)
+
+    def feature(self, i: int, time_offset_ms: int = 0) -> Dict:
+        """
+        Build the GeoJSON feature of quake i, shaped like a USGS feature.
+        """
+        net = NETWORKS[self.net[i]]
+        quake_id = f"{net}{self.seed % 100:02d}{i:08d}"
+        mag = float(self.mag[i])
+        time_ms = int(self.time[i]) + time_offset_ms
+        place = f"{self.distance[i]} km {DIRECTIONS[self.direction[i]]} of Town{self.town[i]:02d}, Region{self.town[i] % 12}"
+        return {
+            'type': 'Feature',
+            'properties': {
+                'mag': mag,
+                'place': place,
+                'time': time_ms,
+                'updated': time_ms + 600000,
+                'tz': None,
+                'url': f"https://earthquake.usgs.gov/earthquakes/eventpage/{quake_id}",
+                'detail': f"https://earthquake.usgs.gov/fdsnws/event/1/query?eventid={quake_id}&format=geojson",
+                'felt': None,
+                'cdi': None,
+                'mmi': None,
+                'alert': None,
+                'status': 'reviewed',
+                'tsunami': 0,
+                'sig': max(int(mag * 100 * abs(mag) / 6.5), 0),
+                'net': net,
+                'code': quake_id[len(net):],
+                'ids': f",{quake_id},",
+                'sources': f",{net},",
+                'types': ',origin,phase-data,',
+                'nst': int(self.distance[i]) % 40 + 4,
+                'dmin': round(float(self.distance[i]) / 111, 4),
+                'rms': 0.17,
+                'gap': 92,
+                'magType': MAG_TYPES[self.mag_type[i]],
+                'type': 'earthquake',
+                'title': f"M {mag:.1f} - {place}",
+            },
+            'geometry': {
+                'type': 'Point',
+                'coordinates': [float(self.longitude[i]), float(self.latitude[i]), float(self.depth[i])],
+            },
+            'id': quake_id,
+        }
+
+    def features(self, indexes, time_offset_ms: int = 0) -> Iterator[Dict]:
+        for i in indexes:
+            yield self.feature(int(i), time_offset_ms)
+
+    def select(self, start_ms: Optional[int] = None, end_ms: Optional[int] = None,
+               limit: Optional[int] = None, newest_first: bool = True):
+        """
+        Return (indexes, time_offset_ms) of the quakes inside a time window.
+
+        A window that starts after the catalog ends, such as "the last 7 days",
+        replays the newest quakes shifted to end at the window end, so callers
+        that ask for recent quakes still get data.
+        """
+        offset = 0
+        last_ms = int(self.time[-1]) if self.size else 0
+        if start_ms is not None and start_ms > last_ms:
+            window_end = end_ms if end_ms is not None else int(datetime.now(timezone.utc).timestamp() * 1000)
+            offset = window_end - last_ms
+        lo = 0 if start_ms is None else int(np.searchsorted(self.time + offset, start_ms, side='left'))
+        hi = self.size if end_ms is None else int(np.searchsorted(self.time + offset, end_ms, side='right'))
+        indexes = np.arange(lo, hi)
+        if newest_first:
+            indexes = indexes[::-1]
+        if limit is not None:
+            indexes = indexes[:limit]
+        return indexes, offset
+
+    def write_geojson(self, out, indexes, time_offset_ms: int = 0) -> None:
+        """
+        Write a FeatureCollection to a binary file object, a chunk at a time.
+        """
+        out.write(b'{"type":"FeatureCollection","metadata":{"generated":0,"title":"Synthetic feed",'
+                  + f'"count":{len(indexes)}'.encode() + b'},"features":[')
+        for offset in range(0, len(indexes), RENDER_CHUNK):
+            chunk = indexes[offset:offset + RENDER_CHUNK]
+            body = ','.join(json.dumps(f, separators=(',', ':')) for f in self.features(chunk, time_offset_ms))
+            out.write((',' if offset else '').encode() + body.encode())
+        out.write(b']}')
+
+
+def _parse_time(value: Optional[str]) -> Optional[int]:
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value.replace('Z', ''))
+    if parsed.tzinfo is None:
+        # the FDSN service reads naive times as UTC
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return int(parsed.timestamp() * 1000)
+
+
+class FeedServer:
+    """
+    Serve a SyntheticCatalog over HTTP on a background thread.
+
+    Unfiltered requests for the full catalog are rendered once to a temporary
+    file and then streamed from disk, so large catalogs cost little CPU per
+    request.
+    """
+
+    def __init__(self, catalog: SyntheticCatalog, host: str = '127.0.0.1', port: int = 0) -> None:
+        self.catalog = catalog
+        self._cache_dir = tempfile.mkdtemp(prefix='quake-feed-')
+        self._cache: Dict = {}
+        self._cache_lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server._handle(self)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}{BASE_PATH}"
+
+    def start(self) -> 'FeedServer':
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        shutil.rmtree(self._cache_dir, ignore_errors=True)
+
+    def set_catalog(self, catalog: SyntheticCatalog) -> None:
+        """
+        Serve a different catalog, rendering its full feed up front.
+        """
+        with self._cache_lock:
+            self.catalog = catalog
+            self._cache.clear()
+        if catalog.size > RENDER_CHUNK:
+            indexes, offset = catalog.select()
+            self._rendered((catalog.size, catalog.seed), indexes, offset)
+
+    def _rendered(self, key, indexes, offset) -> str:
+        with self._cache_lock:
+            path = self._cache.get(key)
+            if path is None:
+                path = os.path.join(self._cache_dir, f"{len(self._cache)}.geojson")
+                with open(path, 'wb') as f:
+                    self.catalog.write_geojson(f, indexes, offset)
+                self._cache[key] = path
+            return path
+
+    def _handle(self, handler: BaseHTTPRequestHandler) -> None:
+        url = urlparse(handler.path)
+        if url.path not in (f"{BASE_PATH}/query.geojson", f"{BASE_PATH}/query"):
+            handler.send_error(404)
+            return
+        args = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        try:
+            start_ms = _parse_time(args.get('starttime'))
+            end_ms = _parse_time(args.get('endtime'))
+            limit = int(args['limit']) if 'limit' in args else None
+        except ValueError as e:
+            handler.send_error(400, str(e))
+            return
+
+        catalog = self.catalog
+        indexes, offset = catalog.select(start_ms, end_ms, limit)
+
+        handler.send_response(200)
+        handler.send_header('Content-Type', 'application/json')
+        if offset == 0 and len(indexes) == catalog.size and catalog.size > RENDER_CHUNK:
+            path = self._rendered((catalog.size, catalog.seed), indexes, offset)
+            handler.send_header('Content-Length', str(os.path.getsize(path)))
+            handler.end_headers()
+            with open(path, 'rb') as f:
+                handler.wfile.flush()
+                handler.connection.sendfile(f)
+        else:
+            # no Content-Length: the HTTP/1.0 response ends when the connection closes
+            handler.end_headers()
+            catalog.write_geojson(handler.wfile, indexes, offset)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve a synthetic USGS earthquake feed.")
+    parser.add_argument('--size', type=int, default=10000, help="Quakes in the catalog")
+    parser.add_argument('--seed', type=int, default=332)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8089)
+    args = parser.parse_args()
+
+    feed = FeedServer(SyntheticCatalog(args.size, args.seed), args.host, args.port)
+    print(f"Serving {args.size} synthetic quakes at {feed.base_url}")
+    print(f"Run the app with USGS_BASE_URL={feed.base_url}")
+    try:
+        feed.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
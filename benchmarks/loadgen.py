@@ -0,0 +1,325 @@
+# benchmarks/loadgen.py
+"""
+Load generator for a running stack: a weighted mix of API traffic at a fixed
+concurrency or a target request rate, reported as latency percentiles.
+
+Scenarios:
+    quake   GET /quakes/<quake_id> for a random loaded quake
+    stats   GET /stats for a random day
+    quakes  GET /quakes?limit=100
+    job     POST /jobs for a one-day magnitude histogram, then poll
+            GET /jobs/<jobid> until it finishes. Latency is submit to finish;
+            queue wait is the job's started_at - submitted_at. A request
+            answered at once from a precomputed report (200, complete) is
+            a success counted under status 'precomputed', with no queue wait.
+
+Closed loop (--concurrency N): N clients each send their next request as soon
+as the previous one finishes. Open loop (--rps R): requests are scheduled at
+R per second whether or not earlier ones finished, and latency is measured
+from the scheduled time, so a stalled server shows up as latency instead of
+silently lowering the request rate.
+
+Usage:
+    python3 benchmarks/loadgen.py --url http://localhost:5000 --concurrency 16 --duration 60
+    python3 benchmarks/loadgen.py --rps 200 --mix quake=70,stats=20,job=10 --json run.json
+
+The stack must have data loaded (POST /data).
+"""
+import argparse
+import json
+import queue
+import random
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import date, timedelta
+from typing import Dict, List, Optional
+
+import requests
+
+FINAL_STATUSES = ('complete', 'failed', 'cancelled', 'timed_out')
+
+SCENARIOS = ('quake', 'quakes', 'stats', 'job')
+
+DEFAULT_MIX = 'quake=70,stats=20,job=10'
+
+
+def parse_mix(text: str) -> Dict[str, float]:
+    """
+    Parse 'quake=70,stats=20,job=10' into normalized weights.
+    """
+    weights = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        if name not in SCENARIOS:
+            raise argparse.ArgumentTypeError(f"unknown scenario '{name}', choose from {', '.join(SCENARIOS)}")
+        weights[name] = float(weight or 1)
+    total = sum(weights.values())
+    return {name: weight / total for name, weight in weights.items()}
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """
+    Nearest-rank percentile of an already sorted list.
+    """
+    if not sorted_values:
+        return 0.0
+    rank = max(int(round(pct / 100 * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+class Recorder:
+    """
+    Thread-safe latency and error counts per scenario.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.queue_waits: List[float] = []
+        self.statuses: Dict[str, Counter] = defaultdict(Counter)
+        self.errors: Dict[str, int] = Counter()
+
+    def record(self, scenario: str, latency_ms: float, status, ok: bool,
+               queue_wait_ms: Optional[float] = None) -> None:
+        with self._lock:
+            self.latencies[scenario].append(latency_ms)
+            self.statuses[scenario][str(status)] += 1
+            if not ok:
+                self.errors[scenario] += 1
+            if queue_wait_ms is not None:
+                self.queue_waits.append(queue_wait_ms)
+
+    def report(self, elapsed_s: float) -> Dict:
+        def summary(values: List[float]) -> Dict[str, float]:
+            values = sorted(values)
+            return {
+                'p50_ms': round(percentile(values, 50), 1),
+                'p95_ms': round(percentile(values, 95), 1),
+                'p99_ms': round(percentile(values, 99), 1),
+                'max_ms': round(values[-1], 1) if values else 0.0,
+            }
+
+        with self._lock:
+            scenarios = {}
+            for name, values in self.latencies.items():
+                scenarios[name] = {
+                    'requests': len(values),
+                    'rps': round(len(values) / elapsed_s, 1),
+                    'error_rate': round(self.errors[name] / len(values), 4),
+                    'statuses': dict(self.statuses[name]),
+                    **summary(values),
+                }
+            everything = [v for values in self.latencies.values() for v in values]
+            total_errors = sum(self.errors.values())
+            return {
+                'elapsed_s': round(elapsed_s, 1),
+                'requests': len(everything),
+                'rps': round(len(everything) / elapsed_s, 1),
+                'error_rate': round(total_errors / len(everything), 4) if everything else 0.0,
+                **summary(everything),
+                'scenarios': scenarios,
+                'queue_wait': {'jobs': len(self.queue_waits), **summary(self.queue_waits)},
+            }
+
+
+class Client:
+    """
+    Runs scenarios against the API. One instance per thread.
+    """
+
+    def __init__(self, base_url: str, quake_ids: List[str], days: List[str], args) -> None:
+        self.base_url = base_url.rstrip('/')
+        self.session = requests.Session()
+        self.quake_ids = quake_ids
+        self.days = days
+        self.args = args
+        self.rnd = random.Random()
+
+    def quake(self):
+        response = self.session.get(f"{self.base_url}/quakes/{self.rnd.choice(self.quake_ids)}", timeout=self.args.timeout)
+        return response.status_code, response.ok, None
+
+    def quakes(self):
+        response = self.session.get(f"{self.base_url}/quakes", params={'limit': 100}, timeout=self.args.timeout)
+        return response.status_code, response.ok, None
+
+    def stats(self):
+        day = self.rnd.choice(self.days)
+        response = self.session.get(f"{self.base_url}/stats", params={'start': day, 'end': day}, timeout=self.args.timeout)
+        return response.status_code, response.ok, None
+
+    def job(self):
+        day = self.rnd.choice(self.days)
+        response = self.session.post(f"{self.base_url}/jobs", timeout=self.args.timeout, json={
+            'start_date': day, 'end_date': day, 'job_type': self.args.job_type, 'priority': self.args.priority})
+        if response.status_code == 200 and response.json().get('status') == 'complete':
+            # served from a precomputed report, never queued
+            return 'precomputed', True, None
+        if response.status_code != 202:
+            return response.status_code, False, None
+
+        jobid = response.json()['id']
+        deadline = time.monotonic() + self.args.job_timeout
+        while time.monotonic() < deadline:
+            time.sleep(self.args.poll_interval)
+            job = self.session.get(f"{self.base_url}/jobs/{jobid}", timeout=self.args.timeout).json()
+            if job.get('status') in FINAL_STATUSES:
+                wait = None
+                if job.get('started_at') and job.get('submitted_at'):
+                    wait = (job['started_at'] - job['submitted_at']) * 1000
+                return job['status'], job['status'] == 'complete', wait
+        return 'poll_timeout', False, None
+
+    def run(self, scenario: str, recorder: Recorder, started: float) -> None:
+        try:
+            status, ok, wait = getattr(self, scenario)()
+        except requests.RequestException as e:
+            status, ok, wait = type(e).__name__, False, None
+        recorder.record(scenario, (time.perf_counter() - started) * 1000, status, ok, wait)
+
+
+def _discover(base_url: str, args) -> List[str]:
+    response = requests.get(f"{base_url.rstrip('/')}/quakes", params={'limit': args.sample_ids}, timeout=args.timeout)
+    response.raise_for_status()
+    quake_ids = response.json()
+    if not quake_ids:
+        sys.exit("No quakes loaded; run POST /data first.")
+    return quake_ids
+
+
+def _choose(rnd: random.Random, mix: Dict[str, float]) -> str:
+    return rnd.choices(list(mix), weights=list(mix.values()))[0]
+
+
+def run_closed(args, mix, make_client, recorder_for) -> None:
+    stop_at = time.perf_counter() + args.warmup + args.duration
+
+    def loop():
+        client = make_client()
+        while True:
+            started = time.perf_counter()
+            if started >= stop_at:
+                return
+            client.run(_choose(client.rnd, mix), recorder_for(started), started)
+
+    threads = [threading.Thread(target=loop, daemon=True) for _ in range(args.concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def run_open(args, mix, make_client, recorder_for) -> None:
+    scheduled: queue.Queue = queue.Queue()
+    rnd = random.Random(args.seed)
+
+    def loop():
+        client = make_client()
+        while True:
+            item = scheduled.get()
+            if item is None:
+                return
+            due, scenario = item
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            client.run(scenario, recorder_for(due), due)
+
+    threads = [threading.Thread(target=loop, daemon=True) for _ in range(args.max_workers)]
+    for thread in threads:
+        thread.start()
+
+    due = time.perf_counter()
+    stop_at = due + args.warmup + args.duration
+    while due < stop_at:
+        scheduled.put((due, _choose(rnd, mix)))
+        due += rnd.expovariate(args.rps) if args.poisson else 1 / args.rps
+        # stay a little ahead of the schedule without queueing the whole run
+        ahead = due - time.perf_counter() - 0.5
+        if ahead > 0:
+            time.sleep(ahead)
+    for _ in threads:
+        scheduled.put(None)
+    for thread in threads:
+        thread.join()
+
+
+def _print_report(report: Dict) -> None:
+    print(f"\n{report['requests']} requests in {report['elapsed_s']}s ({report['rps']} req/s), "
+          f"error rate {report['error_rate']:.2%}")
+    print(f"{'scenario':<10}{'requests':>10}{'req/s':>9}{'errors':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}  statuses")
+    rows = list(report['scenarios'].items()) + [('all', report)]
+    for name, s in rows:
+        statuses = ' '.join(f"{code}:{count}" for code, count in sorted(s.get('statuses', {}).items()))
+        print(f"{name:<10}{s['requests']:>10}{s['rps']:>9}{s['error_rate']:>9.2%}"
+              f"{s['p50_ms']:>10}{s['p95_ms']:>10}{s['p99_ms']:>10}{s['max_ms']:>10}  {statuses}")
+    wait = report['queue_wait']
+    if wait['jobs']:
+        print(f"job queue wait ({wait['jobs']} jobs): p50 {wait['p50_ms']} ms, "
+              f"p95 {wait['p95_ms']} ms, p99 {wait['p99_ms']} ms, max {wait['max_ms']} ms")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Replay a mix of API traffic and report latency percentiles.")
+    parser.add_argument('--url', default='http://localhost:5000')
+    load = parser.add_mutually_exclusive_group()
+    load.add_argument('--concurrency', type=int, default=8, help="Closed loop: number of concurrent clients")
+    load.add_argument('--rps', type=float, help="Open loop: target requests per second")
+    parser.add_argument('--poisson', action='store_true', help="Open loop: exponential inter-arrival times")
+    parser.add_argument('--max-workers', type=int, default=64, help="Open loop: threads available for requests in flight")
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix(DEFAULT_MIX))
+    parser.add_argument('--duration', type=float, default=30, help="Seconds measured")
+    parser.add_argument('--warmup', type=float, default=5, help="Seconds run before measuring")
+    parser.add_argument('--days', default='2025-03-01:2025-03-31', help="Date range for stats and jobs, FIRST:LAST")
+    parser.add_argument('--job-type', default='magnitude_distribution')
+    parser.add_argument('--priority', default='interactive', help="Priority lane of submitted jobs")
+    parser.add_argument('--poll-interval', type=float, default=0.25)
+    parser.add_argument('--job-timeout', type=float, default=120)
+    parser.add_argument('--timeout', type=float, default=30, help="Per-request timeout in seconds")
+    parser.add_argument('--sample-ids', type=int, default=1000, help="Quake IDs fetched for the quake scenario")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', help="Write the report to this file")
+    args = parser.parse_args()
+
+    first, _, last = args.days.partition(':')
+    first_day, last_day = date.fromisoformat(first), date.fromisoformat(last or first)
+    days = [(first_day + timedelta(days=n)).isoformat() for n in range((last_day - first_day).days + 1)]
+    quake_ids = _discover(args.url, args)
+
+    measured = Recorder()
+    warmup = Recorder()
+    measure_from = time.perf_counter() + args.warmup
+
+    def recorder_for(started: float) -> Recorder:
+        return measured if started >= measure_from else warmup
+
+    def make_client() -> Client:
+        return Client(args.url, quake_ids, days, args)
+
+    mode = f"{args.rps} req/s open loop" if args.rps else f"{args.concurrency} clients closed loop"
+    print(f"{args.url}: {mode}, mix {', '.join(f'{k}={v:.0%}' for k, v in args.mix.items())}, "
+          f"{args.warmup:.0f}s warmup + {args.duration:.0f}s")
+
+    if args.rps:
+        run_open(args, args.mix, make_client, recorder_for)
+    else:
+        run_closed(args, args.mix, make_client, recorder_for)
+
+    report = measured.report(args.duration)
+    report['config'] = {
+        'url': args.url, 'mode': 'open' if args.rps else 'closed',
+        'rps': args.rps, 'concurrency': None if args.rps else args.concurrency,
+        'mix': args.mix, 'duration_s': args.duration, 'job_type': args.job_type, 'priority': args.priority,
+    }
+    _print_report(report)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,124 @@
+# benchmarks/startup.py
+"""
+Measure cold-start import time and memory of the API and worker modules.
+
+Each run imports the module in a fresh interpreter, so nothing is cached
+between runs. Redis is not contacted: clients connect lazily.
+
+Usage:
+    python3 benchmarks/startup.py                     # print a table
+    python3 benchmarks/startup.py --runs 10 --json startup.json
+    python3 benchmarks/startup.py --max-ms api=600 --max-rss-mb api=80
+
+Exits with status 1 if any --max-ms / --max-rss-mb budget is exceeded.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+SRC_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+MODULES = ['api', 'worker']
+
+# Prints the heavy modules that ended up loaded, for the report
+PROBE = (
+    "import sys, json; import {module}; "
+    "print(json.dumps(sorted(m for m in ('matplotlib', 'numpy', 'geopy', 'PIL') if m in sys.modules)))"
+)
+
+
+def measure(module: str) -> Dict:
+    """
+    Import a module once in a child interpreter.
+
+    Returns:
+        dict: wall time in ms, peak RSS in MB and heavy modules loaded.
+    """
+    env = dict(os.environ, PYTHONPATH=SRC_DIR, LOG_LEVEL='WARNING')
+    started = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, '-c', PROBE.format(module=module)],
+        cwd=SRC_DIR, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+    )
+    # wait4 gives this child's own resource usage, not the sum of all children
+    _, status, usage = os.wait4(proc.pid, 0)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    stdout = proc.stdout.read().decode()
+    stderr = proc.stderr.read().decode()
+    proc.stdout.close()
+    proc.stderr.close()
+    proc.returncode = os.waitstatus_to_exitcode(status)
+
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{stderr}")
+
+    return {
+        'ms': elapsed_ms,
+        'rss_mb': usage.ru_maxrss / 1024,  # kilobytes on Linux
+        'heavy_modules': json.loads(stdout.strip().splitlines()[-1]),
+    }
+
+
+def summarize(samples: List[Dict]) -> Dict:
+    times = [s['ms'] for s in samples]
+    rss = [s['rss_mb'] for s in samples]
+    return {
+        'runs': len(samples),
+        'median_ms': round(statistics.median(times), 1),
+        'min_ms': round(min(times), 1),
+        'max_ms': round(max(times), 1),
+        'median_rss_mb': round(statistics.median(rss), 1),
+        'heavy_modules': samples[-1]['heavy_modules'],
+    }
+
+
+def _budgets(items: List[str]) -> Dict[str, float]:
+    budgets = {}
+    for item in items or []:
+        module, _, value = item.partition('=')
+        budgets[module] = float(value)
+    return budgets
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark API and worker cold start.")
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--modules', nargs='+', default=MODULES)
+    parser.add_argument('--json', help="Write results to this file")
+    parser.add_argument('--max-ms', nargs='+', metavar='MODULE=MS', help="Median import time budgets")
+    parser.add_argument('--max-rss-mb', nargs='+', metavar='MODULE=MB', help="Median RSS budgets")
+    args = parser.parse_args()
+
+    max_ms = _budgets(args.max_ms)
+    max_rss = _budgets(args.max_rss_mb)
+
+    results = {}
+    failed = False
+    print(f"{'module':<10}{'median ms':>12}{'min ms':>10}{'max ms':>10}{'RSS MB':>10}  heavy modules")
+    for module in args.modules:
+        summary = summarize([measure(module) for _ in range(args.runs)])
+        results[module] = summary
+        print(f"{module:<10}{summary['median_ms']:>12}{summary['min_ms']:>10}{summary['max_ms']:>10}"
+              f"{summary['median_rss_mb']:>10}  {', '.join(summary['heavy_modules']) or '-'}")
+
+        if module in max_ms and summary['median_ms'] > max_ms[module]:
+            print(f"  {module}: median {summary['median_ms']} ms exceeds budget {max_ms[module]} ms")
+            failed = True
+        if module in max_rss and summary['median_rss_mb'] > max_rss[module]:
+            print(f"  {module}: RSS {summary['median_rss_mb']} MB exceeds budget {max_rss[module]} MB")
+            failed = True
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
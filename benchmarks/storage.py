@@ -0,0 +1,138 @@
+# benchmarks/storage.py
+"""
+Memory saved versus CPU spent by each storage codec (see src/codec.py).
+
+Encodes per-quake documents from the synthetic catalog (see feed.py) with
+no compression, zlib, zstd, and zstd with a dictionary trained on a sample
+of them. Reports stored bytes, the compression ratio and the per-document
+encode and decode time. With a real Redis it also writes every variant and
+reports the change in Redis `used_memory`, which includes per-key overhead.
+
+Usage:
+    python3 benchmarks/storage.py --size 20000
+    python3 benchmarks/storage.py --size 100000 --json storage.json
+    python3 benchmarks/storage.py --fakeredis          # no Redis server; skips used_memory
+
+Like suite.py, it writes to the Redis at REDIS_HOST (default localhost),
+including a compression dictionary; use a scratch Redis.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Dict, List
+
+import redis
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.abspath(os.path.join(BENCH_DIR, '..', 'src')))
+
+from feed import SyntheticCatalog  # noqa: E402
+from suite import use_fakeredis  # noqa: E402
+
+# Keys are written in pipelines of this many documents
+BATCH = 1000
+
+
+def _used_memory(client) -> int:
+    return int(client.info('memory')['used_memory'])
+
+
+def measure(name: str, docs: List[str], encode, decode, client=None) -> Dict:
+    """
+    Encode and decode every document once and collect sizes and timings.
+    """
+    started = time.perf_counter()
+    encoded = [encode(doc) for doc in docs]
+    encode_s = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for blob in encoded:
+        decode(blob)
+    decode_s = time.perf_counter() - started
+
+    raw_bytes = sum(len(doc.encode('utf-8')) for doc in docs)
+    stored_bytes = sum(len(blob) for blob in encoded)
+    result = {
+        'stored_bytes': stored_bytes,
+        'ratio': round(raw_bytes / stored_bytes, 2),
+        'encode_us_per_doc': round(encode_s / len(docs) * 1e6, 2),
+        'decode_us_per_doc': round(decode_s / len(docs) * 1e6, 2),
+    }
+
+    if client is not None:
+        before = _used_memory(client)
+        keys = [f"bench:storage:{name}:{i}" for i in range(len(encoded))]
+        for offset in range(0, len(keys), BATCH):
+            pipe = client.pipeline(transaction=False)
+            for key, blob in zip(keys[offset:offset + BATCH], encoded[offset:offset + BATCH]):
+                pipe.set(key, blob)
+            pipe.execute()
+        result['redis_used_memory'] = _used_memory(client) - before
+        for offset in range(0, len(keys), BATCH):
+            client.delete(*keys[offset:offset + BATCH])
+    return result
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Compare storage codecs on synthetic quake documents.")
+    parser.add_argument('--size', type=int, default=20000, help="Documents to encode")
+    parser.add_argument('--seed', type=int, default=332)
+    parser.add_argument('--fakeredis', action='store_true', help="Use in-memory fakeredis instead of REDIS_HOST")
+    parser.add_argument('--json', help="Write results to this file")
+    args = parser.parse_args()
+
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    os.environ.setdefault('REDIS_HOST', 'localhost')
+    if args.fakeredis:
+        use_fakeredis()
+
+    import codec
+    from redis_client import rd_bin
+
+    catalog = SyntheticCatalog(args.size, args.seed)
+    docs = [json.dumps(feature) for feature in catalog.features(range(catalog.size))]
+    raw_bytes = sum(len(doc.encode('utf-8')) for doc in docs)
+    client = None if args.fakeredis else rd_bin
+    if client is not None:
+        try:
+            _used_memory(client)
+        except redis.ResponseError:
+            print("This Redis does not report used_memory; skipping the Redis column.")
+            client = None
+
+    variants = {'none': ('none', None), 'zlib': ('zlib', None)}
+    if codec.zstandard is not None:
+        started = time.perf_counter()
+        dict_id = codec.train_dictionary(docs[:codec.DICT_SAMPLES])
+        train_s = time.perf_counter() - started
+        variants['zstd'] = ('zstd', None)
+        variants['zstd+dict'] = ('zstd', dict_id)
+    else:
+        print("zstandard is not installed; comparing zlib only.")
+
+    results = {'documents': args.size, 'raw_bytes': raw_bytes, 'codecs': {}}
+    print(f"{args.size} documents, {raw_bytes / 2**20:.1f} MB as JSON")
+    print(f"{'codec':<11}{'stored MB':>11}{'ratio':>8}{'encode us':>11}{'decode us':>11}{'Redis MB':>10}")
+    for name, (setting, dict_id) in variants.items():
+        codec.STORAGE_CODEC = setting
+        result = measure(name, docs, lambda doc: codec.encode(doc, dict_id), codec.decode, client)
+        results['codecs'][name] = result
+        redis_mb = f"{result['redis_used_memory'] / 2**20:.1f}" if 'redis_used_memory' in result else '-'
+        print(f"{name:<11}{result['stored_bytes'] / 2**20:>11.1f}{result['ratio']:>8}"
+              f"{result['encode_us_per_doc']:>11}{result['decode_us_per_doc']:>11}{redis_mb:>10}")
+
+    if codec.zstandard is not None:
+        results['dictionary_train_s'] = round(train_s, 2)
+        print(f"dictionary: {codec.DICT_SIZE // 1024} KB trained on "
+              f"{min(args.size, codec.DICT_SAMPLES)} documents in {train_s:.2f}s")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,251 @@
+# benchmarks/suite.py
+"""
+Offline performance suite: ingest, read endpoints and job throughput.
+
+A synthetic catalog (see feed.py) is served locally in place of USGS, so the
+results do not depend on the network or on what USGS returns today. The API
+runs in-process through Flask's test client and jobs run through the
+worker's handler, against the Redis at REDIS_HOST (default localhost) or an
+in-memory fakeredis.
+
+The suite deletes the earthquake data in the target Redis and must not share
+it with running workers, which would take its jobs. Point it at a scratch
+Redis, never at the cluster.
+
+Usage:
+    python3 benchmarks/suite.py                                # 1k and 100k quakes
+    python3 benchmarks/suite.py --sizes 1000 100000 1000000 --save baseline.json
+    python3 benchmarks/suite.py --compare baseline.json --tolerance 0.2
+    python3 benchmarks/suite.py --fakeredis --sizes 1000       # no Redis server
+
+Exits with status 1 if --compare finds a metric worse than the baseline by
+more than the tolerance.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List
+
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.abspath(os.path.join(BENCH_DIR, '..', 'src'))
+sys.path.insert(0, SRC_DIR)
+
+from feed import FeedServer, SyntheticCatalog  # noqa: E402
+
+DEFAULT_SIZES = [1000, 100000]
+
+# Job types timed for throughput, with the date range each job covers
+JOB_BENCHMARKS = {
+    'magnitude_distribution': 1,
+    'depth_histogram': 7,
+    'gutenberg_richter': 31,
+}
+
+
+def use_fakeredis() -> None:
+    """
+    Replace redis.Redis with fakeredis before any app module connects.
+    """
+    import fakeredis
+    import hotqueue
+    import redis
+
+    server = fakeredis.FakeServer()
+
+    class FakeRedis(fakeredis.FakeRedis):
+        def __init__(self, *args, connection_pool=None, **kwargs):
+            kwargs.pop('host', None)
+            kwargs.pop('port', None)
+            if connection_pool is not None:
+                kwargs['db'] = connection_pool.connection_kwargs.get('db', 0)
+                kwargs['decode_responses'] = connection_pool.connection_kwargs.get('decode_responses', False)
+            super().__init__(*args, server=server, **kwargs)
+
+    redis.Redis = redis.StrictRedis = hotqueue.Redis = FakeRedis
+
+
+def _latency(fn: Callable[[], None], repeat: int) -> Dict[str, float]:
+    """
+    Call fn `repeat` times after one warm-up call and return its latency percentiles.
+    """
+    fn()
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    p50, p95 = np.percentile(samples, [50, 95])
+    return {'p50_ms': round(float(p50), 2), 'p95_ms': round(float(p95), 2)}
+
+
+def _check(response, expected: int = 200) -> None:
+    if response.status_code != expected:
+        raise RuntimeError(f"{response.request.path} returned {response.status_code}: {response.get_data(as_text=True)[:200]}")
+
+
+def run_size(size: int, seed: int, repeat: int, job_count: int, feed: FeedServer) -> Dict[str, float]:
+    import worker
+    from api import app
+    from jobs import add_jobs
+    from redis_client import q, jdb, res
+
+    client = app.test_client()
+    catalog = SyntheticCatalog(size, seed)
+    feed.set_catalog(catalog)
+    metrics: Dict[str, float] = {}
+
+    _check(client.delete('/data'))
+    started = time.perf_counter()
+    _check(client.post('/data'))
+    elapsed = time.perf_counter() - started
+    metrics['ingest_s'] = round(elapsed, 3)
+    metrics['ingest_items_per_s'] = round(size / elapsed, 1)
+    print(f"  ingest: {size} quakes in {elapsed:.2f}s ({size / elapsed:,.0f}/s)")
+
+    rnd = random.Random(seed)
+    quake_ids = [catalog.feature(i)['id'] for i in rnd.sample(range(size), min(size, 200))]
+    days = [f"2025-03-{day:02d}" for day in range(1, 32)]
+
+    endpoints = {
+        'quake_by_id': lambda: _check(client.get(f"/quakes/{rnd.choice(quake_ids)}")),
+        'quakes_limit_100': lambda: _check(client.get('/quakes?limit=100')),
+        'stats_1d': lambda: _check(client.get('/stats?start={0}&end={0}'.format(rnd.choice(days)))),
+        'stats_7d': lambda: _check(client.get('/stats?start=2025-03-10&end=2025-03-16')),
+        'closest_quake': lambda: _check(client.get('/closest-earthquake', json={
+            'lat': rnd.uniform(-60, 60), 'lon': rnd.uniform(-170, 170)})),
+    }
+    for name, fn in endpoints.items():
+        result = _latency(fn, repeat)
+        metrics[f"{name}_p50_ms"] = result['p50_ms']
+        metrics[f"{name}_p95_ms"] = result['p95_ms']
+        print(f"  {name}: p50 {result['p50_ms']} ms, p95 {result['p95_ms']} ms")
+
+    for job_type, span_days in JOB_BENCHMARKS.items():
+        specs = []
+        for _ in range(job_count):
+            first = datetime(2025, 3, 1) + timedelta(days=rnd.randrange(0, 32 - span_days))
+            last = first + timedelta(days=span_days - 1)
+            specs.append({'start': first.strftime('%Y-%m-%d'), 'end': last.strftime('%Y-%m-%d'), 'type': job_type})
+        created = add_jobs(specs)
+
+        started = time.perf_counter()
+        for _ in created:
+            jid = q.get()
+            if jid is None:
+                # the rest were coalesced into an earlier job
+                break
+            worker.do_work(jid)
+        elapsed = time.perf_counter() - started
+
+        statuses = {json.loads(jdb.get(job['id']))['status'] for job in created}
+        if statuses != {'complete'}:
+            raise RuntimeError(f"{job_type} jobs ended as {statuses}")
+        jdb.delete(*(job['id'] for job in created))
+        res.delete(*(job['id'] for job in created))
+
+        metrics[f"job_{job_type}_per_s"] = round(job_count / elapsed, 2)
+        print(f"  job {job_type}: {job_count / elapsed:.2f} jobs/s")
+
+    return metrics
+
+
+def _metadata(backend: str) -> Dict[str, str]:
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BENCH_DIR,
+                                capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = 'unknown'
+    return {
+        'commit': commit,
+        'date': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+        'redis': backend,
+    }
+
+
+def compare(results: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """
+    Print each metric next to its baseline value and return the regressions.
+
+    Metrics ending in _per_s are better when higher; all others are times.
+    """
+    regressions = []
+    print(f"\nCompared with {baseline['meta'].get('commit')} ({baseline['meta'].get('date')}):")
+    for key in ('redis', 'cpus', 'python'):
+        if baseline['meta'].get(key) != results['meta'].get(key):
+            print(f"  note: baseline {key} was {baseline['meta'].get(key)}, now {results['meta'].get(key)}")
+    print(f"{'size':>9}  {'metric':<36}{'baseline':>12}{'now':>12}{'change':>9}")
+    for size, metrics in results['sizes'].items():
+        for name, value in metrics.items():
+            before = baseline['sizes'].get(size, {}).get(name)
+            if not before:
+                continue
+            change = value / before - 1
+            worse = -change if name.endswith('_per_s') else change
+            flag = '  REGRESSION' if worse > tolerance else ''
+            print(f"{size:>9}  {name:<36}{before:>12}{value:>12}{change:>+9.0%}{flag}")
+            if flag:
+                regressions.append(f"{size} {name}")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark ingest, endpoints and jobs on a synthetic catalog.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    parser.add_argument('--seed', type=int, default=332)
+    parser.add_argument('--repeat', type=int, default=20, help="Requests per endpoint")
+    parser.add_argument('--jobs', type=int, default=10, help="Jobs per job type")
+    parser.add_argument('--fakeredis', action='store_true', help="Use in-memory fakeredis instead of REDIS_HOST")
+    parser.add_argument('--save', help="Write results to this JSON baseline file")
+    parser.add_argument('--compare', help="Compare with a baseline file written by --save")
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help="Allowed relative slowdown before a metric counts as a regression")
+    args = parser.parse_args()
+
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    os.environ.setdefault('REDIS_HOST', 'localhost')
+    if args.fakeredis:
+        use_fakeredis()
+    backend = 'fakeredis' if args.fakeredis else f"{os.environ['REDIS_HOST']}:{os.environ.get('REDIS_PORT', 6379)}"
+
+    feed = FeedServer(SyntheticCatalog(0, args.seed)).start()
+    # read when the app modules are imported, so set it first
+    os.environ['USGS_BASE_URL'] = feed.base_url
+
+    from quake_cache import cache
+    cache.start()
+
+    results = {'meta': _metadata(backend), 'sizes': {}}
+    try:
+        for size in args.sizes:
+            print(f"{size} quakes ({backend}):")
+            results['sizes'][str(size)] = run_size(size, args.seed, args.repeat, args.jobs, feed)
+    finally:
+        feed.stop()
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nSaved results to {args.save}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.tolerance:.0%}: {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
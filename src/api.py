@@ -1,22 +1,41 @@
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, request, jsonify, Response, stream_with_context
 import requests
-import os
+import hashlib
 import json
-from jobs import add_job, get_job_by_id
-from redis_client import rd, jdb, res
-from utils import parse_earthquake, parse_date_range, calculate_stats, generate_magnitude_histogram_bytes
-from geopy.distance import geodesic
+import csv
+import io
+import random
+import zlib
+from jobs import (add_job, add_jobs, get_job_by_id, get_jobs_by_ids, cancel_job, lane_stats, check_params,
+                  QueueFullError, FINAL_STATUSES, PRIORITIES, DEFAULT_PRIORITY, JOB_PARAMS)
+from images import get_image, MIMETYPES, MIN_WIDTH, MAX_WIDTH
+from http_cache import conditional, not_modified, init_app as init_http_cache
+from profiling import init_app as init_profiling
+from request_stats import timed
+from redis_client import rd, rd_ro, rd_ro_bin, jdb, res, res_ro, pool_stats
+from precompute import schedule_precompute, find_report, clear_reports, PLAN_JOB_TYPE
+from codec import encode, decode, decode_text, document_encoder, DICT_SAMPLES
+from utils import parse_earthquake, index_earthquake, bump_dataset_version, get_dataset_version, parse_date_range, calculate_stats, LATEST_TILES_KEY, USGS_BASE_URL
 from datetime import datetime, timedelta
 from logger_config import get_logger
-import uuid
 
 
 logger = get_logger(__name__)
 
 app = Flask(__name__)
+# profiling first so its after_request hook runs last and times the others
+init_profiling(app)
+init_http_cache(app)
 
 # Data source
-USGS_URL = "https://earthquake.usgs.gov/fdsnws/event/1/query.geojson?starttime=2025-03-01%2000:00:00&endtime=2025-03-31%2023:59:59"
+USGS_URL = f"{USGS_BASE_URL}/query.geojson?starttime=2025-03-01%2000:00:00&endtime=2025-03-31%2023:59:59"
+
+# Number of quakes written per Redis pipeline round trip
+PIPELINE_CHUNK_SIZE = 1000
+
+# Number of quakes fetched per MGET when streaming an export
+EXPORT_CHUNK_SIZE = 1000
+EXPORT_CSV_FIELDS = ['id', 'time', 'mag', 'depth', 'longitude', 'latitude', 'mag_type', 'place']
 
 # Load data
 @app.route('/data', methods=['POST'])
@@ -34,25 +53,28 @@ def load_data():
         data = response.json().get('features', [])
         loaded_count = 0
 
+        # trains a compression dictionary on the first load
+        encoder = document_encoder(
+            lambda: [json.dumps(item) for item in random.sample(data, min(len(data), DICT_SAMPLES))])
+
+        # batch writes so a full month is a few hundred round trips, not ~70k
+        pipe = rd.pipeline(transaction=False)
         for item in data:
             parsed = parse_earthquake(item)
             if not parsed:
                 continue
-            
-            # a single quake's entire JSON data
-            rd.set(f"earthquake:{parsed['quake_id']}", json.dumps(item))
-
-            # index quake in set
-            rd.sadd('earthquakes:ids', parsed['quake_id'])
-            rd.zadd('earthquakes:by_mag', {parsed['quake_id']: parsed['mag']})
-            rd.zadd('earthquakes:by_depth', {parsed['quake_id']: parsed['depth']})
-            rd.zadd('earthquakes:by_time', {parsed['quake_id']: parsed['time']})
-            rd.geoadd('earthquakes:geo', (parsed['longitude'], parsed['latitude'], parsed['quake_id']))
 
+            index_earthquake(pipe, parsed, encoder.encode(json.dumps(item)))
             loaded_count += 1
 
+            if loaded_count % PIPELINE_CHUNK_SIZE == 0:
+                pipe.execute()
+        pipe.execute()
+
         # entire raw data in a single key
-        rd.set('earthquakes:raw_data', json.dumps(data))
+        rd.set('earthquakes:raw_data', encode(json.dumps(data)))
+        bump_dataset_version()
+        schedule_precompute()
 
         return jsonify({
             'message': f'Data loaded successfully: {loaded_count} items stored.'
@@ -64,15 +86,18 @@ def load_data():
 def delete_data():
     """
     Delete all earthquake-related data from Redis.
-    Keys starting with 'earthquakes:' are deleted.
+    Keys starting with 'earthquakes:' are deleted, along with the pointer to
+    the latest tile pyramid, which was built from that data.
     """
     try:
         keys = rd.keys('earthquake:*') + rd.keys('earthquakes:*')
 
         deleted_count = 0
         if keys:
-            rd.delete(*keys)
+            rd.delete(*keys, LATEST_TILES_KEY)
             deleted_count = len(keys)
+            bump_dataset_version()
+            clear_reports()
 
         return jsonify({
             'message': f'{deleted_count} keys deleted successfully.'
@@ -82,13 +107,14 @@ def delete_data():
         return jsonify({'error': str(e)}), 500
 
 @app.route('/quakes', methods=['GET'])
+@conditional(lambda **kwargs: get_dataset_version(rd_ro))
 def get_earthquake_ids():
     """
     Return a list of earthquake IDs stored in Redis.
     Optional query parameter `limit`.
     """
     try:
-        ids = rd.smembers('earthquakes:ids')
+        ids = rd_ro.smembers('earthquakes:ids')
         if not ids:
             logger.warning("No earthquake IDs found.")
             return jsonify({'message': 'No earthquake data available'}), 404
@@ -112,18 +138,117 @@ def get_earthquake_ids():
         logger.exception("Failed to fetch earthquake IDs")
         return jsonify({'error': str(e)}), 500
 
+def _export_rows(start_rank: int, end_rank: int, fmt: str):
+    """
+    Yield export text for quakes ranked start_rank..end_rank in earthquakes:by_time,
+    fetching one chunk of documents per MGET.
+    """
+    if fmt == 'csv':
+        buf = io.StringIO()
+        csv.writer(buf).writerow(EXPORT_CSV_FIELDS)
+        yield buf.getvalue()
+
+    for offset in range(start_rank, end_rank + 1, EXPORT_CHUNK_SIZE):
+        last = min(offset + EXPORT_CHUNK_SIZE - 1, end_rank)
+        quake_ids = rd_ro.zrange('earthquakes:by_time', offset, last)
+        if not quake_ids:
+            break
+        raw_docs = rd_ro_bin.mget([f"earthquake:{quake_id}" for quake_id in quake_ids])
+
+        if fmt == 'ndjson':
+            # stored documents are already serialized JSON, only decompress them
+            yield ''.join(f"{decode_text(raw)}\n" for raw in raw_docs if raw is not None)
+            continue
+
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        for raw in raw_docs:
+            if raw is None:
+                continue
+            item = json.loads(decode(raw))
+            parsed = parse_earthquake(item)
+            if not parsed:
+                continue
+            writer.writerow([
+                parsed['quake_id'], parsed['time'], parsed['mag'], parsed['depth'],
+                parsed['longitude'], parsed['latitude'], parsed['mag_type'],
+                item.get('properties', {}).get('place'),
+            ])
+        yield buf.getvalue()
+
+def _gzip_stream(chunks):
+    """
+    Gzip-compress a stream of text chunks on the fly.
+    """
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31 writes a gzip header
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+@app.route('/quakes/export', methods=['GET'])
+def export_quakes():
+    """
+    Stream every quake in a date range as NDJSON or CSV.
+
+    Query Parameters:
+        start (str, optional): Start date in 'YYYY-MM-DD' format. If not provided, uses earliest record.
+        end (str, optional): End date in 'YYYY-MM-DD' format. If not provided, uses latest record.
+        format (str, optional): 'ndjson' (default, one stored GeoJSON feature per line) or 'csv'.
+
+    The body is generated chunk by chunk, so memory use does not grow with the range,
+    and is gzip-encoded when the client accepts it.
+    """
+    fmt = request.args.get('format', 'ndjson')
+    if fmt not in ('ndjson', 'csv'):
+        return jsonify({'error': 'format must be ndjson or csv'}), 400
+
+    start_str = request.args.get('start')
+    end_str = request.args.get('end')
+    try:
+        if start_str and end_str:
+            start_ms, end_ms = parse_date_range(start_str, end_str)
+        elif start_str or end_str:
+            return jsonify({'error': 'Please specify both start and end, or neither.'}), 400
+        else:
+            start_ms, end_ms = '-inf', '+inf'
+    except ValueError:
+        return jsonify({'error': 'Invalid date format, expected YYYY-MM-DD.'}), 400
+
+    # translate the time range into ranks once, then page by rank
+    start_rank = rd_ro.zcount('earthquakes:by_time', '-inf', f'({start_ms}') if start_str else 0
+    count = rd_ro.zcount('earthquakes:by_time', start_ms, end_ms)
+    end_rank = start_rank + count - 1
+
+    chunks = _export_rows(start_rank, end_rank, fmt)
+    headers = {
+        'Content-Disposition': f'attachment; filename=quakes.{fmt}',
+        'X-Total-Count': str(count),
+        'Vary': 'Accept-Encoding',
+    }
+    if 'gzip' in request.accept_encodings:
+        chunks = _gzip_stream(chunks)
+        headers['Content-Encoding'] = 'gzip'
+
+    mimetype = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+    logger.info(f"Streaming export of {count} quakes as {fmt}.")
+    return Response(stream_with_context(chunks), mimetype=mimetype, headers=headers)
+
 @app.route('/quakes/<quake_id>', methods=['GET'])
+@conditional(lambda **kwargs: get_dataset_version(rd_ro))
 def get_quake_data(quake_id):
     """
     Retrieve earthquake data by quake_id from Redis.
     """
     try:
-        data = rd.get(f"earthquake:{quake_id}")
+        data = rd_ro_bin.get(f"earthquake:{quake_id}")
 
         if data is None:
             return jsonify({'error': f'Earthquake ID {quake_id} not found.'}), 404
 
-        quake_data = json.loads(data)
+        with timed('json'):
+            quake_data = json.loads(decode(data))
 
         return jsonify(quake_data), 200
 
@@ -131,6 +256,7 @@ def get_quake_data(quake_id):
         return jsonify({'error': str(e)}), 500
 
 @app.route('/stats', methods=['GET'])
+@conditional(lambda **kwargs: get_dataset_version(rd_ro))
 def get_stats():
     """
     Get earthquake statistics within a given date range.
@@ -159,8 +285,8 @@ def get_stats():
             start_ms, end_ms = parse_date_range(start_str, end_str)
         else:
             # fetch the earliest and latest scores from earthquakes:by_time in Redis
-            first = rd.zrange('earthquakes:by_time', 0, 0, withscores=True)
-            last = rd.zrevrange('earthquakes:by_time', 0, 0, withscores=True)
+            first = rd_ro.zrange('earthquakes:by_time', 0, 0, withscores=True)
+            last = rd_ro.zrevrange('earthquakes:by_time', 0, 0, withscores=True)
 
             if not first or not last:
                 return jsonify({'message': 'No earthquake data available.'}), 200
@@ -168,12 +294,12 @@ def get_stats():
             start_ms = int(first[0][1])
             end_ms = int(last[0][1])
 
-        quake_ids = rd.zrangebyscore('earthquakes:by_time', start_ms, end_ms)
+        quake_ids = rd_ro.zrangebyscore('earthquakes:by_time', start_ms, end_ms)
 
         if not quake_ids:
             return jsonify({'message': 'No earthquakes found in the given time range.'}), 200
 
-        stats = calculate_stats(quake_ids)
+        stats = calculate_stats(quake_ids, client=rd_ro_bin)
 
         return jsonify({
             'total_count': len(quake_ids),
@@ -202,13 +328,62 @@ def create_city_earthquake_histogram():
                 'job_type': 'earthquake_count_by_city'
             })
             job_result = response.get_json()
-        
+            retry_after = response.headers.get('Retry-After')
+
+        if response.status_code != 202:
+            # pass rejections such as a full queue through unchanged
+            headers = {'Retry-After': retry_after} if retry_after else {}
+            return jsonify(job_result), response.status_code, headers
         return jsonify(job_result), 200
 
     except KeyError:
         return jsonify({'error': 'Missing start_date or end_date'}), 400
 
 
+# Largest number of jobs accepted or looked up in one request
+MAX_BATCH_SIZE = 1000
+
+# Job types the app queues itself; clients may not submit them
+INTERNAL_JOB_TYPES = (PLAN_JOB_TYPE,)
+
+def _parse_job_spec(data, default_priority: str = DEFAULT_PRIORITY):
+    """
+    Validate one job submission body.
+
+    Returns:
+        tuple: (spec dict, None) when valid, or (None, error message).
+    """
+    if not isinstance(data, dict):
+        return None, "Each job must be a JSON object."
+
+    start_date = data.get('start_date')
+    end_date = data.get('end_date')
+    job_type = data.get('job_type', 'magnitude_distribution')
+
+    params = data.get('params')
+    priority = data.get('priority', default_priority)
+
+    if not start_date or not end_date:
+        return None, "Please specify start_date and end_date."
+
+    if job_type in INTERNAL_JOB_TYPES:
+        return None, f"job_type {job_type} cannot be submitted."
+
+    if job_type not in JOB_PARAMS:
+        return None, f"job_type must be one of: {', '.join(JOB_PARAMS)}."
+
+    if params is not None:
+        if not isinstance(params, dict):
+            return None, "params must be a JSON object."
+        error = check_params(job_type, params)
+        if error:
+            return None, error
+
+    if priority not in PRIORITIES:
+        return None, f"priority must be one of: {', '.join(PRIORITIES)}."
+
+    return {'start': start_date, 'end': end_date, 'type': job_type, 'params': params, 'priority': priority}, None
+
 @app.route('/jobs', methods=['POST'])
 def submit_job():
     """
@@ -218,22 +393,76 @@ def submit_job():
     if not data:
         return jsonify({"error": "Missing JSON body"}), 400
 
-    start_date = data.get('start_date')
-    end_date = data.get('end_date')
-    job_type = data.get('job_type', 'magnitude_distribution')
+    spec, error = _parse_job_spec(data)
+    if error:
+        return jsonify({"error": error}), 400
 
-    if not start_date or not end_date:
-        return jsonify({"error": "Please specify start_date and end_date."}), 400
+    if not spec['params']:
+        # standard reports may already be precomputed for the loaded data
+        report = find_report(spec['type'], spec['start'], spec['end'])
+        if report:
+            logger.info(f"Serving precomputed report {report['id']}.")
+            return jsonify(report), 200
 
-    job = add_job(start_date, end_date, job_type)
+    try:
+        job = add_job(spec['start'], spec['end'], spec['type'], params=spec['params'], priority=spec['priority'])
+    except QueueFullError as e:
+        return _queue_full_response(e)
     logger.info(f"New job submitted: {job['id']}")
     return jsonify(job), 202
 
+@app.route('/jobs/batch', methods=['POST'])
+def submit_jobs():
+    """
+    Submit many jobs in one request. The body is a JSON array of job specs,
+    each shaped like a POST /jobs body. Either all jobs are accepted or none.
+    Jobs without a priority go to the bulk lane.
+    """
+    data = request.get_json()
+    if not isinstance(data, list) or not data:
+        return jsonify({"error": "Body must be a non-empty JSON array of jobs."}), 400
+    if len(data) > MAX_BATCH_SIZE:
+        return jsonify({"error": f"At most {MAX_BATCH_SIZE} jobs per batch."}), 400
+
+    specs, errors = [], {}
+    for index, item in enumerate(data):
+        spec, error = _parse_job_spec(item, default_priority='bulk')
+        if error:
+            errors[index] = error
+        specs.append(spec)
+    if errors:
+        return jsonify({"error": "Invalid jobs in batch.", "jobs": errors}), 400
+
+    try:
+        jobs = add_jobs(specs)
+    except QueueFullError as e:
+        return _queue_full_response(e)
+    logger.info(f"Batch of {len(jobs)} jobs submitted.")
+    return jsonify(jobs), 202
+
+def _queue_full_response(e: QueueFullError):
+    """
+    429 response telling the client when to retry a rejected submission.
+    """
+    body = {"error": str(e), "priority": e.priority, "queue_depth": e.depth, "retry_after": e.retry_after}
+    return jsonify(body), 429, {'Retry-After': str(e.retry_after)}
+
 @app.route('/jobs', methods=['GET'])
 def list_jobs():
     """
     List all existing job IDs stored in Redis.
+
+    Query Parameters:
+        ids (str, optional): Comma-separated job IDs. When given, return those
+            jobs (null for unknown IDs) keyed by ID instead of listing IDs.
     """
+    ids_arg = request.args.get('ids')
+    if ids_arg is not None:
+        job_ids = [jid for jid in ids_arg.split(',') if jid]
+        if len(job_ids) > MAX_BATCH_SIZE:
+            return jsonify({"error": f"At most {MAX_BATCH_SIZE} ids per request."}), 400
+        return jsonify(get_jobs_by_ids(job_ids)), 200
+
     job_keys = jdb.keys()
     job_ids = [key.decode('utf-8') for key in job_keys]
     logger.info(f"Listed {len(job_ids)} jobs.")
@@ -254,31 +483,58 @@ def get_job(jobid: str):
     except json.JSONDecodeError:
         return jsonify({'error': f'Invalid JSON format for job {jobid}'}), 500
 
+@app.route('/jobs/<jobid>', methods=['DELETE'])
+def delete_job(jobid: str):
+    """
+    Cancel a job. Queued jobs are removed from the queue; running jobs are
+    interrupted by their worker shortly after.
+    """
+    job = get_job_by_id(jobid)
+    if job is None:
+        return jsonify({'error': f'Job {jobid} not found'}), 404
+    if job['status'] in FINAL_STATUSES:
+        return jsonify({'error': f"Job {jobid} already finished with status '{job['status']}'."}), 409
+    job = cancel_job(jobid)
+    logger.info(f"Cancellation requested for job {jobid}.")
+    return jsonify(job), 200
+
+def _result_version(jobid: str):
+    """
+    Results never change once stored, so their digest is their version.
+    """
+    etag = res_ro.hget(jobid, 'etag')
+    return etag.decode('utf-8') if etag else None
+
 @app.route('/results/<jobid>', methods=['GET'])
+@conditional(_result_version)
 def get_results(jobid: str):
     """
     Retrieve the JSON result of a job.
     """
-    if not res.exists(jobid):
+    if not res_ro.exists(jobid):
         return jsonify({"error": f"Result for job {jobid} not found."}), 404
 
-    raw_type = res.hget(jobid, 'type')
+    raw_type = res_ro.hget(jobid, 'type')
     result_type = raw_type.decode('utf-8')
 
     if result_type != 'json':
         return jsonify({"error": f"Job {jobid} is not a JSON result."}), 400
 
-    raw_content = res.hget(jobid, 'content')
-    try:
-        data = json.loads(raw_content.decode('utf-8'))
-        return jsonify(data), 200
-    except json.JSONDecodeError:
-        return jsonify({"error": "Stored JSON is invalid."}), 500
+    # stored content is already serialized JSON, only decompress it
+    raw_content = res_ro.hget(jobid, 'content')
+    return Response(decode(raw_content), mimetype='application/json'), 200
 
 @app.route('/download/<jobid>', methods=['GET'])
 def download_image(jobid: str):
     """
     Download the image result of a job.
+
+    Query Parameters:
+        format (str, optional): 'png' (default), 'webp' or 'svg'.
+        width (int, optional): Scale raster formats to this width in pixels.
+
+    The image is served from Redis memory with an ETag, and supports
+    conditional (If-None-Match) and Range requests.
     """
     if not res.exists(jobid):
         return jsonify({"error": f"Result for job {jobid} not found."}), 404
@@ -289,67 +545,171 @@ def download_image(jobid: str):
     if result_type != 'image':
         return jsonify({"error": f"Job {jobid} is not an image result."}), 400
 
-    content = res.hget(jobid, 'content')
-    if content is None:
-        return jsonify({"error": f"No image data for job {jobid}."}), 500
-
-    # create images dir in container if not exit
-    os.makedirs('/app/images', exist_ok=True)
-    # temp file path
-    path = f"/app/images/{jobid}.png"
+    fmt = request.args.get('format', 'png')
+    if fmt not in MIMETYPES:
+        return jsonify({"error": f"format must be one of {', '.join(MIMETYPES)}."}), 400
+
+    width = None
+    width_param = request.args.get('width')
+    if width_param is not None:
+        if fmt == 'svg':
+            return jsonify({"error": "width is not supported for svg."}), 400
+        try:
+            width = int(width_param)
+        except ValueError:
+            return jsonify({"error": "Invalid width parameter"}), 400
+        if not MIN_WIDTH <= width <= MAX_WIDTH:
+            return jsonify({"error": f"width must be between {MIN_WIDTH} and {MAX_WIDTH}."}), 400
 
     try:
-        with open(path, 'wb') as f:
-            f.write(content)
-        return send_file(path, mimetype='image/png', as_attachment=True)
-    
+        image = get_image(jobid, fmt, width)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
-        return jsonify({"error": f"Error writing image to file: {str(e)}"}), 500
+        return jsonify({"error": f"Error rendering image: {str(e)}"}), 500
+
+    if image is None:
+        return jsonify({"error": f"No image data for job {jobid}."}), 500
+
+    content, etag = image
+    # SVG is gzipped on the way out, which tags it "<etag>-gzip"
+    cached = not_modified(etag)
+    if cached is not None:
+        return cached
+
+    response = Response(content, mimetype=MIMETYPES[fmt])
+    response.headers['Content-Disposition'] = f'attachment; filename={jobid}.{fmt}'
+    response.set_etag(etag)
+    return response.make_conditional(request, accept_ranges=True, complete_length=len(content))
+
+def _tile_job():
+    """
+    Resolve the tile pyramid job to read: the `job` query parameter or the latest one.
+    """
+    jid = request.args.get('job')
+    if jid:
+        return jid
+    return rd_ro.get(LATEST_TILES_KEY)
+
+def _tile_version(z: int, x: int, y: int):
+    """
+    A pyramid never changes once stored, so its result digest versions every tile.
+    """
+    jid = _tile_job()
+    if not jid:
+        return None
+    etag = res_ro.hget(jid, 'etag')
+    return f"{jid}:{etag.decode('utf-8')}" if etag else None
+
+@app.route('/tiles/<int:z>/<int:x>/<int:y>', methods=['GET'])
+@conditional(_tile_version)
+def get_tile(z: int, x: int, y: int):
+    """
+    Return one tile of a tile pyramid job: quake count, max magnitude and heatmap cells.
+
+    Query Parameters:
+        job (str, optional): Tile pyramid job ID. Defaults to the latest completed pyramid.
+    """
+    jid = _tile_job()
+    if not jid:
+        return jsonify({"error": "No tile pyramid available. Submit a tile_pyramid job first."}), 404
+
+    if not (0 <= x < (1 << z) and 0 <= y < (1 << z)):
+        return jsonify({"error": f"Tile {z}/{x}/{y} is outside the map."}), 400
+
+    raw_tile, raw_content = res_ro.hmget(jid, [f'tile:{z}/{x}/{y}', 'content'])
+    if raw_content is None:
+        return jsonify({"error": f"Result for job {jid} not found."}), 404
+
+    if raw_tile is not None:
+        tile = json.loads(decode(raw_tile))
+    else:
+        summary = json.loads(decode(raw_content))
+        if 'min_zoom' not in summary:
+            return jsonify({"error": f"Job {jid} is not a tile pyramid."}), 400
+        if not summary['min_zoom'] <= z <= summary['max_zoom']:
+            return jsonify({"error": f"Zoom {z} is not in pyramid {jid} "
+                                     f"({summary['min_zoom']}-{summary['max_zoom']})."}), 404
+        # no quakes fell in this tile
+        tile = {'count': 0, 'max_mag': None, 'cells': []}
+
+    return jsonify({'job': jid, 'z': z, 'x': x, 'y': y, **tile}), 200
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """
+    Report Redis connection pool usage for this API process, and the depth
+    and queue wait of each job priority lane.
+    """
+    return jsonify({'redis_pools': pool_stats(), 'queues': lane_stats()}), 200
 
 #Help
+ROUTES_INFO = {
+    '/data': {
+        'methods': ['POST', 'DELETE'],
+        'description': 'Load earthquake data from a source and store it in Redis (POST), or delete all earthquake-related data from Redis (DELETE).'
+    },
+    '/quakes/export': {
+        'methods': ['GET'],
+        'description': 'Stream all quakes in a date range as NDJSON or CSV (format=ndjson|csv).'
+    },
+    '/quake/<quake_id>': {
+        'methods': ['GET'],
+        'description': 'Retrieve earthquake data by quake_id from Redis.'
+    },
+    '/stats': {
+        'methods': ['GET'],
+        'description': 'Get earthquake statistics within a given date range.'
+    },
+    '/jobs': {
+        'methods': ['POST', 'GET'],
+        'description': 'Submit a new job specifying start and end date, job_type, optional params and priority (POST), or list all existing job IDs (GET, or ids=<id>,<id> for those jobs).'
+    },
+    '/jobs/batch': {
+        'methods': ['POST'],
+        'description': 'Submit a JSON array of jobs in one request (priority defaults to bulk).'
+    },
+    '/jobs/<jobid>': {
+        'methods': ['GET', 'DELETE'],
+        'description': 'Get job details by job_id (GET), or cancel a queued or running job (DELETE).'
+    },
+    '/results/<jobid>': {
+        'methods': ['GET'],
+        'description': 'Retrieve the JSON result of a job.'
+    },
+    '/download/<jobid>': {
+        'methods': ['GET'],
+        'description': 'Download the image result of a job (format=png|webp|svg, width=<px>).'
+    },
+    '/tiles/<z>/<x>/<y>': {
+        'methods': ['GET'],
+        'description': 'Get one heatmap tile (count, max magnitude, cells) from a tile_pyramid job (job=<jobid>, default latest).'
+    },
+    '/metrics': {
+        'methods': ['GET'],
+        'description': 'Report Redis connection pool usage for the serving process and per-priority queue depth and wait times.'
+    }
+}
+
+# /help only changes when the route descriptions do
+HELP_VERSION = hashlib.sha1(json.dumps(ROUTES_INFO, sort_keys=True).encode('utf-8')).hexdigest()
+
 @app.route('/help', methods=['GET'])
+@conditional(lambda: HELP_VERSION)
 def help():
     """
     Returns a descriptions of the available routes in the API.
     """
-    routes_info = {
-        '/data': {
-            'methods': ['POST', 'DELETE'],
-            'description': 'Load earthquake data from a source and store it in Redis (POST), or delete all earthquake-related data from Redis (DELETE).'
-        },
-        '/quake/<quake_id>': {
-            'methods': ['GET'],
-            'description': 'Retrieve earthquake data by quake_id from Redis.'
-        },
-        '/stats': {
-            'methods': ['GET'],
-            'description': 'Get earthquake statistics within a given date range.'
-        },
-        '/jobs': {
-            'methods': ['POST', 'GET'],
-            'description': 'Submit a new job specifying start and end date (POST), or list all existing job IDs (GET).'
-        },
-        '/jobs/<jobid>': {
-            'methods': ['GET'],
-            'description': 'Get job details by job_id.'
-        },
-        '/results/<jobid>': {
-            'methods': ['GET'],
-            'description': 'Retrieve the JSON result of a job.'
-        },
-        '/download/<jobid>': {
-            'methods': ['GET'],
-            'description': 'Download the image result of a job.'
-        }
-    }
-
-    return jsonify(routes_info), 200
+    return jsonify(ROUTES_INFO), 200
 
 @app.route('/closest-earthquake', methods=['GET'])
 def closest_earthquake():
     """
     Returns information about the earthquake closest to the latitude and longitude specified. 
     """
+    # geopy is only needed here, so it is not loaded at API startup
+    from geopy.distance import geodesic
+
     try:
         data = request.get_json()
         if not data:
@@ -362,7 +722,7 @@ def closest_earthquake():
             return jsonify({"error": "Both latitude and longitude are required"}), 400
         
         # Query USGS API (limit to recent 1000 quakes)
-        usgs_url = 'https://earthquake.usgs.gov/fdsnws/event/1/query'
+        usgs_url = f'{USGS_BASE_URL}/query'
         date_a_week_ago = datetime.now() - timedelta(days=7)
         iso_date_a_week_ago = date_a_week_ago.isoformat()
         
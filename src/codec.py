@@ -0,0 +1,286 @@
+# src/codec.py
+"""
+Compression of stored documents and job results.
+
+Encoded values start with a NUL byte and a codec byte:
+    \\x00 s <zstd frame>
+    \\x00 d <4-byte dictionary id> <zstd frame compressed with that dictionary>
+    \\x00 z <zlib stream>
+Anything else is returned by `decode` unchanged. JSON, PNG, WebP and SVG
+never start with NUL, so values written before compression was enabled, or
+with STORAGE_CODEC=none, still read correctly.
+
+Per-quake GeoJSON documents are small and share most of their keys and
+phrasing, so they compress far better with a zstd dictionary trained on a
+sample of them. Dictionaries are stored in Redis under codec:dict:<id> and
+never change once written; codec:dict:current names the one new writes use.
+A dictionary's id is a hash of its bytes, so a dictionary trained after
+Redis is flushed never reuses the id of one a running process has cached.
+zstd is optional: without the `zstandard` package values are written with
+zlib, and dictionary-compressed values cannot be read.
+"""
+import hashlib
+import os
+import random
+import struct
+import sys
+import threading
+import zlib
+from typing import Callable, Dict, List, Optional, Union
+
+try:
+    import zstandard
+except ImportError:  # zstandard is optional, zlib is always available
+    zstandard = None
+
+from redis_client import rd_bin
+from logger_config import get_logger
+
+logger = get_logger(__name__)
+
+MARKER = b'\x00'
+ZSTD = b's'
+ZSTD_DICT = b'd'
+ZLIB = b'z'
+
+# 'auto' uses zstd when installed, else zlib; 'none' stores values as is
+STORAGE_CODEC = os.environ.get('STORAGE_CODEC', 'auto').lower()
+# Values shorter than this are stored as is
+STORAGE_COMPRESS_MIN_BYTES = int(os.environ.get('STORAGE_COMPRESS_MIN_BYTES', 128))
+ZSTD_LEVEL = int(os.environ.get('ZSTD_LEVEL', 3))
+ZLIB_LEVEL = int(os.environ.get('ZLIB_LEVEL', 6))
+
+# Dictionary training for per-quake documents
+DICT_SIZE = int(os.environ.get('ZSTD_DICT_SIZE', 32768))
+DICT_SAMPLES = 5000
+DICT_MIN_SAMPLES = 500
+
+DICT_KEY = 'codec:dict:{}'
+DICT_CURRENT_KEY = 'codec:dict:current'
+
+_DICT_ID = struct.Struct('>I')
+
+
+def _codec() -> str:
+    if STORAGE_CODEC == 'auto':
+        return 'zstd' if zstandard is not None else 'zlib'
+    if STORAGE_CODEC == 'zstd' and zstandard is None:
+        return 'zlib'
+    return STORAGE_CODEC
+
+
+# zstd (de)compressor objects must not be shared between threads
+_local = threading.local()
+_dicts: Dict[int, 'zstandard.ZstdCompressionDict'] = {}
+_dicts_lock = threading.Lock()
+
+
+def _compressor(dict_id: Optional[int] = None):
+    cache = _local.__dict__.setdefault('compressors', {})
+    if dict_id not in cache:
+        if dict_id is None:
+            cache[dict_id] = zstandard.ZstdCompressor(level=ZSTD_LEVEL)
+        else:
+            cache[dict_id] = zstandard.ZstdCompressor(level=ZSTD_LEVEL, dict_data=_dictionary(dict_id))
+    return cache[dict_id]
+
+
+def _decompressor(dict_id: Optional[int] = None):
+    cache = _local.__dict__.setdefault('decompressors', {})
+    if dict_id not in cache:
+        if dict_id is None:
+            cache[dict_id] = zstandard.ZstdDecompressor()
+        else:
+            cache[dict_id] = zstandard.ZstdDecompressor(dict_data=_dictionary(dict_id))
+    return cache[dict_id]
+
+
+def _content_id(raw: bytes) -> int:
+    """
+    Return the id of a dictionary: the first 4 bytes of a hash of its contents.
+    """
+    return _DICT_ID.unpack(hashlib.blake2b(raw, digest_size=_DICT_ID.size).digest())[0]
+
+def _dictionary(dict_id: int):
+    """
+    Return a stored dictionary, loading it from Redis on first use.
+    """
+    with _dicts_lock:
+        dictionary = _dicts.get(dict_id)
+        if dictionary is None:
+            raw = rd_bin.get(DICT_KEY.format(dict_id))
+            if raw is None:
+                raise ValueError(f"Compression dictionary {dict_id} not found.")
+            dictionary = zstandard.ZstdCompressionDict(raw)
+            dictionary.precompute_compress(level=ZSTD_LEVEL)
+            _dicts[dict_id] = dictionary
+        return dictionary
+
+
+def _as_bytes(data: Union[bytes, str]) -> bytes:
+    return data.encode('utf-8') if isinstance(data, str) else data
+
+
+def encode(data: Union[bytes, str], dict_id: Optional[int] = None) -> bytes:
+    """
+    Compress a value for storage.
+
+    Args:
+        data (bytes or str): Value to store; str is encoded as UTF-8.
+        dict_id (int, optional): zstd dictionary to compress with.
+
+    Returns:
+        bytes: Encoded value, or the original bytes when compression is
+            disabled, the value is small, or compressing does not shrink it.
+    """
+    raw = _as_bytes(data)
+    codec = _codec()
+    if codec == 'none' or len(raw) < STORAGE_COMPRESS_MIN_BYTES:
+        return raw
+
+    if codec == 'zstd':
+        if dict_id is not None:
+            encoded = MARKER + ZSTD_DICT + _DICT_ID.pack(dict_id) + _compressor(dict_id).compress(raw)
+        else:
+            encoded = MARKER + ZSTD + _compressor().compress(raw)
+    else:
+        encoded = MARKER + ZLIB + zlib.compress(raw, ZLIB_LEVEL)
+    return encoded if len(encoded) < len(raw) else raw
+
+
+def decode(blob: Union[bytes, str, None]) -> Optional[bytes]:
+    """
+    Return the original bytes of a stored value, compressed or not.
+    """
+    if blob is None:
+        return None
+    blob = _as_bytes(blob)
+    if not blob.startswith(MARKER):
+        return blob
+
+    codec = blob[1:2]
+    if codec == ZLIB:
+        return zlib.decompress(blob[2:])
+    if zstandard is None:
+        raise RuntimeError("Stored value is zstd-compressed but zstandard is not installed.")
+    if codec == ZSTD:
+        return _decompressor().decompress(blob[2:])
+    if codec == ZSTD_DICT:
+        (dict_id,) = _DICT_ID.unpack_from(blob, 2)
+        return _decompressor(dict_id).decompress(blob[2 + _DICT_ID.size:])
+    raise ValueError(f"Unknown storage codec {codec!r}.")
+
+
+def decode_text(blob: Union[bytes, str, None]) -> Optional[str]:
+    """
+    Return a stored value as text, e.g. a GeoJSON document or a JSON result.
+    """
+    raw = decode(blob)
+    return raw.decode('utf-8') if raw is not None else None
+
+
+def train_dictionary(samples: List[Union[bytes, str]]) -> int:
+    """
+    Train a zstd dictionary on sample documents, store it and make it current.
+
+    Returns:
+        int: The new dictionary's id.
+    """
+    if zstandard is None:
+        raise RuntimeError("Training a dictionary needs the zstandard package.")
+    dictionary = zstandard.train_dictionary(DICT_SIZE, [_as_bytes(s) for s in samples])
+    dict_id = _content_id(dictionary.as_bytes())
+    pipe = rd_bin.pipeline()
+    pipe.set(DICT_KEY.format(dict_id), dictionary.as_bytes())
+    pipe.set(DICT_CURRENT_KEY, dict_id)
+    pipe.execute()
+    logger.info(f"Trained compression dictionary {dict_id} ({len(dictionary.as_bytes())} bytes) "
+                f"on {len(samples)} documents.")
+    return dict_id
+
+
+def current_dictionary() -> Optional[int]:
+    """
+    Return the id of the dictionary new documents are compressed with, if any.
+    """
+    raw = rd_bin.get(DICT_CURRENT_KEY)
+    return int(raw) if raw else None
+
+
+class DocumentEncoder:
+    """
+    Encodes per-quake documents with the dictionary chosen when it was created.
+    """
+
+    def __init__(self, dict_id: Optional[int]) -> None:
+        self.dict_id = dict_id
+
+    def encode(self, document: Union[bytes, str]) -> bytes:
+        return encode(document, self.dict_id)
+
+
+def document_encoder(sample: Optional[Callable[[], List[str]]] = None) -> DocumentEncoder:
+    """
+    Return an encoder for per-quake documents.
+
+    Uses the current dictionary. When there is none yet and zstd is in use,
+    one is trained first from the documents `sample()` returns (a random
+    subset of up to DICT_SAMPLES), provided there are at least
+    DICT_MIN_SAMPLES of them. `sample` is only called in that case, so
+    loads after the first do not build samples.
+    """
+    if _codec() != 'zstd':
+        return DocumentEncoder(None)
+
+    dict_id = current_dictionary()
+    samples = sample() if dict_id is None and sample is not None else None
+    if samples and len(samples) >= DICT_MIN_SAMPLES:
+        if len(samples) > DICT_SAMPLES:
+            samples = random.sample(samples, DICT_SAMPLES)
+        try:
+            dict_id = train_dictionary(samples)
+        except zstandard.ZstdError as e:
+            logger.warning(f"Dictionary training failed, compressing without one: {e}")
+    return DocumentEncoder(dict_id)
+
+
+def recompress_documents(batch: int = 1000) -> int:
+    """
+    Re-encode every stored quake document with the current dictionary.
+
+    Returns:
+        int: Number of documents rewritten.
+    """
+    encoder = document_encoder()
+    keys = [f"earthquake:{quake_id.decode('utf-8')}" for quake_id in rd_bin.smembers('earthquakes:ids')]
+    for offset in range(0, len(keys), batch):
+        chunk = keys[offset:offset + batch]
+        pipe = rd_bin.pipeline(transaction=False)
+        for key, blob in zip(chunk, rd_bin.mget(chunk)):
+            if blob is not None:
+                pipe.set(key, encoder.encode(decode(blob)))
+        pipe.execute()
+    logger.info(f"Recompressed {len(keys)} documents with dictionary {encoder.dict_id}.")
+    return len(keys)
+
+
+def main(argv: List[str]) -> int:
+    usage = "usage: codec.py train | recompress"
+    if len(argv) != 1 or argv[0] not in ('train', 'recompress'):
+        print(usage)
+        return 2
+
+    if argv[0] == 'train':
+        ids = [quake_id.decode('utf-8') for quake_id in rd_bin.srandmember('earthquakes:ids', DICT_SAMPLES)]
+        samples = [decode(blob) for blob in rd_bin.mget([f"earthquake:{quake_id}" for quake_id in ids]) if blob]
+        if len(samples) < DICT_MIN_SAMPLES:
+            print(f"Need at least {DICT_MIN_SAMPLES} stored documents, found {len(samples)}.")
+            return 1
+        print(f"Trained dictionary {train_dictionary(samples)}; run 'recompress' to apply it to stored documents.")
+    else:
+        print(f"Recompressed {recompress_documents()} documents.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
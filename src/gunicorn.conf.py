@@ -0,0 +1,34 @@
+# src/gunicorn.conf.py
+"""
+Gunicorn settings for serving the Flask API in the Kubernetes deployments.
+
+Start with:
+    gunicorn --config src/gunicorn.conf.py api:app
+
+Every setting can be tuned per environment without rebuilding the image.
+"""
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+
+# Processes x threads = concurrent requests per pod. Most endpoints wait on
+# Redis or USGS, so a few threads per process go a long way.
+workers = int(os.environ.get('GUNICORN_WORKERS', min(multiprocessing.cpu_count() * 2 + 1, 4)))
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+worker_class = 'gthread'
+
+# Seconds a worker may stay silent before it is killed and replaced
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+# Seconds given to in-flight requests on shutdown or rolling restart
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+# Seconds an idle client connection is kept open behind the ingress
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+
+# Recycle workers periodically to bound slow memory growth
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 5000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 500))
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', None)
+errorlog = '-'
+loglevel = os.environ.get('LOG_LEVEL', 'info').lower()
@@ -0,0 +1,137 @@
+# src/http_cache.py
+"""
+Conditional GET and response compression for the read endpoints.
+
+Views decorated with `conditional` get a strong ETag derived from a version
+string (the dataset version, a stored result digest, ...) and the request URL.
+The version is checked before the view runs, so a matching If-None-Match is
+answered with 304 without touching the data or encoding JSON.
+
+`init_app` registers an after_request hook that gzip- or brotli-compresses
+large text responses according to Accept-Encoding.
+"""
+import gzip
+import hashlib
+import os
+from functools import wraps
+from typing import Callable, Optional
+
+from flask import Flask, Response, make_response, request
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip is always available
+    brotli = None
+
+from logger_config import get_logger
+
+logger = get_logger(__name__)
+
+# Responses smaller than this are sent uncompressed
+COMPRESS_MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE', 1024))
+GZIP_LEVEL = int(os.environ.get('GZIP_LEVEL', 6))
+BROTLI_QUALITY = int(os.environ.get('BROTLI_QUALITY', 5))
+
+COMPRESSIBLE_MIMETYPES = {
+    'application/json',
+    'application/x-ndjson',
+    'image/svg+xml',
+    'text/csv',
+    'text/html',
+    'text/plain',
+}
+
+ENCODINGS = ['br', 'gzip'] if brotli is not None else ['gzip']
+
+
+def _make_etag(version: str) -> str:
+    """
+    Combine a version string with the request path and query into an entity tag.
+    """
+    digest = hashlib.sha1(f"{version}|{request.full_path}".encode('utf-8')).hexdigest()
+    return digest[:32]
+
+
+def not_modified(etag: str) -> Optional[Response]:
+    """
+    Return a 304 response if the request's If-None-Match holds etag or a compressed copy's tag.
+    """
+    # a compressed copy is tagged "<etag>-<encoding>", so accept those too
+    for candidate in [etag] + [f"{etag}-{enc}" for enc in ENCODINGS]:
+        if candidate in request.if_none_match:
+            response = Response(status=304)
+            response.set_etag(candidate)
+            return response
+    return None
+
+
+def conditional(version_fn: Callable[..., Optional[str]]):
+    """
+    Decorate a view so it answers If-None-Match with 304 and tags 200 responses.
+
+    Args:
+        version_fn: Called with the view's arguments; returns a string that changes
+            whenever the response would change, or None to skip caching.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            version = version_fn(*args, **kwargs)
+            if version is None:
+                return view(*args, **kwargs)
+
+            etag = _make_etag(version)
+            cached = not_modified(etag)
+            if cached is not None:
+                return cached
+
+            response = make_response(view(*args, **kwargs))
+            if response.status_code == 200:
+                response.set_etag(etag)
+            return response
+        return wrapper
+    return decorator
+
+
+def compress_response(response: Response) -> Response:
+    """
+    Compress a finished response body when the client accepts it and it is worth it.
+    """
+    if (response.status_code != 200
+            or response.direct_passthrough
+            or response.is_streamed
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return response
+
+    response.vary.add('Accept-Encoding')
+
+    body = response.get_data()
+    if len(body) < COMPRESS_MIN_SIZE:
+        return response
+
+    encoding = request.accept_encodings.best_match(ENCODINGS)
+    if encoding is None:
+        return response
+
+    if encoding == 'br':
+        compressed = brotli.compress(body, quality=BROTLI_QUALITY)
+    else:
+        compressed = gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+    response.set_data(compressed)
+    response.headers['Content-Encoding'] = encoding
+
+    etag, weak = response.get_etag()
+    if etag:
+        response.set_etag(f"{etag}-{encoding}", weak)
+
+    logger.debug(f"Compressed {request.path} with {encoding}: {len(body)} -> {len(compressed)} bytes.")
+    return response
+
+
+def init_app(app: Flask) -> None:
+    """
+    Register response compression on a Flask app.
+    """
+    app.after_request(compress_response)
@@ -0,0 +1,137 @@
+# src/images.py
+"""
+Format and size variants of image job results.
+
+Variants live in the job's `res` hash next to the original PNG, under
+`content:<format>:<width>` with a matching `etag:<format>:<width>`, so each one is
+rendered at most once. SVG is drawn from the chart data the worker stores
+with the PNG, so it always shows the same figure.
+"""
+import hashlib
+import io
+import json
+from typing import Optional, Tuple
+
+from redis_client import res
+from codec import encode, decode
+from logger_config import get_logger
+
+logger = get_logger(__name__)
+
+MIMETYPES = {
+    'png': 'image/png',
+    'webp': 'image/webp',
+    'svg': 'image/svg+xml',
+}
+
+# Bounds for the `width` query parameter, in pixels
+MIN_WIDTH = 16
+MAX_WIDTH = 4096
+# Widths that are rendered and cached; a requested width is rounded up to one
+# of these, so each job holds at most this many variants per raster format
+VARIANT_WIDTHS = tuple(2 ** n for n in range(4, 13))
+
+
+def content_etag(content: bytes) -> str:
+    """
+    Return a strong entity tag for a stored result.
+
+    Args:
+        content (bytes): Result body.
+
+    Returns:
+        str: Hex digest identifying the exact bytes.
+    """
+    return hashlib.sha1(content).hexdigest()
+
+
+def variant_width(width: int) -> int:
+    """
+    Round a requested width up to the nearest cached variant width.
+    """
+    return next((w for w in VARIANT_WIDTHS if w >= width), VARIANT_WIDTHS[-1])
+
+
+def _variant_fields(fmt: str, width: Optional[int]) -> Tuple[str, str]:
+    """
+    Return the (content, etag) hash fields for a variant.
+    """
+    if fmt == 'png' and width is None:
+        return 'content', 'etag'
+    suffix = f"{fmt}:{width or ''}"
+    return f"content:{suffix}", f"etag:{suffix}"
+
+
+def _resize_raster(png: bytes, fmt: str, width: Optional[int]) -> bytes:
+    """
+    Re-encode a PNG as PNG or WebP, optionally scaled to a width.
+    """
+    from PIL import Image
+
+    with Image.open(io.BytesIO(png)) as img:
+        if width is not None and width != img.width:
+            height = max(1, round(img.height * width / img.width))
+            img = img.resize((width, height), Image.LANCZOS)
+        buf = io.BytesIO()
+        img.save(buf, format=fmt.upper())
+    return buf.getvalue()
+
+
+def _render_svg(jid: str) -> bytes:
+    """
+    Redraw a job's figure as SVG from the data stored with its PNG, so both
+    show the same figure; vector output cannot be derived from the PNG.
+    """
+    raw_chart = res.hget(jid, 'chart')
+    if raw_chart is None:
+        raise ValueError(f"SVG is not available for job {jid}.")
+
+    from plots import render_chart
+    return render_chart(json.loads(decode(raw_chart)), fmt='svg')
+
+
+def get_image(jid: str, fmt: str = 'png', width: Optional[int] = None) -> Optional[Tuple[bytes, str]]:
+    """
+    Return an image result, rendering and caching the requested variant on first use.
+
+    Args:
+        jid (str): Job ID.
+        fmt (str): 'png', 'webp' or 'svg'.
+        width (int, optional): Target width in pixels for raster formats,
+            rounded up to one of VARIANT_WIDTHS.
+
+    Returns:
+        tuple or None: (content, etag), or None if the job has no image content.
+
+    Raises:
+        ValueError: If the variant cannot be produced.
+    """
+    if width is not None:
+        width = variant_width(width)
+    content_field, etag_field = _variant_fields(fmt, width)
+    content, etag = res.hmget(jid, [content_field, etag_field])
+    content = decode(content)
+
+    if content is None:
+        if content_field == 'content':
+            return None
+
+        if fmt == 'svg':
+            content = _render_svg(jid)
+        else:
+            original = res.hget(jid, 'content')
+            if original is None:
+                return None
+            content = _resize_raster(original, fmt, width)
+        etag = None
+        logger.info(f"Rendered {fmt} variant (width={width}) for job {jid}.")
+
+    if etag is None:
+        etag = content_etag(content)
+        # raster formats are already compressed; SVG text is worth compressing
+        stored = encode(content) if fmt == 'svg' else content
+        res.hset(jid, mapping={content_field: stored, etag_field: etag})
+    else:
+        etag = etag.decode('utf-8')
+
+    return content, etag
@@ -1,12 +1,161 @@
 import json
+import os
+import time
 import uuid
-from typing import Dict, Optional
-from redis_client import q, jdb
+from typing import Any, Callable, Dict, List, Optional
+import redis
+from redis_client import lanes, qdb, jdb
 
 from logger_config import get_logger
 
 logger = get_logger(__name__)
 
+# Job priorities, highest first; each has its own queue (see redis_client.lanes)
+PRIORITIES = ('interactive', 'bulk', 'background')
+DEFAULT_PRIORITY = 'interactive'
+
+# Share of jobs a worker takes from each backlogged lane.
+# Override per lane with LANE_WEIGHT_<PRIORITY>, e.g. LANE_WEIGHT_BULK=4.
+LANE_WEIGHTS = {
+    'interactive': 8,
+    'bulk': 2,
+    'background': 1,
+}
+
+# Recent queue waits kept per lane for /metrics
+WAIT_SAMPLES = int(os.environ.get('QUEUE_WAIT_SAMPLES', 1000))
+WAITS_KEY = 'queue:waits:{}'
+
+# Reject new jobs once this many are waiting in a lane (0 disables the limit)
+MAX_QUEUE_DEPTH = int(os.environ.get('MAX_QUEUE_DEPTH', 500))
+# Seconds a rejected client is told to wait before retrying
+QUEUE_RETRY_AFTER = int(os.environ.get('QUEUE_RETRY_AFTER', 10))
+
+# Statuses after which a job will not change again
+FINAL_STATUSES = ('complete', 'failed', 'cancelled', 'timed_out')
+
+# Keyword arguments each client job type's handler takes in `params`, and
+# the JSON values each accepts. Listed here so the API can check a
+# submission without importing the handlers; tests/test_worker.py keeps it
+# in step with their signatures. The image types' `fmt` is chosen at download.
+NUMBER = (int, float)
+OPTIONAL_NUMBER = (int, float, type(None))
+INTEGER = (int,)
+JOB_PARAMS = {
+    'magnitude_distribution': {},
+    'earthquake_count_by_city': {},
+    'depth_histogram': {'bin_width': NUMBER, 'min_depth': OPTIONAL_NUMBER, 'max_depth': OPTIONAL_NUMBER},
+    'magnitude_depth_histogram': {
+        'mag_bin_width': NUMBER, 'depth_bin_width': NUMBER,
+        'min_mag': OPTIONAL_NUMBER, 'max_mag': OPTIONAL_NUMBER,
+        'min_depth': OPTIONAL_NUMBER, 'max_depth': OPTIONAL_NUMBER,
+    },
+    'gutenberg_richter': {'bin_width': NUMBER, 'mc': OPTIONAL_NUMBER, 'mc_correction': NUMBER},
+    'tile_pyramid': {'min_zoom': INTEGER, 'max_zoom': INTEGER, 'cell_bits': INTEGER},
+}
+_TYPE_NAMES = {NUMBER: 'a number', OPTIONAL_NUMBER: 'a number or null', INTEGER: 'an integer'}
+
+# Most bins a histogram job may have per axis, and cells on a 2D grid
+MAX_HISTOGRAM_BINS = 10000
+MAX_GRID_CELLS = 1000000
+# Range assumed for a bound the job leaves to the data; real data lies inside it
+MAGNITUDE_RANGE = (-2.0, 10.0)
+DEPTH_RANGE = (-10.0, 800.0)
+# Binned axes of each histogram type: (width param, default width, lower param, upper param, range)
+BINNED_AXES = {
+    'depth_histogram': [('bin_width', 10.0, 'min_depth', 'max_depth', DEPTH_RANGE)],
+    'magnitude_depth_histogram': [
+        ('mag_bin_width', 0.5, 'min_mag', 'max_mag', MAGNITUDE_RANGE),
+        ('depth_bin_width', 50.0, 'min_depth', 'max_depth', DEPTH_RANGE),
+    ],
+    'gutenberg_richter': [('bin_width', 0.1, None, None, MAGNITUDE_RANGE)],
+}
+
+class QueueFullError(Exception):
+    """
+    Raised when a job is rejected because the queue is at MAX_QUEUE_DEPTH.
+    """
+
+    def __init__(self, depth: int, retry_after: int, priority: str = DEFAULT_PRIORITY):
+        super().__init__(f"Job queue '{priority}' is full ({depth} jobs waiting).")
+        self.depth = depth
+        self.retry_after = retry_after
+        self.priority = priority
+
+def check_params(job_type: str, params: Dict[str, Any]) -> Optional[str]:
+    """
+    Check a job's params against what its handler accepts.
+
+    Returns:
+        str or None: An error message, or None if the params are valid.
+    """
+    accepted = JOB_PARAMS[job_type]
+    for name, value in params.items():
+        if name not in accepted:
+            names = ', '.join(accepted) or 'none'
+            return f"Unknown param {name} for job_type {job_type} (accepted: {names})."
+        # JSON true/false would pass as int
+        if isinstance(value, bool) or not isinstance(value, accepted[name]):
+            return f"param {name} must be {_TYPE_NAMES[accepted[name]]}."
+    return _check_bins(job_type, params)
+
+def _check_bins(job_type: str, params: Dict[str, Any]) -> Optional[str]:
+    """
+    Reject histogram params that would allocate more than MAX_HISTOGRAM_BINS
+    bins per axis or MAX_GRID_CELLS cells in all.
+    """
+    cells = 1
+    for width_name, default_width, lower_name, upper_name, (low, high) in BINNED_AXES.get(job_type, []):
+        width = params.get(width_name, default_width)
+        if width <= 0:
+            return f"param {width_name} must be positive."
+        lower = params.get(lower_name)
+        upper = params.get(upper_name)
+        span = (high if upper is None else upper) - (low if lower is None else lower)
+        bins = span / width
+        if bins > MAX_HISTOGRAM_BINS:
+            return (f"param {width_name} {width} gives {bins:.0f} bins over a range of {span:g}; "
+                    f"at most {MAX_HISTOGRAM_BINS} are allowed. Use a wider bin or a narrower range.")
+        cells *= max(bins, 1)
+    if cells > MAX_GRID_CELLS:
+        return f"The bins give {cells:.0f} grid cells; at most {MAX_GRID_CELLS} are allowed."
+    return None
+
+def lane_weight(priority: str) -> int:
+    """
+    Return the scheduling weight of a priority lane.
+    """
+    override = os.environ.get(f"LANE_WEIGHT_{priority.upper()}")
+    if override:
+        return int(override)
+    return LANE_WEIGHTS[priority]
+
+def queue_depth(priority: Optional[str] = None) -> int:
+    """
+    Return the number of jobs waiting in one lane, or in all lanes.
+    """
+    if priority is not None:
+        return len(lanes[priority])
+    return sum(len(lanes[p]) for p in PRIORITIES)
+
+def _check_capacity(new_jobs: int = 1, priority: str = DEFAULT_PRIORITY) -> None:
+    """
+    Raise QueueFullError if adding new_jobs to a lane would exceed MAX_QUEUE_DEPTH.
+    Each lane has its own limit, so a full bulk lane does not block interactive jobs.
+    """
+    if MAX_QUEUE_DEPTH <= 0:
+        return
+    depth = queue_depth(priority)
+    if depth + new_jobs > MAX_QUEUE_DEPTH:
+        logger.warning(f"Rejecting {new_jobs} {priority} job(s): queue depth {depth} at limit {MAX_QUEUE_DEPTH}.")
+        raise QueueFullError(depth, QUEUE_RETRY_AFTER, priority)
+
+def _now() -> float:
+    """
+    Current time as epoch seconds, for job timestamps.
+    """
+    return round(time.time(), 3)
+
 def _generate_jid() -> str:
     """
     Generate a pseudo-random identifier for a job.
@@ -54,17 +203,19 @@ def _save_job(jid: str, job_dict: Dict[str, str]) -> None:
     jdb.set(jid, json.dumps(job_dict))
     logger.info(f"Saved job {jid} to Redis.")
 
-def _queue_job(jid: str) -> None:
+def _queue_job(jid: str, priority: str = DEFAULT_PRIORITY) -> None:
     """
-    Add a job to the Redis queue.
+    Add a job to the Redis queue of its priority.
 
     Args:
         jid (str): Job ID.
+        priority (str): Job priority.
     """
-    q.put(jid)
-    logger.info(f"Queued job {jid}.")
+    lanes[priority].put(jid)
+    logger.info(f"Queued {priority} job {jid}.")
 
-def add_job(start: str, end: str, job_type: str, status: str = "submitted") -> Dict[str, str]:
+def add_job(start: str, end: str, job_type: str, status: str = "submitted",
+            params: Optional[Dict[str, Any]] = None, priority: str = DEFAULT_PRIORITY) -> Dict[str, str]:
     """
     Add a new job: generate an ID, create job metadata, store it, queue it.
 
@@ -73,17 +224,67 @@ def add_job(start: str, end: str, job_type: str, status: str = "submitted") -> D
         end (str): End date.
         status (str): Job status (default: 'submitted').
         job_type (str): Job type (default: )
+        params (dict, optional): Extra keyword arguments for the job handler.
+        priority (str): One of PRIORITIES (default: 'interactive').
 
     Returns:
         job_dict (dict): Job metadata dict.
+
+    Raises:
+        QueueFullError: If the job's lane is at MAX_QUEUE_DEPTH.
     """
+    _check_capacity(1, priority)
     jid = _generate_jid()
     job_dict = _instantiate_job(jid, status, start, end, job_type)
+    job_dict['priority'] = priority
+    job_dict['submitted_at'] = _now()
+    if params:
+        job_dict['params'] = params
     _save_job(jid, job_dict)
-    _queue_job(jid)
+    _queue_job(jid, priority)
     logger.info(f"Added new job {jid}.")
     return job_dict
 
+def add_jobs(specs: List[Dict[str, Any]]) -> List[Dict[str, str]]:
+    """
+    Add several jobs at once. All job records are written in one pipeline and
+    the IDs of each priority are pushed onto its queue with a single command.
+
+    Args:
+        specs (list): Dicts with 'start', 'end', 'type' and optional 'params'
+            and 'priority'.
+
+    Returns:
+        list: Job metadata dicts, in the order of specs.
+
+    Raises:
+        QueueFullError: If the batch's jobs for some lane do not fit under MAX_QUEUE_DEPTH;
+            then no job is added.
+    """
+    by_priority: Dict[str, List[Dict[str, Any]]] = {}
+    for spec in specs:
+        by_priority.setdefault(spec.get('priority') or DEFAULT_PRIORITY, []).append(spec)
+    for priority, lane_specs in by_priority.items():
+        _check_capacity(len(lane_specs), priority)
+
+    job_dicts = []
+    submitted_at = _now()
+    pipe = jdb.pipeline(transaction=False)
+    for spec in specs:
+        jid = _generate_jid()
+        job_dict = _instantiate_job(jid, "submitted", spec['start'], spec['end'], spec['type'])
+        job_dict['priority'] = spec.get('priority') or DEFAULT_PRIORITY
+        job_dict['submitted_at'] = submitted_at
+        if spec.get('params'):
+            job_dict['params'] = spec['params']
+        pipe.set(jid, json.dumps(job_dict))
+        job_dicts.append(job_dict)
+    pipe.execute()
+    for priority in by_priority:
+        lanes[priority].put(*(job_dict['id'] for job_dict in job_dicts if job_dict['priority'] == priority))
+    logger.info(f"Added batch of {len(job_dicts)} jobs.")
+    return job_dicts
+
 def get_job_by_id(jid: str) -> Optional[Dict[str, str]]:
     """
     Return job dictionary given a job ID.
@@ -101,19 +302,179 @@ def get_job_by_id(jid: str) -> Optional[Dict[str, str]]:
     logger.warning(f"Job ID {jid} not found.")
     return None
 
+def get_jobs_by_ids(jids: List[str]) -> Dict[str, Optional[Dict[str, str]]]:
+    """
+    Return several jobs with a single MGET.
+
+    Args:
+        jids (list): Job IDs.
+
+    Returns:
+        dict: Job ID -> job dict, or None for IDs that do not exist.
+    """
+    if not jids:
+        return {}
+    raws = jdb.mget(jids)
+    return {jid: json.loads(raw) if raw else None for jid, raw in zip(jids, raws)}
+
+def _modify_job(jid: str, change: Callable[[Dict[str, Any]], bool]) -> Optional[Dict[str, Any]]:
+    """
+    Read, change and write back a job record without losing a concurrent update.
+
+    The key is WATCHed while it is read and the write is a MULTI/EXEC, so if
+    another client (an API process or a worker) saves the job in between, the
+    change is applied again to the new record.
+
+    Args:
+        jid (str): Job ID.
+        change (callable): Edits the job dict in place; returns False to leave
+            the stored record unchanged.
+
+    Returns:
+        dict or None: The job dict as stored afterwards, or None if the job does not exist.
+    """
+    with jdb.pipeline() as pipe:
+        while True:
+            try:
+                pipe.watch(jid)
+                raw = pipe.get(jid)
+                if not raw:
+                    pipe.unwatch()
+                    return None
+                job_dict = json.loads(raw)
+                if change(job_dict) is False:
+                    pipe.unwatch()
+                    return job_dict
+                pipe.multi()
+                pipe.set(jid, json.dumps(job_dict))
+                pipe.execute()
+                return job_dict
+            except redis.WatchError:
+                logger.debug(f"Job {jid} changed while being updated; retrying.")
+
 def update_job_status(jid: str, status: str) -> None:
     """
-    Update the status of a job.
+    Update the status of a job. Also records when the job started
+    ('in progress') and when it reached a final status.
 
     Args:
         jid (str): Job ID.
         status (str): New status string.
     """
-    job_dict = get_job_by_id(jid)
-    if job_dict:
+    def apply(job_dict):
         job_dict['status'] = status
-        _save_job(jid, job_dict)
+        if status == 'in progress':
+            job_dict['started_at'] = _now()
+        elif status in FINAL_STATUSES:
+            job_dict['finished_at'] = _now()
+
+    if _modify_job(jid, apply) is not None:
         logger.info(f"Updated job {jid} status to '{status}'")
     else:
         logger.error(f"Job ID {jid} not found.")
-        raise Exception(f"Job ID {jid} not found.")
\ No newline at end of file
+        raise Exception(f"Job ID {jid} not found.")
+
+def cancel_job(jid: str) -> Optional[Dict[str, str]]:
+    """
+    Cancel a job. A queued job is removed from the queue and marked cancelled;
+    a running job is flagged so the worker interrupts it.
+
+    Args:
+        jid (str): Job ID.
+
+    Returns:
+        dict or None: Updated job dict, or None if the job does not exist.
+    """
+    job_dict = get_job_by_id(jid)
+    if not job_dict or job_dict['status'] in FINAL_STATUSES:
+        return job_dict
+
+    if job_dict['status'] == 'submitted':
+        # HotQueue stores serialized messages, so remove the serialized ID
+        lane = lanes[job_dict.get('priority', DEFAULT_PRIORITY)]
+        removed = qdb.lrem(lane.key, 0, lane.serializer.dumps(jid))
+        if removed:
+            def cancel(job_dict):
+                job_dict['status'] = 'cancelled'
+                job_dict['finished_at'] = _now()
+
+            logger.info(f"Cancelled queued job {jid}.")
+            return _modify_job(jid, cancel)
+
+    # already picked up by a worker; it polls for this flag
+    def request_cancel(job_dict):
+        # the worker may have finished it since it was read above
+        if job_dict['status'] in FINAL_STATUSES:
+            return False
+        job_dict['cancel_requested'] = True
+
+    job_dict = _modify_job(jid, request_cancel)
+    logger.info(f"Requested cancellation of running job {jid}.")
+    return job_dict
+
+def is_cancel_requested(jid: str) -> bool:
+    """
+    Return True if cancellation was requested for a job.
+    """
+    job_dict = get_job_by_id(jid)
+    return bool(job_dict and job_dict.get('cancel_requested'))
+
+
+def record_queue_wait(job_dict: Dict[str, Any]) -> None:
+    """
+    Record how long a job waited in its queue, as it starts running.
+    """
+    if 'submitted_at' not in job_dict:
+        return
+    key = WAITS_KEY.format(job_dict.get('priority', DEFAULT_PRIORITY))
+    pipe = qdb.pipeline(transaction=False)
+    pipe.lpush(key, round(_now() - job_dict['submitted_at'], 3))
+    pipe.ltrim(key, 0, WAIT_SAMPLES - 1)
+    pipe.execute()
+
+def _percentile(values: List[float], fraction: float) -> Optional[float]:
+    if not values:
+        return None
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+def lane_stats() -> Dict[str, Dict[str, Any]]:
+    """
+    Return depth and queue-wait figures for every priority lane.
+
+    Returns:
+        dict: Priority -> weight, depth, age in seconds of the oldest waiting
+            job, and p50/p95/max wait of the last WAIT_SAMPLES jobs started.
+    """
+    pipe = qdb.pipeline(transaction=False)
+    for priority in PRIORITIES:
+        lane = lanes[priority]
+        pipe.llen(lane.key)
+        # HotQueue pushes on the right and pops on the left
+        pipe.lindex(lane.key, 0)
+        pipe.lrange(WAITS_KEY.format(priority), 0, -1)
+    replies = pipe.execute()
+
+    heads = {}
+    for index, priority in enumerate(PRIORITIES):
+        head = replies[index * 3 + 1]
+        if head is not None:
+            heads[priority] = lanes[priority].serializer.loads(head)
+    head_jobs = get_jobs_by_ids(list(heads.values()))
+
+    now = _now()
+    stats = {}
+    for index, priority in enumerate(PRIORITIES):
+        depth, _, raw_waits = replies[index * 3:index * 3 + 3]
+        waits = sorted(float(w) for w in raw_waits)
+        head_job = head_jobs.get(heads.get(priority))
+        oldest = round(now - head_job['submitted_at'], 3) if head_job and 'submitted_at' in head_job else None
+        stats[priority] = {
+            'weight': lane_weight(priority),
+            'depth': depth,
+            'oldest_wait_s': oldest,
+            'wait_p50_s': _percentile(waits, 0.5),
+            'wait_p95_s': _percentile(waits, 0.95),
+            'wait_max_s': waits[-1] if waits else None,
+            'wait_samples': len(waits),
+        }
+    return stats
@@ -7,6 +7,9 @@ import socket
 log_level_str = os.environ.get("LOG_LEVEL", "INFO").upper()
 log_level = getattr(logging, log_level_str, logging.INFO)
 
+# Requests slower than this many milliseconds are logged with a timing breakdown
+slow_request_ms = float(os.environ.get("SLOW_REQUEST_MS", 1000))
+
 # Setup log format
 format_str = f'[%(asctime)s {socket.gethostname()}] %(filename)s:%(funcName)s:%(lineno)d - %(levelname)s: %(message)s'
 logging.basicConfig(level=log_level, format=format_str)
@@ -0,0 +1,232 @@
+# src/plots.py
+# Chart rendering for image jobs. Kept apart from utils so the API, which
+# never draws, does not pay for importing Matplotlib and NumPy.
+import io
+import re
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, List, NamedTuple
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import numpy as np
+import requests
+from analytics import load_quake_arrays
+from utils import USGS_BASE_URL
+
+MAGNITUDE_BINS = np.arange(0, 11, 1)
+
+class ChartImage(NamedTuple):
+    """
+    A rendered PNG chart and the data it plots. The data is stored with the
+    job's result, so other formats redraw the same figure.
+    """
+    png: bytes
+    chart: Dict[str, Any]
+
+
+def generate_empty_plot(message: str = "No data available") -> tuple:
+    """
+    Generate an empty plot with a message in the center.
+
+    Args:
+        message (str): Text to display on the plot.
+    
+    Returns:
+        (fig, ax): Matplotlib figure and axes objects.
+    """
+    fig, ax = plt.subplots(figsize=(8, 6))
+    ax.text(0.5, 0.5, message, fontsize=15, ha='center', va='center', color='gray')
+    ax.axis('off')
+
+    return fig, ax
+
+def create_magnitude_plot(counts: List[int], start_date: str, end_date: str):
+    """
+    Plot a histogram of earthquake magnitudes.
+
+    Args:
+        counts (List[int]): Number of earthquakes in each MAGNITUDE_BINS bin.
+        start_date (str): Start date in 'YYYY-MM-DD' format.
+        end_date (str): End date in 'YYYY-MM-DD' format.
+    Returns:
+        (fig, ax): Matplotlib figure and axis objects.
+    """
+    bins = MAGNITUDE_BINS
+
+    fig, ax = plt.subplots(figsize=(8, 6))
+    # one weighted sample per bin draws the same bars as the raw magnitudes
+    ax.hist(bins[:-1], bins=bins, weights=counts, edgecolor='black', color='#FF5733', alpha=0.7)
+    ax.set_title(f'Magnitude Distribution from {start_date} to {end_date}')
+    ax.set_xlabel('Magnitude')
+    ax.set_ylabel('Number of Earthquakes')
+    ax.set_xticks(bins)
+
+    return fig, ax
+
+def figure_to_bytes(fig, fmt: str = 'png') -> bytes:
+    """
+    Render a Matplotlib figure to an in-memory image and close it.
+
+    Args:
+        fig: Matplotlib figure.
+        fmt (str): Any format Matplotlib can save, e.g. 'png' or 'svg'.
+
+    Returns:
+        bytes: The encoded image.
+    """
+    buf = io.BytesIO()
+    fig.savefig(buf, format=fmt)
+    plt.close(fig)
+    return buf.getvalue()
+
+def render_chart(chart: Dict[str, Any], fmt: str = 'png') -> bytes:
+    """
+    Draw a chart from its plotted data.
+
+    Args:
+        chart (dict): Data from a ChartImage.
+        fmt (str): image format (default: 'png')
+
+    Returns:
+        bytes: The encoded image.
+    """
+    if chart['kind'] == 'magnitude_distribution':
+        if chart['total'] == 0:
+            fig, ax = generate_empty_plot("No data available")
+        else:
+            fig, ax = create_magnitude_plot(chart['counts'], chart['start'], chart['end'])
+    elif chart['kind'] == 'earthquake_count_by_city':
+        fig = create_city_plot(chart['cities'], chart['counts'], chart['start'], chart['end'])
+    else:
+        raise ValueError(f"Unknown chart kind: {chart['kind']}")
+
+    return figure_to_bytes(fig, fmt)
+
+def generate_magnitude_histogram(start_date: str, end_date: str) -> ChartImage:
+    """
+    Generates a histogram of earthquake magnitudes within date range
+    as a PNG image.
+
+    Args:
+        start_date (str): in format YYYY-MM-DD e.g., '2025-03-01'
+        end_date (str): in format YYYY-MM-DD e.g., '2025-03-10'
+
+    Returns:
+        ChartImage: The PNG and the bin counts it plots.
+    """
+    # magnitudes come from the quake cache or the by_mag index, not the documents
+    magnitudes = load_quake_arrays(start_date, end_date, fields=('mag',))['mag']
+    return render_magnitude_histogram(magnitudes, start_date, end_date)
+
+def render_magnitude_histogram(magnitudes: np.ndarray, start_date: str, end_date: str) -> ChartImage:
+    """
+    Render already loaded magnitudes as the magnitude histogram image.
+
+    Args:
+        magnitudes (np.ndarray): Magnitudes of the quakes in the date range.
+        start_date (str): Start date, for the title.
+        end_date (str): End date, for the title.
+
+    Returns:
+        ChartImage: The PNG and the bin counts it plots.
+    """
+    counts, _ = np.histogram(magnitudes, bins=MAGNITUDE_BINS)
+    chart = {
+        'kind': 'magnitude_distribution',
+        'start': start_date,
+        'end': end_date,
+        'total': int(magnitudes.size),
+        'counts': counts.tolist(),
+    }
+    return ChartImage(render_chart(chart), chart)
+
+# Create Occurrence by City Histogram
+def parse_earthquakes_by_city(start_date: str, end_date: str) -> dict:
+    """
+    Parse USGS earthquake data and return counts by city for a specified time range.
+
+    Inputs:
+        start_date: in format 'YYYY-MM-DD HH:MM:SS'
+        end_date: in format 'YYYY-MM-DD HH:MM:SS'
+
+    Returns:
+        dict with cities as keys and earthquake counts as values    
+    """
+    try:
+        # validate dates
+        datetime.strptime(start_date, '%Y-%m-%d %H:%M:%S')
+        datetime.strptime(end_date, '%Y-%m-%d %H:%M:%S')
+
+        # construct API URL
+        base_url = f"{USGS_BASE_URL}/query.geojson"
+        url = f"{base_url}?starttime={start_date}&endtime={end_date}&orderby=time"
+
+        # counter
+        city_counts = defaultdict(int)
+
+        # fetch and process data
+        response = requests.get(url)
+        if response.status_code != 200:
+            raise Exception(f"API request failed with status code: {response.status_code}")
+
+        data = response.json()
+
+        for feature in data['features']:
+            title = feature['properties']['title']
+            try:
+                # gets city name using regex pattern
+                location_part = title.split('-')[1].strip()
+                city_match = re.search(r'of\s+([^,]+)', location_part)
+                if city_match:
+                    city = city_match.group(1).strip()
+                    city_counts[city] += 1
+            except (IndexError, AttributeError):
+                continue
+
+        return dict(city_counts)
+
+    # error handling
+    except ValueError as e:
+        raise ValueError(f"Invalid date format: {str(e)}")
+    except Exception as e:
+        raise Exception(f"Error processing earthquake data: {str(e)}")
+
+def generate_city_quake_histogram(start_date: str, end_date: str) -> ChartImage:
+    """
+    Generates a horizontal bar chart of the top 10 cities by earthquake occurrence 
+    within the date range as a PNG image.
+
+    Args:
+        start_date (str): in format YYYY-MM-DD e.g., '2025-03-01'
+        end_date (str): in format YYYY-MM-DD e.g., '2025-03-10'
+
+    Returns:
+        ChartImage: The PNG and the city counts it plots.
+    """
+    data = parse_earthquakes_by_city(start_date, end_date)
+    top_cities = sorted(data.items(), key=lambda x: x[1], reverse=True)[:10]
+
+    chart = {
+        'kind': 'earthquake_count_by_city',
+        'start': start_date,
+        'end': end_date,
+        'cities': [city for city, count in top_cities],
+        'counts': [count for city, count in top_cities],
+    }
+    return ChartImage(render_chart(chart), chart)
+
+def create_city_plot(cities: List[str], counts: List[int], start_date: str, end_date: str):
+    """
+    Plot the city counts as a horizontal bar chart.
+
+    Returns:
+        fig: Matplotlib figure.
+    """
+    # plot format
+    fig = plt.figure(figsize=(12, 6))
+    plt.barh(cities[::-1], counts[::-1], color='skyblue')  # city with max count on top
+    plt.xlabel('Number of Earthquakes')
+    plt.title(f'Top 10 Cities by Earthquake Occurrence\n({start_date} to {end_date})')
+
+    return fig
@@ -0,0 +1,201 @@
+# src/precompute.py
+"""
+Precomputation of the standard reports after each ingest.
+
+Most jobs ask for the same few reports: the magnitude histogram of one day,
+of the last 7 days and of the whole loaded month.
+After POST /data or a snapshot import, a background-priority
+`precompute_reports` job plans those reports and queues a background job
+for each one that is out of date. Each finished report is registered under
+its (job type, start, end), so a matching POST /jobs returns the stored job
+at once instead of queueing a new one.
+
+Each day of data has a fingerprint of its quakes' IDs, times and
+magnitudes. A report is recomputed only when one of its days changed, or
+when it has no registered job or that job did not complete. Until the plan
+for the current dataset version has run, no report is served, so a request
+that arrives between an ingest and its plan never gets a stale result.
+
+Only reports drawn from the loaded dataset can be precomputed, since the
+day fingerprints are what decide when to redo them. The city chart reads
+live USGS data, so it is never precomputed.
+
+Settings:
+    PRECOMPUTE_REPORTS   job types to precompute (of PRECOMPUTABLE_REPORTS); empty disables the stage
+    PRECOMPUTE_WINDOWS   any of day, week, month
+"""
+import hashlib
+import os
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from jobs import add_job, add_jobs, get_job_by_id, get_jobs_by_ids, QueueFullError, FINAL_STATUSES
+from redis_client import rd
+from utils import get_dataset_version, DATASET_VERSION_KEY
+from logger_config import get_logger
+
+logger = get_logger(__name__)
+
+# Report types computed from the loaded dataset, which the fingerprints track
+PRECOMPUTABLE_REPORTS = ('magnitude_distribution',)
+PRECOMPUTE_REPORTS = [t for t in os.environ.get(
+    'PRECOMPUTE_REPORTS', ','.join(PRECOMPUTABLE_REPORTS)).split(',') if t in PRECOMPUTABLE_REPORTS]
+PRECOMPUTE_WINDOWS = [w for w in os.environ.get('PRECOMPUTE_WINDOWS', 'day,week,month').split(',') if w]
+
+PLAN_JOB_TYPE = 'precompute_reports'
+PRIORITY = 'background'
+
+# Kept with the dataset in db 0, not with the jobs: every key in the job
+# database must be a job ID, since GET /jobs lists them all
+# (job type, start, end) -> job ID of the report's latest run
+REGISTRY_KEY = 'reports:registry'
+# day -> fingerprint of its quakes when its reports were last queued
+FINGERPRINTS_KEY = 'reports:fingerprints'
+# dataset version the registry was last planned for
+PLANNED_VERSION_KEY = 'reports:version'
+
+def _report_key(job_type: str, start: str, end: str) -> str:
+    return f"{job_type}|{start}|{end}"
+
+def _day(time_ms: float) -> str:
+    # local dates, like utils.parse_date_range
+    return datetime.fromtimestamp(time_ms / 1000).strftime('%Y-%m-%d')
+
+def day_fingerprints() -> Dict[str, str]:
+    """
+    Fingerprint every day of loaded data from the time and magnitude indexes.
+
+    Returns:
+        dict: 'YYYY-MM-DD' -> hex digest of that day's quake IDs, times and magnitudes.
+    """
+    by_time = rd.zrange('earthquakes:by_time', 0, -1, withscores=True)
+    mags = dict(rd.zrange('earthquakes:by_mag', 0, -1, withscores=True))
+
+    digests = defaultdict(lambda: hashlib.blake2b(digest_size=16))
+    for quake_id, time_ms in by_time:
+        # by_time is sorted, so the same quakes always hash in the same order
+        digests[_day(time_ms)].update(f"{quake_id}:{time_ms}:{mags.get(quake_id)};".encode('utf-8'))
+    return {day: digest.hexdigest() for day, digest in digests.items()}
+
+def report_windows(days: List[str]) -> List[Tuple[str, str, List[str]]]:
+    """
+    List the standard report windows over the loaded days.
+
+    Args:
+        days (list): Sorted 'YYYY-MM-DD' days that have data.
+
+    Returns:
+        list: (start, end, days covered) for each window in PRECOMPUTE_WINDOWS.
+    """
+    if not days:
+        return []
+    first, last = days[0], days[-1]
+    windows = []
+    if 'day' in PRECOMPUTE_WINDOWS:
+        windows.extend((day, day, [day]) for day in days)
+    if 'week' in PRECOMPUTE_WINDOWS:
+        week_start = (datetime.fromisoformat(last) - timedelta(days=6)).strftime('%Y-%m-%d')
+        windows.append((week_start, last, [day for day in days if day >= week_start]))
+    if 'month' in PRECOMPUTE_WINDOWS and first != last:
+        windows.append((first, last, days))
+    # the week can be the whole dataset
+    return list({(start, end): (start, end, covered) for start, end, covered in windows}.values())
+
+def plan_reports(start_date: str, end_date: str) -> Dict[str, Any]:
+    """
+    Job handler for `precompute_reports`: queue the reports that are out of date.
+
+    The dates are those of the ingest that triggered the plan; every loaded
+    day is considered, so one plan also catches up on earlier failures.
+
+    Returns:
+        dict: Counts of days and reports, for the job's JSON result.
+    """
+    version = get_dataset_version()
+    fingerprints = day_fingerprints()
+    previous = rd.hgetall(FINGERPRINTS_KEY)
+    changed = {day for day, digest in fingerprints.items() if previous.get(day) != digest}
+
+    reports = [(job_type, first_day, last_day, covered)
+               for job_type in PRECOMPUTE_REPORTS
+               for first_day, last_day, covered in report_windows(sorted(fingerprints))]
+    keys = [_report_key(job_type, start, end) for job_type, start, end, _ in reports]
+    registered = dict(zip(keys, rd.hmget(REGISTRY_KEY, keys))) if keys else {}
+    jobs = get_jobs_by_ids([jid for jid in registered.values() if jid])
+
+    specs = []
+    for key, (job_type, start, end, covered) in zip(keys, reports):
+        job = jobs.get(registered.get(key))
+        # a queued or running job is as good as a complete one
+        current = job is not None and (job['status'] == 'complete' or job['status'] not in FINAL_STATUSES)
+        if current and changed.isdisjoint(covered):
+            continue
+        specs.append({'start': start, 'end': end, 'type': job_type, 'priority': PRIORITY})
+
+    # if the background queue is full this raises before any fingerprint is
+    # saved, so the next plan retries the same reports
+    queued = add_jobs(specs) if specs else []
+
+    pipe = rd.pipeline(transaction=False)
+    if queued:
+        pipe.hset(REGISTRY_KEY, mapping={_report_key(j['type'], j['start'], j['end']): j['id'] for j in queued})
+    if fingerprints:
+        pipe.hset(FINGERPRINTS_KEY, mapping=fingerprints)
+    stale = set(previous) - set(fingerprints)
+    if stale:
+        pipe.hdel(FINGERPRINTS_KEY, *stale)
+    pipe.set(PLANNED_VERSION_KEY, version)
+    pipe.execute()
+
+    logger.info(f"Planned reports for {start_date} to {end_date}: {len(changed)} of {len(fingerprints)} days "
+                f"changed, {len(queued)} of {len(keys)} reports queued.")
+    return {
+        'days': len(fingerprints),
+        'changed_days': sorted(changed),
+        'reports': len(keys),
+        'queued': len(queued),
+    }
+
+def schedule_precompute() -> Optional[Dict[str, str]]:
+    """
+    Queue a background `precompute_reports` job for the loaded data, after an ingest.
+
+    Returns:
+        dict or None: The planning job, or None if precomputation is disabled,
+            there is no data, or the background queue is full.
+    """
+    if not PRECOMPUTE_REPORTS or not PRECOMPUTE_WINDOWS:
+        return None
+    first = rd.zrange('earthquakes:by_time', 0, 0, withscores=True)
+    last = rd.zrange('earthquakes:by_time', -1, -1, withscores=True)
+    if not first:
+        return None
+    try:
+        return add_job(_day(first[0][1]), _day(last[0][1]), PLAN_JOB_TYPE, priority=PRIORITY)
+    except QueueFullError as e:
+        logger.warning(f"Skipping report precomputation: {e}")
+        return None
+
+def find_report(job_type: str, start: str, end: str) -> Optional[Dict[str, Any]]:
+    """
+    Return the completed precomputed job for a report, if there is one and
+    the current dataset has been planned.
+    """
+    if job_type not in PRECOMPUTE_REPORTS:
+        return None
+    pipe = rd.pipeline(transaction=False)
+    pipe.get(DATASET_VERSION_KEY)
+    pipe.get(PLANNED_VERSION_KEY)
+    pipe.hget(REGISTRY_KEY, _report_key(job_type, start, end))
+    version, planned, jid = pipe.execute()
+    if jid is None or planned is None or planned != (version or '0'):
+        return None
+    job = get_job_by_id(jid)
+    return job if job and job['status'] == 'complete' else None
+
+def clear_reports() -> None:
+    """
+    Forget every precomputed report and fingerprint, e.g. after DELETE /data.
+    """
+    rd.delete(REGISTRY_KEY, FINGERPRINTS_KEY, PLANNED_VERSION_KEY)
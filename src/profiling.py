@@ -0,0 +1,160 @@
+# src/profiling.py
+"""
+Request timing, Redis round-trip accounting and opt-in profiling for the API.
+
+Every response gets a Server-Timing header that splits wall time into Redis,
+timed sections such as JSON decoding, and the remaining Python time. Requests
+slower than SLOW_REQUEST_MS are logged with the same breakdown.
+
+Profiling is off by default. When a request is sampled (PROFILE_SAMPLE_RATE)
+or carries `X-Profile: 1` while PROFILE_ALLOW_HEADER=true, it runs under
+cProfile and a stack sampler, and two files are written to PROFILE_DIR:
+    <id>.prof     cProfile stats (snakeviz, pstats, gprof2dot)
+    <id>.folded   collapsed stacks, one "frame;frame;frame count" per line,
+                  ready for flamegraph.pl or speedscope
+"""
+import cProfile
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Optional
+
+from flask import Flask, Response, g, request
+
+import request_stats
+from logger_config import get_logger, slow_request_ms
+
+logger = get_logger(__name__)
+
+PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', 0))
+PROFILE_ALLOW_HEADER = os.environ.get('PROFILE_ALLOW_HEADER', 'false').lower() == 'true'
+PROFILE_DIR = os.environ.get('PROFILE_DIR', '/tmp/profiles')
+PROFILE_INTERVAL_MS = float(os.environ.get('PROFILE_INTERVAL_MS', 5))
+
+
+class StackSampler:
+    """
+    Periodically record the stack of one thread as collapsed frames.
+    """
+
+    def __init__(self, thread_id: int, interval_ms: float) -> None:
+        self.thread_id = thread_id
+        self.interval = interval_ms / 1000
+        self.counts: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            if stack:
+                self.counts[';'.join(reversed(stack))] += 1
+
+    def write(self, path: str) -> None:
+        with open(path, 'w') as f:
+            for stack, count in self.counts.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+def _should_profile() -> bool:
+    if PROFILE_ALLOW_HEADER and request.headers.get('X-Profile') == '1':
+        return True
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+
+def _start_request() -> None:
+    stats = request_stats.RequestStats()
+    g.request_stats = stats
+    g.request_stats_token = request_stats.activate(stats)
+
+    if _should_profile():
+        g.profiler = cProfile.Profile()
+        g.sampler = StackSampler(threading.get_ident(), PROFILE_INTERVAL_MS)
+        g.sampler.start()
+        g.profiler.enable()
+
+
+def _stop_profiling(response: Response) -> None:
+    profiler: Optional[cProfile.Profile] = g.pop('profiler', None)
+    if profiler is None:
+        return
+    profiler.disable()
+    sampler = g.pop('sampler')
+    sampler.stop()
+
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    path_part = request.path.strip('/').replace('/', '_') or 'root'
+    profile_id = f"{int(time.time() * 1000)}-{request.method}-{path_part}"
+    profiler.dump_stats(os.path.join(PROFILE_DIR, f"{profile_id}.prof"))
+    sampler.write(os.path.join(PROFILE_DIR, f"{profile_id}.folded"))
+
+    response.headers['X-Profile-Id'] = profile_id
+    logger.info(f"Wrote profile {profile_id} to {PROFILE_DIR}.")
+
+
+def _finish_request(response: Response) -> Response:
+    stats: Optional[request_stats.RequestStats] = g.get('request_stats')
+    if stats is None:
+        return response
+
+    _stop_profiling(response)
+
+    total_ms = stats.elapsed_ms()
+    section_ms = sum(stats.sections.values())
+    app_ms = max(total_ms - stats.redis_ms - section_ms, 0.0)
+
+    timings = [
+        f'total;dur={total_ms:.1f}',
+        f'redis;dur={stats.redis_ms:.1f};desc="{stats.redis_commands} cmds"',
+    ]
+    timings += [f'{name};dur={ms:.1f}' for name, ms in stats.sections.items()]
+    timings.append(f'app;dur={app_ms:.1f}')
+    response.headers['Server-Timing'] = ', '.join(timings)
+
+    if total_ms >= slow_request_ms:
+        sections = ' '.join(f"{name}={ms:.1f}ms" for name, ms in stats.sections.items())
+        logger.warning(
+            f"Slow request {request.method} {request.full_path.rstrip('?')} -> {response.status_code}: "
+            f"total={total_ms:.1f}ms redis={stats.redis_ms:.1f}ms "
+            f"({stats.redis_commands} cmds, {stats.redis_bytes_sent}B sent, "
+            f"{stats.redis_bytes_received}B received) {sections} app={app_ms:.1f}ms"
+        )
+    return response
+
+
+def _teardown_request(exc) -> None:
+    token = g.pop('request_stats_token', None)
+    if token is not None:
+        request_stats.deactivate(token)
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        # the view raised before after_request could stop profiling
+        profiler.disable()
+        g.pop('sampler').stop()
+
+
+def init_app(app: Flask) -> None:
+    """
+    Register request timing and profiling hooks on a Flask app.
+
+    Register it before other after_request hooks (such as compression) so it
+    runs last and its timing covers them.
+    """
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    app.teardown_request(_teardown_request)
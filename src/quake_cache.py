@@ -0,0 +1,182 @@
+# src/quake_cache.py
+"""
+Worker-resident columnar cache of the compact quake fields.
+
+The whole dataset is held as NumPy arrays sorted by time, so a date range is
+two binary searches and a slice instead of a Redis scan. Every lookup
+compares the dataset version in Redis with the loaded one and reloads on a
+mismatch, so a missed pub/sub message cannot leave the cache stale. The
+cache also listens on the dataset-changed channel that ingest publishes to,
+which marks it stale as soon as a change is announced. If the dataset would
+exceed the memory cap, lookups return None and callers read from Redis instead.
+"""
+import os
+import sys
+import threading
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+
+from redis_client import rd
+from utils import DATASET_EVENTS_CHANNEL, get_dataset_version
+from logger_config import get_logger
+
+logger = get_logger(__name__)
+
+QUAKE_CACHE_MAX_MB = float(os.environ.get('QUAKE_CACHE_MAX_MB', 64))
+
+# Quakes per ZMSCORE/GEOPOS call while loading
+LOAD_CHUNK_SIZE = 10000
+
+# Rough per-quake footprint: five 8-byte columns plus the id string object
+_EST_BYTES_PER_QUAKE = 5 * 8 + 64
+
+FIELDS = ('mag', 'depth', 'longitude', 'latitude')
+
+
+class QuakeCache:
+    """
+    In-process copy of (ids, time, mag, depth, longitude, latitude) sorted by time.
+    """
+
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = max_bytes
+        self.enabled = False
+        self._lock = threading.Lock()
+        self._arrays: Optional[Dict[str, np.ndarray]] = None
+        self._version: Optional[str] = None
+        self._stale = True
+        self._over_cap_version: Optional[str] = None
+        self._listener = None
+
+    def start(self) -> None:
+        """
+        Enable the cache and subscribe to dataset-changed events.
+        """
+        self.enabled = True
+        pubsub = rd.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(**{DATASET_EVENTS_CHANNEL: self._on_event})
+        self._listener = pubsub.run_in_thread(sleep_time=1, daemon=True,
+                                              exception_handler=self._on_listener_error)
+        logger.info(f"Quake cache enabled (cap {self.max_bytes / 2**20:.0f} MB).")
+
+    def _on_event(self, message: dict) -> None:
+        logger.info(f"Dataset changed (version {message.get('data')}), invalidating quake cache.")
+        self.invalidate()
+
+    def _on_listener_error(self, exc, pubsub, thread) -> None:
+        # lookups still check the dataset version, so only the early notice is lost
+        logger.warning(f"Quake cache listener stopped: {exc}")
+        self.invalidate()
+        thread.stop()
+        self._listener = None
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._stale = True
+
+    def stats(self) -> dict:
+        arrays = self._arrays
+        return {
+            'enabled': self.enabled,
+            'version': self._version,
+            'quakes': int(arrays['time'].size) if arrays else 0,
+            'bytes': self._nbytes(arrays) if arrays else 0,
+            'max_bytes': self.max_bytes,
+            'over_cap': self._over_cap_version is not None,
+        }
+
+    @staticmethod
+    def _nbytes(arrays: Dict[str, np.ndarray]) -> int:
+        total = sum(arr.nbytes for arr in arrays.values())
+        return total + sum(sys.getsizeof(quake_id) for quake_id in arrays['ids'])
+
+    def _is_fresh(self) -> bool:
+        # pub/sub is fire-and-forget: a message sent while the listener was
+        # reconnecting is lost, so the version is the source of truth
+        if self._stale:
+            return False
+        return get_dataset_version() == self._version
+
+    def _load(self) -> None:
+        """
+        Read the compact fields of every quake from Redis.
+        """
+        version = get_dataset_version()
+        if version == self._over_cap_version:
+            self._stale = False
+            return
+
+        total = rd.zcard('earthquakes:by_time')
+        if total * _EST_BYTES_PER_QUAKE > self.max_bytes:
+            self._drop(version, f"{total} quakes would exceed the cap")
+            return
+
+        members = rd.zrange('earthquakes:by_time', 0, -1, withscores=True)
+        ids = [quake_id for quake_id, _ in members]
+        mag, depth, coords = [], [], []
+        for offset in range(0, len(ids), LOAD_CHUNK_SIZE):
+            chunk = ids[offset:offset + LOAD_CHUNK_SIZE]
+            pipe = rd.pipeline(transaction=False)
+            pipe.zmscore('earthquakes:by_mag', chunk)
+            pipe.zmscore('earthquakes:by_depth', chunk)
+            pipe.geopos('earthquakes:geo', *chunk)
+            chunk_mag, chunk_depth, chunk_pos = pipe.execute()
+            mag.extend(chunk_mag)
+            depth.extend(chunk_depth)
+            coords.extend(pos if pos else (np.nan, np.nan) for pos in chunk_pos)
+
+        coords_arr = np.array(coords, dtype=np.float64).reshape(-1, 2)
+        arrays = {
+            'ids': np.array(ids, dtype=object),
+            'time': np.array([score for _, score in members], dtype=np.int64),
+            'mag': np.array(mag, dtype=np.float64),
+            'depth': np.array(depth, dtype=np.float64),
+            'longitude': coords_arr[:, 0],
+            'latitude': coords_arr[:, 1],
+        }
+
+        nbytes = self._nbytes(arrays)
+        if nbytes > self.max_bytes:
+            self._drop(version, f"{nbytes} bytes exceed the cap")
+            return
+
+        self._arrays = arrays
+        self._version = version
+        self._over_cap_version = None
+        self._stale = False
+        logger.info(f"Quake cache loaded {len(ids)} quakes ({nbytes / 2**20:.1f} MB), version {version}.")
+
+    def _drop(self, version: str, reason: str) -> None:
+        self._arrays = None
+        self._version = version
+        self._over_cap_version = version
+        self._stale = False
+        logger.warning(f"Quake cache disabled for version {version}: {reason}. Reading from Redis.")
+
+    def range(self, start_ms: int, end_ms: int,
+              fields: Sequence[str] = FIELDS) -> Optional[Dict[str, np.ndarray]]:
+        """
+        Return the cached arrays for quakes with start_ms <= time <= end_ms.
+
+        Returns:
+            dict or None: 'ids', 'time' and the requested fields as views into
+            the cache, or None when the cache is disabled or over its cap.
+        """
+        if not self.enabled:
+            return None
+
+        with self._lock:
+            if not self._is_fresh():
+                self._load()
+            arrays = self._arrays
+
+        if arrays is None:
+            return None
+
+        lo = np.searchsorted(arrays['time'], start_ms, side='left')
+        hi = np.searchsorted(arrays['time'], end_ms, side='right')
+        return {name: arrays[name][lo:hi] for name in ('ids', 'time', *fields)}
+
+
+cache = QuakeCache(int(QUAKE_CACHE_MAX_MB * 2**20))
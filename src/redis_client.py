@@ -1,12 +1,144 @@
 # src/redis_client.py
 import os
+import time
 import redis
 from hotqueue import HotQueue
+import request_stats
 
 _redis_ip = os.environ.get('REDIS_HOST', 'redis-db')
 _redis_port = int(os.environ.get("REDIS_PORT", 6379))
 
-rd = redis.Redis(host=_redis_ip, port=_redis_port, db=0, decode_responses=True)
-q = HotQueue("queue", host=_redis_ip, port=_redis_port, db=1)
-jdb = redis.Redis(host=_redis_ip, port=_redis_port, db=2)
-res = redis.Redis(host=_redis_ip, port=_redis_port, db=3)
+# Optional read replica; read-only endpoints use it when set
+_replica_ip = os.environ.get('REDIS_REPLICA_HOST')
+_replica_port = int(os.environ.get('REDIS_REPLICA_PORT', _redis_port))
+
+# Connection pool settings, shared by every client in this process
+_pool_settings = {
+    'max_connections': int(os.environ.get('REDIS_MAX_CONNECTIONS', 50)),
+    'socket_timeout': float(os.environ.get('REDIS_SOCKET_TIMEOUT', 5)),
+    'socket_connect_timeout': float(os.environ.get('REDIS_CONNECT_TIMEOUT', 2)),
+    'health_check_interval': int(os.environ.get('REDIS_HEALTH_CHECK_INTERVAL', 30)),
+    # off by default: a retried INCR or RPUSH may run twice (a version bump, a queued job)
+    'retry_on_timeout': os.environ.get('REDIS_RETRY_ON_TIMEOUT', 'false').lower() == 'true',
+}
+
+# Seconds a command waits for a free pooled connection before ConnectionError
+_pool_timeout = float(os.environ.get('REDIS_POOL_TIMEOUT', 10))
+
+POOLS = {}
+
+class InstrumentedConnection(redis.Connection):
+    """
+    Connection that adds round trips, bytes and time to the active request stats.
+    """
+
+    def send_packed_command(self, command, *args, **kwargs):
+        stats = request_stats.current()
+        if stats is None:
+            return super().send_packed_command(command, *args, **kwargs)
+        started = time.perf_counter()
+        try:
+            return super().send_packed_command(command, *args, **kwargs)
+        finally:
+            stats.redis_ms += (time.perf_counter() - started) * 1000
+            if isinstance(command, (bytes, str)):
+                stats.redis_bytes_sent += len(command)
+            else:
+                stats.redis_bytes_sent += sum(len(part) for part in command)
+
+    def read_response(self, *args, **kwargs):
+        stats = request_stats.current()
+        if stats is None:
+            return super().read_response(*args, **kwargs)
+        started = time.perf_counter()
+        response = super().read_response(*args, **kwargs)
+        # one reply per command, including each command of a pipeline
+        stats.redis_ms += (time.perf_counter() - started) * 1000
+        stats.redis_commands += 1
+        stats.redis_bytes_received += request_stats.payload_size(response)
+        return response
+
+class CountingPool(redis.BlockingConnectionPool):
+    """
+    Connection pool that counts its connections for pool_stats() through the
+    public pool methods, rather than redis-py's private bookkeeping.
+
+    When all max_connections are busy, as under many Gunicorn threads, a
+    command waits up to REDIS_POOL_TIMEOUT seconds for one to be released
+    instead of failing with "Too many connections".
+    """
+
+    def reset(self):
+        super().reset()
+        # also runs after a fork, when the parent's connections are dropped
+        self.created = 0
+        self.in_use = set()
+
+    def make_connection(self):
+        connection = super().make_connection()
+        self.created += 1
+        return connection
+
+    def get_connection(self, *args, **kwargs):
+        connection = super().get_connection(*args, **kwargs)
+        self.in_use.add(connection)
+        return connection
+
+    def release(self, connection):
+        # get_connection releases a connection that failed to connect before handing it out
+        self.in_use.discard(connection)
+        super().release(connection)
+
+def _pool(name: str, host: str, port: int, db: int, **overrides) -> CountingPool:
+    """
+    Create a named connection pool and register it for pool_stats().
+    """
+    settings = {**_pool_settings, **overrides}
+    pool = CountingPool(host=host, port=port, db=db, timeout=_pool_timeout,
+                        connection_class=InstrumentedConnection, **settings)
+    POOLS[name] = pool
+    return pool
+
+def pool_stats() -> dict:
+    """
+    Return connection usage for every pool in this process.
+
+    Returns:
+        dict: Pool name -> max, created, in-use and idle connection counts.
+    """
+    stats = {}
+    for name, pool in POOLS.items():
+        in_use = len(pool.in_use)
+        stats[name] = {
+            'max_connections': pool.max_connections,
+            'created': pool.created,
+            'in_use': in_use,
+            'idle': pool.created - in_use,
+        }
+    return stats
+
+rd = redis.Redis(connection_pool=_pool('data', _redis_ip, _redis_port, 0, decode_responses=True))
+# undecoded access to db 0, for compressed documents (see codec.py)
+rd_bin = redis.Redis(connection_pool=_pool('data_bin', _redis_ip, _redis_port, 0))
+# blocking pops wait longer than any socket timeout, so the queue pool has none
+_queue_pool = _pool('queue', _redis_ip, _redis_port, 1, socket_timeout=None)
+q = HotQueue("queue", connection_pool=_queue_pool)
+# one queue per job priority, highest first; interactive keeps the original queue
+lanes = {
+    'interactive': q,
+    'bulk': HotQueue("queue:bulk", connection_pool=_queue_pool),
+    'background': HotQueue("queue:background", connection_pool=_queue_pool),
+}
+# direct access to the queue database, for operations HotQueue lacks
+qdb = redis.Redis(connection_pool=_queue_pool)
+jdb = redis.Redis(connection_pool=_pool('jobs', _redis_ip, _redis_port, 2))
+res = redis.Redis(connection_pool=_pool('results', _redis_ip, _redis_port, 3))
+
+if _replica_ip:
+    rd_ro = redis.Redis(connection_pool=_pool('data_replica', _replica_ip, _replica_port, 0, decode_responses=True))
+    rd_ro_bin = redis.Redis(connection_pool=_pool('data_bin_replica', _replica_ip, _replica_port, 0))
+    res_ro = redis.Redis(connection_pool=_pool('results_replica', _replica_ip, _replica_port, 3))
+else:
+    rd_ro = rd
+    rd_ro_bin = rd_bin
+    res_ro = res
@@ -0,0 +1,89 @@
+# src/request_stats.py
+"""
+Per-request counters for Redis round trips and other timed sections.
+
+The API activates a RequestStats for each request (see profiling.py); the
+instrumented Redis connection and `timed` blocks add to whichever one is
+active in the current thread or context. With none active, they cost a
+single context variable lookup.
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+
+class RequestStats:
+    """
+    Counters collected while serving one request.
+    """
+
+    def __init__(self) -> None:
+        self.started = time.perf_counter()
+        self.redis_commands = 0
+        self.redis_ms = 0.0
+        self.redis_bytes_sent = 0
+        self.redis_bytes_received = 0
+        self.sections: Dict[str, float] = {}
+
+    def add_section(self, name: str, ms: float) -> None:
+        self.sections[name] = self.sections.get(name, 0.0) + ms
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self.started) * 1000
+
+
+_current: ContextVar[Optional[RequestStats]] = ContextVar('request_stats', default=None)
+
+
+def current() -> Optional[RequestStats]:
+    """
+    Return the stats being collected for the current request, if any.
+    """
+    return _current.get()
+
+
+def activate(stats: Optional[RequestStats]):
+    """
+    Make `stats` the active collector and return a token for `deactivate`.
+    """
+    return _current.set(stats)
+
+
+def deactivate(token) -> None:
+    _current.reset(token)
+
+
+@contextmanager
+def timed(name: str):
+    """
+    Add the wall time of the enclosed block to the named section.
+
+    Example:
+        with timed('json'):
+            data = json.loads(raw)
+    """
+    stats = _current.get()
+    if stats is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats.add_section(name, (time.perf_counter() - started) * 1000)
+
+
+def payload_size(value) -> int:
+    """
+    Approximate the wire size of a decoded Redis reply.
+    """
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return len(value)
+    if isinstance(value, str):
+        return len(value)
+    if isinstance(value, (list, tuple, set)):
+        return sum(payload_size(item) for item in value)
+    if isinstance(value, dict):
+        return sum(payload_size(k) + payload_size(v) for k, v in value.items())
+    return 8 if value is not None else 0
@@ -0,0 +1,176 @@
+# src/snapshot.py
+"""
+Export the loaded earthquake dataset to a columnar snapshot and bulk-load it back.
+
+A snapshot is two files sharing a path prefix:
+    <prefix>.npz              quake columns (id, time, mag, depth, longitude, latitude, mag_type),
+                              sorted by time, from which every index is rebuilt
+    <prefix>.features.ndjson.gz
+                              the stored GeoJSON feature of each quake, one per line,
+                              in the same order as the columns
+
+Features are written to the snapshot uncompressed and re-encoded on import
+with the target's storage codec (see codec.py).
+
+Usage:
+    python3 src/snapshot.py export <prefix>
+    python3 src/snapshot.py import <prefix>
+"""
+import argparse
+import gzip
+import json
+import random
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from redis_client import rd, rd_bin
+from codec import encode, decode_text, document_encoder, DICT_SAMPLES
+from utils import parse_earthquake, index_earthquake, bump_dataset_version
+from precompute import schedule_precompute
+from logger_config import get_logger
+
+logger = get_logger(__name__)
+
+# Number of quakes read or written per Redis round trip
+CHUNK_SIZE = 1000
+
+COLUMNS = ('ids', 'time', 'mag', 'depth', 'longitude', 'latitude', 'mag_type')
+
+
+def _paths(prefix: str) -> tuple:
+    """
+    Return the (columns, features) file paths for a snapshot prefix.
+    """
+    return f"{prefix}.npz", f"{prefix}.features.ndjson.gz"
+
+
+def export_snapshot(prefix: str) -> int:
+    """
+    Dump every loaded quake and its index fields to a snapshot.
+
+    Args:
+        prefix (str): Path prefix for the snapshot files.
+
+    Returns:
+        int: Number of quakes written.
+    """
+    columns_path, features_path = _paths(prefix)
+    columns: Dict[str, List] = {name: [] for name in COLUMNS}
+
+    total = rd.zcard('earthquakes:by_time')
+    with gzip.open(features_path, 'wt', encoding='utf-8', compresslevel=1) as f:
+        for offset in range(0, total, CHUNK_SIZE):
+            quake_ids = rd.zrange('earthquakes:by_time', offset, offset + CHUNK_SIZE - 1)
+            if not quake_ids:
+                break
+
+            raw_docs = rd_bin.mget([f"earthquake:{quake_id}" for quake_id in quake_ids])
+            for raw in raw_docs:
+                if raw is None:
+                    continue
+                raw = decode_text(raw)
+                parsed = parse_earthquake(json.loads(raw))
+                if not parsed:
+                    continue
+
+                columns['ids'].append(parsed['quake_id'])
+                columns['time'].append(parsed['time'])
+                columns['mag'].append(parsed['mag'])
+                columns['depth'].append(parsed['depth'])
+                columns['longitude'].append(parsed['longitude'])
+                columns['latitude'].append(parsed['latitude'])
+                columns['mag_type'].append(parsed['mag_type'] or '')
+                f.write(raw)
+                f.write('\n')
+
+    np.savez(
+        columns_path,
+        ids=np.array(columns['ids'], dtype=str),
+        time=np.array(columns['time'], dtype=np.int64),
+        mag=np.array(columns['mag'], dtype=np.float64),
+        depth=np.array(columns['depth'], dtype=np.float64),
+        longitude=np.array(columns['longitude'], dtype=np.float64),
+        latitude=np.array(columns['latitude'], dtype=np.float64),
+        mag_type=np.array(columns['mag_type'], dtype=str),
+    )
+
+    count = len(columns['ids'])
+    logger.info(f"Exported {count} quakes to {columns_path} and {features_path}.")
+    return count
+
+
+def import_snapshot(prefix: str) -> int:
+    """
+    Bulk-load a snapshot into Redis using pipelined writes.
+
+    Indexes are rebuilt straight from the columns, so no feature is re-parsed.
+
+    Args:
+        prefix (str): Path prefix for the snapshot files.
+
+    Returns:
+        int: Number of quakes stored.
+
+    Raises:
+        ValueError: If the columns and features files disagree in length.
+    """
+    columns_path, features_path = _paths(prefix)
+
+    with np.load(columns_path) as npz:
+        columns = {name: npz[name] for name in COLUMNS}
+
+    with gzip.open(features_path, 'rt', encoding='utf-8') as f:
+        raw_docs = [line.rstrip('\n') for line in f]
+
+    count = len(columns['ids'])
+    if len(raw_docs) != count:
+        raise ValueError(
+            f"Snapshot mismatch: {count} columns rows but {len(raw_docs)} features."
+        )
+
+    encoder = document_encoder(lambda: random.sample(raw_docs, min(count, DICT_SAMPLES)))
+    pipe = rd.pipeline(transaction=False)
+    for i in range(count):
+        parsed = {
+            'quake_id': str(columns['ids'][i]),
+            'time': int(columns['time'][i]),
+            'mag': float(columns['mag'][i]),
+            'depth': float(columns['depth'][i]),
+            'longitude': float(columns['longitude'][i]),
+            'latitude': float(columns['latitude'][i]),
+        }
+        index_earthquake(pipe, parsed, encoder.encode(raw_docs[i]))
+
+        if (i + 1) % CHUNK_SIZE == 0:
+            pipe.execute()
+
+    # entire raw data in a single key, matching what POST /data stores
+    pipe.set('earthquakes:raw_data', encode('[' + ','.join(raw_docs) + ']'))
+    pipe.execute()
+    bump_dataset_version()
+    schedule_precompute()
+
+    logger.info(f"Imported {count} quakes from {columns_path}.")
+    return count
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Export or import an earthquake dataset snapshot.")
+    parser.add_argument('action', choices=['export', 'import'])
+    parser.add_argument('prefix', help="Path prefix for the snapshot files, e.g. snapshots/2025-03")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    if args.action == 'export':
+        count = export_snapshot(args.prefix)
+    else:
+        count = import_snapshot(args.prefix)
+    elapsed = time.perf_counter() - started
+
+    print(f"{args.action}: {count} quakes in {elapsed:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
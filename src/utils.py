@@ -1,13 +1,13 @@
 import json
-import re
-import time
-from collections import defaultdict
+import os
 from datetime import datetime, timedelta
 from typing import List, Dict, Optional, Any, Tuple
-import matplotlib.pyplot as plt
-import numpy as np
-import requests
-from redis_client import rd
+from redis_client import rd, rd_bin
+from codec import decode
+from request_stats import timed
+
+# USGS FDSN event service; point it at a local feed to run without network access
+USGS_BASE_URL = os.environ.get('USGS_BASE_URL', 'https://earthquake.usgs.gov/fdsnws/event/1')
 
 
 def parse_earthquake(item: Dict[str, Any]) -> Optional[Dict[str, Any]]:
@@ -59,6 +59,59 @@ def parse_earthquake(item: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         'mag_type': mag_type
     }
 
+# Incremented on every change to the loaded dataset; lives outside the
+# earthquakes:* namespace so DELETE /data does not reset it
+DATASET_VERSION_KEY = 'dataset:version'
+
+# Pub/sub channel announcing each new dataset version
+DATASET_EVENTS_CHANNEL = 'dataset:events'
+
+# ID of the most recent tile pyramid job; kept in db 0, since every key in
+# the results database must be a result hash
+LATEST_TILES_KEY = 'tiles:latest'
+
+def get_dataset_version(client=None) -> str:
+    """
+    Return the current dataset version, '0' if the dataset was never loaded.
+
+    Args:
+        client (optional): Decoded Redis client for db 0 to read from, e.g. rd_ro (default: rd).
+    """
+    return (client or rd).get(DATASET_VERSION_KEY) or '0'
+
+def bump_dataset_version() -> int:
+    """
+    Mark the dataset as changed and notify subscribers such as worker caches.
+
+    Returns:
+        int: The new dataset version.
+    """
+    version = rd.incr(DATASET_VERSION_KEY)
+    rd.publish(DATASET_EVENTS_CHANNEL, version)
+    return version
+
+def index_earthquake(pipe, parsed: Dict[str, Any], raw: str) -> None:
+    """
+    Queue the writes that store one quake and its index entries on a Redis pipeline.
+
+    Args:
+        pipe: A Redis pipeline (or client) bound to the earthquake database.
+        parsed (dict): Output of parse_earthquake for the quake.
+        raw (bytes or str): The quake's full GeoJSON feature, serialized and
+            optionally compressed with codec.document_encoder.
+    """
+    quake_id = parsed['quake_id']
+
+    # a single quake's entire JSON data
+    pipe.set(f"earthquake:{quake_id}", raw)
+
+    # index quake in set
+    pipe.sadd('earthquakes:ids', quake_id)
+    pipe.zadd('earthquakes:by_mag', {quake_id: parsed['mag']})
+    pipe.zadd('earthquakes:by_depth', {quake_id: parsed['depth']})
+    pipe.zadd('earthquakes:by_time', {quake_id: parsed['time']})
+    pipe.geoadd('earthquakes:geo', (parsed['longitude'], parsed['latitude'], quake_id))
+
 def parse_date_range(start_str: str, end_str: str) -> Tuple[int, int]:
     """
     Parse start and end date strings into millisecond timestamps.
@@ -79,12 +132,13 @@ def parse_date_range(start_str: str, end_str: str) -> Tuple[int, int]:
 
     return start_ms, end_ms
 
-def calculate_stats(quake_ids: List[str]) -> dict:
+def calculate_stats(quake_ids: List[str], client=None) -> dict:
     """
     Calculate stats from a list of earthquake IDs.
 
     Args:
         quake_ids (list): List of quake IDs (str) to retrieve and analyze.
+        client (optional): Undecoded Redis client to read from (default: the primary).
 
     Returns:
         dict: A dictionary containing:
@@ -100,12 +154,14 @@ def calculate_stats(quake_ids: List[str]) -> dict:
     min_depth = float('inf')
     magtype_counts = {}
 
+    client = client or rd_bin
     for quake_id in quake_ids:
-        quake_data = rd.get(f"earthquake:{quake_id}")
+        quake_data = client.get(f"earthquake:{quake_id}")
         if not quake_data:
             continue
 
-        quake_json = json.loads(quake_data)
+        with timed('json'):
+            quake_json = json.loads(decode(quake_data))
         parsed = parse_earthquake(quake_json)
         if not parsed:
             continue
@@ -130,169 +186,3 @@ def calculate_stats(quake_ids: List[str]) -> dict:
         'min_depth': min_depth if min_depth != float('inf') else None,
         'magtype_counts': magtype_counts
     }
-
-def generate_empty_plot(message: str = "No data available") -> tuple:
-    """
-    Generate an empty plot with a message in the center.
-
-    Args:
-        message (str): Text to display on the plot.
-    
-    Returns:
-        (fig, ax): Matplotlib figure and axes objects.
-    """
-    fig, ax = plt.subplots(figsize=(8, 6))
-    ax.text(0.5, 0.5, message, fontsize=15, ha='center', va='center', color='gray')
-    ax.axis('off')
-
-    return fig, ax
-
-def create_magnitude_plot(magnitudes: List[float], start_date: str, end_date: str):
-    """
-    Plot a histogram of earthquake magnitudes.
-
-    Args:
-        magnitudes (List[float]): List of earthquake magnitudes.
-        start_date (str): Start date in 'YYYY-MM-DD' format.
-        end_date (str): End date in 'YYYY-MM-DD' format.
-    Returns:
-        (fig, ax): Matplotlib figure and axis objects.
-    """
-    min_mag = 0
-    max_mag = 10
-    bins = np.arange(min_mag, max_mag + 1, 1)
-
-    fig, ax = plt.subplots(figsize=(8, 6))
-    ax.hist(magnitudes, bins=bins, edgecolor='black', color='#FF5733', alpha=0.7)
-    ax.set_title(f'Magnitude Distribution from {start_date} to {end_date}')
-    ax.set_xlabel('Magnitude')
-    ax.set_ylabel('Number of Earthquakes')
-    ax.set_xticks(bins)
-
-    return fig, ax
-
-def generate_magnitude_histogram_bytes(start_date: str, end_date: str) -> bytes:
-    """
-    Generates a histogram of earthquake magnitudes within date range
-    and returns as a PNG image in byte format.
-
-    Args:
-        start_date (str): in format YYYY-MM-DD e.g., '2025-03-01'
-        end_date (str): in format YYYY-MM-DD e.g., '2025-03-10'
-
-    Returns:
-        bytes: A PNG image in byte format
-    """
-    start_ms, end_ms = parse_date_range(start_date, end_date)
-    quake_ids = rd.zrangebyscore('earthquakes:by_time', start_ms, end_ms)
-
-    if not quake_ids:
-        fig, ax = generate_empty_plot("No data available")
-    else:
-        magnitudes = []
-        for quake_id in quake_ids:
-            key = f"earthquake:{quake_id}"
-            quake_data_raw = rd.get(key)
-            if quake_data_raw:
-                quake_data = json.loads(quake_data_raw)
-                mag = quake_data['properties'].get('mag')
-                if mag is not None:
-                    magnitudes.append(mag)
-
-        if magnitudes:
-            fig, ax = create_magnitude_plot(magnitudes, start_date, end_date)
-        else:
-            fig, ax = generate_empty_plot("No valid magnitudes")
-
-    file_path = f'output_image_{int(time.time())}.png'
-    fig.savefig(file_path)
-    plt.close(fig)
-
-    with open(file_path, 'rb') as f:
-        img_bytes = f.read()
-
-    return img_bytes
-
-# Create Occurrence by City Histogram
-def parse_earthquakes_by_city(start_date: str, end_date: str) -> dict:
-    """
-    Parse USGS earthquake data and return counts by city for a specified time range.
-
-    Inputs:
-        start_date: in format 'YYYY-MM-DD HH:MM:SS'
-        end_date: in format 'YYYY-MM-DD HH:MM:SS'
-
-    Returns:
-        dict with cities as keys and earthquake counts as values    
-    """
-    try:
-        # validate dates
-        datetime.strptime(start_date, '%Y-%m-%d %H:%M:%S')
-        datetime.strptime(end_date, '%Y-%m-%d %H:%M:%S')
-
-        # construct API URL
-        base_url = "https://earthquake.usgs.gov/fdsnws/event/1/query.geojson"
-        url = f"{base_url}?starttime={start_date}&endtime={end_date}&orderby=time"
-
-        # counter
-        city_counts = defaultdict(int)
-
-        # fetch and process data
-        response = requests.get(url)
-        if response.status_code != 200:
-            raise Exception(f"API request failed with status code: {response.status_code}")
-
-        data = response.json()
-
-        for feature in data['features']:
-            title = feature['properties']['title']
-            try:
-                # gets city name using regex pattern
-                location_part = title.split('-')[1].strip()
-                city_match = re.search(r'of\s+([^,]+)', location_part)
-                if city_match:
-                    city = city_match.group(1).strip()
-                    city_counts[city] += 1
-            except (IndexError, AttributeError):
-                continue
-
-        return dict(city_counts)
-
-    # error handling
-    except ValueError as e:
-        raise ValueError(f"Invalid date format: {str(e)}")
-    except Exception as e:
-        raise Exception(f"Error processing earthquake data: {str(e)}")
-
-def generate_city_quake_histogram_bytes(start_date: str, end_date: str) -> bytes:
-    """
-    Generates a horizontal bar chart of the top 10 cities by earthquake occurrence 
-    within the date range and returns the image as a PNG byte.
-
-    Args:
-        start_date (str): in format YYYY-MM-DD e.g., '2025-03-01'
-        end_date (str): in format YYYY-MM-DD e.g., '2025-03-10'
-
-    Returns:
-        bytes: A PNG image in byte format
-    """
-    data = parse_earthquakes_by_city(start_date, end_date)
-    top_cities = sorted(data.items(), key=lambda x: x[1], reverse=True)[:10]
-
-    cities = [city for city, count in top_cities]
-    counts = [count for city, count in top_cities]
-
-    # plot format
-    fig = plt.figure(figsize=(12, 6))
-    plt.barh(cities[::-1], counts[::-1], color='skyblue')  # city with max count on top
-    plt.xlabel('Number of Earthquakes')
-    plt.title(f'Top 10 Cities by Earthquake Occurrence\n({start_date} to {end_date})')
-
-    file_path = f'output_image_{int(time.time())}.png'
-    fig.savefig(file_path)
-    plt.close(fig)
-
-    with open(file_path, 'rb') as f:
-        img_bytes = f.read()
-
-    return img_bytes
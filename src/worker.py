@@ -1,64 +1,403 @@
-import time
+import os
+import signal
+import threading
 import json
-from jobs import get_job_by_id, update_job_status
-from utils import generate_magnitude_histogram_bytes, generate_city_quake_histogram_bytes
-from redis_client import q, res
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import numpy as np
+from jobs import (get_job_by_id, get_jobs_by_ids, update_job_status, is_cancel_requested, record_queue_wait,
+                  lane_weight, PRIORITIES, DEFAULT_PRIORITY)
+from plots import generate_magnitude_histogram, generate_city_quake_histogram, render_magnitude_histogram, ChartImage
+from redis_client import lanes, qdb, rd, res
+from images import content_etag
+from codec import encode
+from utils import LATEST_TILES_KEY, parse_date_range
+from quake_cache import cache
+from precompute import plan_reports, PLAN_JOB_TYPE
+from analytics import load_quake_arrays, depth_histogram, magnitude_depth_histogram, gutenberg_richter, tile_pyramid
 from logger_config import get_logger
 
 logger = get_logger(__name__)
 
 JOB_HANDLERS = {
-    'magnitude_distribution': generate_magnitude_histogram_bytes,
-    'earthquake_count_by_city': generate_city_quake_histogram_bytes
+    'magnitude_distribution': generate_magnitude_histogram,
+    'earthquake_count_by_city': generate_city_quake_histogram,
+    'depth_histogram': depth_histogram,
+    'magnitude_depth_histogram': magnitude_depth_histogram,
+    'gutenberg_richter': gutenberg_richter,
+    'tile_pyramid': tile_pyramid,
+    PLAN_JOB_TYPE: plan_reports,
 }
 
-@q.worker
+# Seconds a job may run before it is stopped and marked timed_out.
+# Override per type with JOB_DEADLINE_<JOB_TYPE>, e.g. JOB_DEADLINE_TILE_PYRAMID=300.
+JOB_DEADLINES = {
+    'magnitude_distribution': 60,
+    'earthquake_count_by_city': 120,
+    'depth_histogram': 30,
+    'magnitude_depth_histogram': 30,
+    'gutenberg_richter': 30,
+    'tile_pyramid': 120,
+    PLAN_JOB_TYPE: 60,
+}
+DEFAULT_JOB_DEADLINE = int(os.environ.get('JOB_DEADLINE_DEFAULT', 120))
+
+# Seconds between checks for a cancellation request while a job runs
+CANCEL_POLL_SECONDS = float(os.environ.get('CANCEL_POLL_SECONDS', 1))
+
+# Queued jobs of these types with overlapping date ranges share one data fetch
+COALESCE_JOB_TYPES = ('magnitude_distribution',)
+# Most jobs run over one fetch (1 disables coalescing)
+COALESCE_MAX_JOBS = int(os.environ.get('COALESCE_MAX_JOBS', 32))
+# Queue entries inspected for compatible jobs
+COALESCE_SCAN = int(os.environ.get('COALESCE_SCAN', 200))
+
+# Seconds an idle worker blocks on the queues before checking again
+QUEUE_POLL_SECONDS = int(os.environ.get('QUEUE_POLL_SECONDS', 5))
+
+class JobTimeout(Exception):
+    """Raised inside a job that ran past its deadline."""
+
+class JobCancelled(Exception):
+    """Raised inside a job that was cancelled while running."""
+
+class LaneScheduler:
+    """
+    Weighted fair choice between the priority lanes (smooth weighted round robin).
+
+    Each pick adds every lane's weight to its credit, then tries the lanes
+    from the most credit down and pops from the first that has a job. The
+    lane served pays back the total weight. A lane found empty gives up any
+    saved credit, so an idle lane cannot build up a burst. While all lanes
+    are backlogged each gets jobs in proportion to its weight, and a lane
+    with weight 0 only runs when the others are empty.
+    """
+
+    def __init__(self, weights: Optional[Dict[str, int]] = None) -> None:
+        self.weights = weights or {priority: lane_weight(priority) for priority in PRIORITIES}
+        self.credit = dict.fromkeys(self.weights, 0)
+
+    def _served(self, priority: str, skipped: List[str]) -> None:
+        for empty in skipped:
+            self.credit[empty] = min(self.credit[empty], 0)
+        self.credit[priority] -= sum(self.weights.values())
+
+    def next_job(self, timeout: int = QUEUE_POLL_SECONDS) -> Optional[Tuple[str, str]]:
+        """
+        Pop the next job ID, blocking up to `timeout` seconds when all lanes are empty.
+
+        Returns:
+            tuple or None: (priority, job ID), or None if no job arrived.
+        """
+        for priority, weight in self.weights.items():
+            self.credit[priority] += weight
+        # sorted() is stable, so ties go to the higher priority
+        order = sorted(self.weights, key=lambda priority: -self.credit[priority])
+        for index, priority in enumerate(order):
+            entry = qdb.lpop(lanes[priority].key)
+            if entry is not None:
+                self._served(priority, order[:index])
+                return priority, lanes[priority].serializer.loads(entry)
+
+        self.credit = dict.fromkeys(self.weights, 0)
+        keys = {lanes[priority].key: priority for priority in PRIORITIES}
+        popped = qdb.blpop(list(keys), timeout=timeout)
+        if popped is None:
+            return None
+        key, entry = popped
+        priority = keys[key.decode('utf-8') if isinstance(key, bytes) else key]
+        self._served(priority, [])
+        return priority, lanes[priority].serializer.loads(entry)
+
+def job_deadline(job_type: str) -> int:
+    """
+    Return the deadline in seconds for a job type.
+    """
+    override = os.environ.get(f"JOB_DEADLINE_{job_type.upper()}")
+    if override:
+        return int(override)
+    return JOB_DEADLINES.get(job_type, DEFAULT_JOB_DEADLINE)
+
+@contextmanager
+def job_guard(jid: str, deadline: int):
+    """
+    Interrupt the enclosed block with JobTimeout after `deadline` seconds, or
+    with JobCancelled once the job is flagged for cancellation.
+
+    Relies on signals, so it must run in the main thread.
+    """
+    def on_alarm(signum, frame):
+        raise JobTimeout(f"Job {jid} exceeded its {deadline}s deadline.")
+
+    def on_cancel(signum, frame):
+        raise JobCancelled(f"Job {jid} was cancelled.")
+
+    stop = threading.Event()
+    main_thread = threading.main_thread().ident
+
+    def watch_for_cancel():
+        while not stop.wait(CANCEL_POLL_SECONDS):
+            try:
+                # the job may have finished while the flag was being read
+                if is_cancel_requested(jid) and not stop.is_set():
+                    signal.pthread_kill(main_thread, signal.SIGUSR1)
+                    return
+            except Exception as e:
+                logger.warning(f"Cancel check for job {jid} failed: {e}")
+
+    previous_alarm = signal.signal(signal.SIGALRM, on_alarm)
+    previous_cancel = signal.signal(signal.SIGUSR1, on_cancel)
+    watcher = threading.Thread(target=watch_for_cancel, daemon=True)
+    signal.setitimer(signal.ITIMER_REAL, deadline)
+    watcher.start()
+    try:
+        yield
+    finally:
+        # the block is over: a late alarm or cancel signal must not raise
+        # here, where it would skip restoring the handlers
+        signal.signal(signal.SIGUSR1, signal.SIG_IGN)
+        signal.signal(signal.SIGALRM, signal.SIG_IGN)
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        stop.set()
+        watcher.join()
+        signal.signal(signal.SIGALRM, previous_alarm)
+        signal.signal(signal.SIGUSR1, previous_cancel)
+
+def _store_result(jid: str, results) -> None:
+    """
+    Save a handler's result in the results database.
+    """
+    # storage depends on result type
+    if isinstance(results, dict):
+        # tiles are stored as separate hash fields so each one can be fetched alone
+        tiles = results.pop('tiles', None)
+        content = json.dumps(results)
+        mapping = {
+            'type': 'json',
+            'content': encode(content),
+            'etag': content_etag(content.encode('utf-8')),
+        }
+        if tiles:
+            mapping.update({f'tile:{key}': encode(json.dumps(tile)) for key, tile in tiles.items()})
+        res.hset(jid, mapping=mapping)
+        if tiles is not None:
+            rd.set(LATEST_TILES_KEY, jid)
+    elif isinstance(results, ChartImage):
+        # PNG is already compressed, so it is stored as is; the plotted data
+        # lets images.get_image draw other formats of the same figure
+        res.hset(jid, mapping={
+            'type': 'image',
+            'content': results.png,
+            'etag': content_etag(results.png),
+            'chart': encode(json.dumps(results.chart)),
+        })
+    else:
+        raise ValueError(f"Unsupported result type for job {jid}.")
+
+def _run_guarded(jid: str, deadline: int, compute: Callable[[], Any]) -> None:
+    """
+    Compute and store one job's result under its deadline, then record its final status.
+    """
+    try:
+        with job_guard(jid, deadline):
+            results = compute()
+        logger.info(f"Results type for job {jid}: {type(results)}")
+        _store_result(jid, results)
+        update_job_status(jid, 'complete')
+        logger.info(f"Job {jid} completed.")
+
+    except JobTimeout as e:
+        logger.warning(str(e))
+        update_job_status(jid, 'timed_out')
+    except JobCancelled as e:
+        logger.info(str(e))
+        update_job_status(jid, 'cancelled')
+    except Exception as e:
+        logger.exception(f"Job {jid} failed: {e}")
+        update_job_status(jid, 'failed')
+
+def _skip_if_cancelled(jid: str, job_data: Optional[dict]) -> bool:
+    """
+    Return True, marking the job cancelled, if it was cancelled while queued.
+    """
+    if job_data and (job_data.get('status') == 'cancelled' or job_data.get('cancel_requested')):
+        # cancelled after a worker had already taken it off the queue
+        if job_data.get('status') != 'cancelled':
+            update_job_status(jid, 'cancelled')
+        logger.info(f"Skipping cancelled job {jid}.")
+        return True
+    return False
+
+def _coalescable_range(job_data: Optional[dict]) -> Optional[Tuple[int, int]]:
+    """
+    Return the job's (start_ms, end_ms) if it may share a data fetch with others.
+    """
+    if not job_data or job_data.get('type') not in COALESCE_JOB_TYPES or job_data.get('params'):
+        return None
+    if job_data.get('status') != 'submitted' or job_data.get('cancel_requested'):
+        return None
+    try:
+        return parse_date_range(job_data['start'], job_data['end'])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+def _select_overlapping(lead: dict, lead_range: Tuple[int, int],
+                        candidates: List[Tuple[Any, dict, Tuple[int, int]]],
+                        limit: int) -> List[Tuple[Any, dict, Tuple[int, int]]]:
+    """
+    Pick queued jobs of the lead's type whose ranges overlap the growing union range.
+
+    Args:
+        lead (dict): The job this worker is about to run.
+        lead_range (tuple): Its (start_ms, end_ms).
+        candidates (list): (queue entry, job dict, (start_ms, end_ms)) of queued jobs.
+        limit (int): Most jobs to pick.
+
+    Returns:
+        list: The chosen candidates.
+    """
+    lo, hi = lead_range
+    chosen = []
+    remaining = [c for c in candidates if c[1].get('type') == lead.get('type')]
+    grew = True
+    while grew and len(chosen) < limit:
+        grew = False
+        for candidate in list(remaining):
+            start_ms, end_ms = candidate[2]
+            if start_ms <= hi and end_ms >= lo:
+                chosen.append(candidate)
+                remaining.remove(candidate)
+                lo, hi = min(lo, start_ms), max(hi, end_ms)
+                grew = True
+                if len(chosen) == limit:
+                    break
+    return chosen
+
+def _claim_overlapping(lead: dict, lead_range: Tuple[int, int]) -> List[Tuple[dict, Tuple[int, int]]]:
+    """
+    Take queued jobs that can share the lead job's data fetch off its lane.
+
+    Each job is claimed with LREM, so a job another worker popped meanwhile
+    is left to that worker.
+    """
+    lane = lanes[lead.get('priority', DEFAULT_PRIORITY)]
+    entries = qdb.lrange(lane.key, 0, COALESCE_SCAN - 1)
+    if not entries:
+        return []
+    jids = [lane.serializer.loads(entry) for entry in entries]
+    jobs = get_jobs_by_ids(jids)
+
+    candidates = []
+    for entry, jid in zip(entries, jids):
+        job_range = _coalescable_range(jobs.get(jid))
+        if job_range is not None:
+            candidates.append((entry, jobs[jid], job_range))
+
+    claimed = []
+    for entry, job_data, job_range in _select_overlapping(lead, lead_range, candidates, COALESCE_MAX_JOBS - 1):
+        if qdb.lrem(lane.key, 1, entry):
+            claimed.append((job_data, job_range))
+    return claimed
+
+def _run_coalesced(batch: List[Tuple[dict, Tuple[int, int]]]) -> None:
+    """
+    Run magnitude histogram jobs over one fetch of their union date range.
+    """
+    for job_data, _ in batch:
+        update_job_status(job_data['id'], 'in progress')
+        record_queue_wait(job_data)
+
+    lead_jid = batch[0][0]['id']
+    first = min(batch, key=lambda item: item[1][0])[0]['start']
+    last = max(batch, key=lambda item: item[1][1])[0]['end']
+    logger.info(f"Coalesced {len(batch)} magnitude_distribution jobs over {first} to {last}.")
+
+    deadline = job_deadline('magnitude_distribution')
+    shared = {}
+
+    def magnitudes_in(job_range: Tuple[int, int]):
+        # the arrays are sorted by time, so each job's range is a slice
+        times = shared['time']
+        lo = np.searchsorted(times, job_range[0], side='left')
+        hi = np.searchsorted(times, job_range[1], side='right')
+        return shared['mag'][lo:hi]
+
+    def fetch():
+        shared.update(load_quake_arrays(first, last, fields=('mag',)))
+        lead, lead_range = batch[0]
+        return render_magnitude_histogram(magnitudes_in(lead_range), lead['start'], lead['end'])
+
+    # the lead job pays for the fetch; overlapping ranges chain together, so
+    # their union is no longer than all of them end to end, and the fetch
+    # gets every job's share of time
+    _run_guarded(lead_jid, deadline * len(batch), fetch)
+
+    for job_data, job_range in batch[1:]:
+        jid = job_data['id']
+        if not shared:
+            # the fetch failed; these jobs run on their own
+            _run_guarded(jid, deadline, lambda: generate_magnitude_histogram(job_data['start'], job_data['end']))
+        elif is_cancel_requested(jid):
+            update_job_status(jid, 'cancelled')
+        else:
+            _run_guarded(jid, deadline, lambda: render_magnitude_histogram(
+                magnitudes_in(job_range), job_data['start'], job_data['end']))
+
 def do_work(jid: str) -> None:
     logger.info(f"Processing job: {jid}")
+
+    job_data = get_job_by_id(jid)
+    if _skip_if_cancelled(jid, job_data):
+        return
+
+    lead_range = _coalescable_range(job_data)
+    if lead_range is not None and COALESCE_MAX_JOBS > 1:
+        batch = _claim_overlapping(job_data, lead_range)
+        if batch:
+            _run_coalesced([(job_data, lead_range)] + batch)
+            return
+
     update_job_status(jid, 'in progress')
+    record_queue_wait(job_data)
 
-    try:
-        job_data = get_job_by_id(jid)
+    job_type = job_data.get('type') if job_data else None
+    logger.info(f"Job {jid} type: {job_type}")
+
+    def compute():
         if not job_data:
             raise ValueError(f"No job data found for jid: {jid}")
 
-        job_type = job_data.get('type')
         start_date = job_data.get('start')
         end_date = job_data.get('end')
-
-        logger.info(f"Job {jid} type: {job_type}")
-
         if not start_date or not end_date:
-            raise ValueError("Missing start or end date") 
+            raise ValueError("Missing start or end date")
 
         handler = JOB_HANDLERS.get(job_type)
         if not handler:
             raise ValueError(f"Unsupported job type: {job_type}")
 
-        results = handler(start_date, end_date)
-        logger.info(f"Results type for job {jid}: {type(results)}")
-
-        # storage depends on result type
-        if isinstance(results, dict):
-            res.hset(jid, mapping={
-                'type': 'json',
-                'content': json.dumps(results),
-            })
-        elif isinstance(results, bytes):
-            res.hset(jid, mapping={
-                'type': 'image',
-                'content': results,
-            })
-        else:
-            raise ValueError(f"Unsupported result type for job {jid}.")
+        return handler(start_date, end_date, **job_data.get('params', {}))
 
-        update_job_status(jid, 'complete')
-        logger.info(f"Job {jid} completed.")
+    _run_guarded(jid, job_deadline(job_type or ''), compute)
 
-    except Exception as e:
-        logger.exception(f"Job {jid} failed: {e}")
-        update_job_status(jid, 'failed')
+def run() -> None:
+    """
+    Take jobs from the priority lanes and run them, forever.
+    """
+    scheduler = LaneScheduler()
+    logger.info(f"Worker is listening for jobs (lane weights {scheduler.weights})...")
+    while True:
+        picked = scheduler.next_job()
+        if picked is None:
+            continue
+        priority, jid = picked
+        logger.debug(f"Took {priority} job {jid}.")
+        try:
+            do_work(jid)
+        except Exception:
+            # a job's own errors are handled in do_work; keep serving the queues
+            logger.exception(f"Unhandled error processing job {jid}.")
 
 if __name__ == "__main__":
-    logger.info("Worker is listening for jobs...")
-    do_work()
+    cache.start()
+    run()
@@ -0,0 +1,74 @@
+import pytest
+import numpy as np
+from unittest.mock import patch
+import os
+import sys
+
+#gets related modules from src directory
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+from analytics import depth_histogram, magnitude_depth_histogram, gutenberg_richter, tile_pyramid
+
+def mock_index(mock_rd, mags, depths): #serves mags/depths as zset scores
+    ids = [str(i) for i in range(len(mags))]
+    mock_rd.zrangebyscore.return_value = [(quake_id, 1740787200000 + i) for i, quake_id in enumerate(ids)]
+    scores = {'earthquakes:by_mag': dict(zip(ids, mags)), 'earthquakes:by_depth': dict(zip(ids, depths))}
+    mock_rd.zmscore.side_effect = lambda key, members: [scores[key][m] for m in members]
+
+@patch('analytics.rd') #creates mock redis object for test
+def test_depth_histogram(mock_rd):
+    mock_index(mock_rd, [1.0, 2.0, 3.0, 4.0], [0.6, 5.0, 12.0, 35.0])
+
+    result = depth_histogram('2025-03-01', '2025-03-02', bin_width=10)
+    assert result['bin_edges'] == [0.0, 10.0, 20.0, 30.0, 40.0]
+    assert result['counts'] == [2, 1, 0, 1]
+    assert result['total'] == 4
+
+@patch('analytics.rd') #creates mock redis object for test
+def test_depth_histogram_bin_limit(mock_rd): #a tiny bin over the data range fails instead of allocating billions of edges
+    mock_index(mock_rd, [1.0, 2.0], [0.0, 700.0])
+
+    with pytest.raises(ValueError, match="bins exceed"):
+        depth_histogram('2025-03-01', '2025-03-02', bin_width=1e-9)
+
+@patch('analytics.rd') #creates mock redis object for test
+def test_magnitude_depth_histogram(mock_rd):
+    mock_index(mock_rd, [1.2, 1.4, 3.1], [5.0, 60.0, 70.0])
+
+    result = magnitude_depth_histogram('2025-03-01', '2025-03-02', mag_bin_width=1, depth_bin_width=50)
+    assert result['mag_edges'] == [1.0, 2.0, 3.0, 4.0]
+    assert result['depth_edges'] == [0.0, 50.0, 100.0]
+    assert result['counts'] == [[1, 1], [0, 0], [0, 1]]
+
+@patch('analytics.rd') #creates mock redis object for test
+def test_gutenberg_richter_recovers_b_value(mock_rd):
+    # magnitudes binned at 0.1 from a b = 1 distribution complete above 2.0
+    rng = np.random.default_rng(0)
+    mags = np.round(1.95 + rng.exponential(1 / np.log(10), 20000), 1)
+    mock_index(mock_rd, mags.tolist(), [10.0] * mags.size)
+
+    result = gutenberg_richter('2025-03-01', '2025-03-31', mc=2.0)
+    assert result['n_above_mc'] == mags.size
+    assert result['b_value'] == pytest.approx(1.0, abs=0.05)
+    assert result['b_uncertainty'] < 0.05
+    assert result['cumulative_counts'][0] == mags.size
+
+@patch('analytics.rd') #creates mock redis object for test
+def test_analytics_empty_range(mock_rd):
+    mock_rd.zrangebyscore.return_value = []
+
+    assert depth_histogram('2025-03-01', '2025-03-02')['counts'] == [0]
+    assert gutenberg_richter('2025-03-01', '2025-03-02')['b_value'] is None
+
+@patch('analytics.rd') #creates mock redis object for test
+def test_tile_pyramid(mock_rd):
+    mock_index(mock_rd, [1.0, 4.5, 2.0], [5.0, 5.0, 5.0])
+    # two quakes in the north-west quadrant, one in the south-east
+    mock_rd.geopos.return_value = [(-120.0, 35.0), (-119.9, 35.1), (100.0, -20.0)]
+
+    result = tile_pyramid('2025-03-01', '2025-03-02', max_zoom=1, cell_bits=2)
+    tiles = result['tiles']
+    assert result['tile_counts'] == {0: 1, 1: 2}
+    assert tiles['0/0/0']['count'] == 3
+    assert tiles['0/0/0']['max_mag'] == 4.5
+    assert tiles['1/0/0'] == {'count': 2, 'max_mag': 4.5, 'cells': [[1, 3, 2, 4.5]]}
+    assert tiles['1/1/1']['count'] == 1
@@ -1,6 +1,7 @@
 import os
 import time
 import re
+import json
 import requests
 import pytest
 
@@ -36,6 +37,19 @@ def test_get_quake_data():
     assert isinstance(response.json(), dict)
     assert response.json().get('id') == quake_id
 
+def test_export_quakes():
+    response = requests.get(f"{api_prefix}/quakes/export?start=2025-03-01&end=2025-03-01")
+    assert response.status_code == 200
+    lines = response.text.splitlines()
+    assert len(lines) == int(response.headers["X-Total-Count"])
+    if lines:
+        assert "id" in json.loads(lines[0])
+
+def test_export_quakes_csv():
+    response = requests.get(f"{api_prefix}/quakes/export?format=csv")
+    assert response.status_code == 200
+    assert response.text.splitlines()[0].startswith("id,time,mag")
+
 def submit_test_job():
     payload = {
         "start_date": "2025-03-01",
@@ -60,8 +74,28 @@ def test_get_job():
     assert job["id"] == jid
     assert job["status"] in ["submitted", "in progress", "complete", "failed"]
 
+def test_submit_internal_job_type_rejected():
+    payload = {"start_date": "2025-03-01", "end_date": "2025-03-31", "job_type": "precompute_reports"}
+    response = requests.post(f"{api_prefix}/jobs", json=payload)
+    assert response.status_code == 400
+    response = requests.post(f"{api_prefix}/jobs/batch", json=[payload])
+    assert response.status_code == 400
+
+def test_submit_invalid_params_rejected():
+    payload = {"start_date": "2025-03-01", "end_date": "2025-03-31", "job_type": "depth_histogram"}
+    for params in ({"bins": 10}, {"bin_width": "10"}):
+        response = requests.post(f"{api_prefix}/jobs", json={**payload, "params": params})
+        assert response.status_code == 400
+        response = requests.post(f"{api_prefix}/jobs/batch", json=[{**payload, "params": params}])
+        assert response.status_code == 400
+
 def test_help_info():
     response = requests.get(f"{api_prefix}/help")
     assert response.ok
     assert response.status_code == 200
     assert bool(re.search('Submit a new job', response.text))
+
+def test_help_revalidates():
+    response = requests.get(f"{api_prefix}/help")
+    cached = requests.get(f"{api_prefix}/help", headers={"If-None-Match": response.headers["ETag"]})
+    assert cached.status_code == 304
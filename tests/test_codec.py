@@ -0,0 +1,79 @@
+import pytest
+import json
+from unittest.mock import patch, MagicMock
+import os
+import sys
+
+#gets related modules from src directory
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+import codec
+from codec import encode, decode, decode_text, MARKER
+
+DOCUMENT = json.dumps({
+    "type": "Feature",
+    "properties": {"mag": 1.7, "place": "12 km NNE of Town, CA", "time": 1740959984000,
+                   "magType": "ml", "title": "M 1.7 - 12 km NNE of Town, CA", "status": "reviewed"},
+    "geometry": {"type": "Point", "coordinates": [-148.4734, 69.1513, 0.6]},
+    "id": "ak0253abcdef",
+})
+
+def test_round_trip(): #encoded values are marked and decode to the original
+    encoded = encode(DOCUMENT * 4)
+    assert encoded.startswith(MARKER)
+    assert len(encoded) < len(DOCUMENT * 4)
+    assert decode_text(encoded) == DOCUMENT * 4
+
+def test_legacy_values_pass_through(): #values stored before compression still read
+    assert decode(DOCUMENT.encode()) == DOCUMENT.encode()
+    assert decode_text(DOCUMENT) == DOCUMENT
+    assert decode(b"\x89PNG\r\n") == b"\x89PNG\r\n"
+    assert decode(None) is None
+
+def test_small_values_stored_as_is(): #compression is skipped below the size threshold
+    assert encode('{"a": 1}') == b'{"a": 1}'
+
+@patch('codec.STORAGE_CODEC', 'zlib')
+def test_zlib_fallback(): #zlib is used when zstd is not selected
+    encoded = encode(DOCUMENT * 4)
+    assert encoded[:2] == MARKER + codec.ZLIB
+    assert decode_text(encoded) == DOCUMENT * 4
+
+@patch('codec.STORAGE_CODEC', 'none')
+def test_compression_disabled():
+    assert encode(DOCUMENT * 4) == (DOCUMENT * 4).encode()
+
+def _fake_redis(store):
+    client = MagicMock()
+    client.get.side_effect = store.get
+    client.set.side_effect = store.__setitem__
+    client.pipeline.return_value = client
+    return client
+
+#tests that a dictionary trained after a flush never reuses a cached dictionary's id
+@pytest.mark.skipif(codec.zstandard is None, reason="needs zstandard")
+def test_retrain_after_flush():
+    store = {}
+    samples = [DOCUMENT.replace("1.7", f"{i / 100:.2f}").replace("Town", f"Town{i % 40}") for i in range(600)]
+    with patch('codec.rd_bin', _fake_redis(store)), patch('codec._dicts', {}):
+        first = codec.train_dictionary(samples)
+        encode(DOCUMENT, first)  # this process now caches the first dictionary
+
+        store.clear()  # Redis is flushed and the data reloaded
+        second = codec.train_dictionary([s.replace("reviewed", "automatic") for s in samples])
+        assert second != first
+        encoded = encode(DOCUMENT, second)
+        assert encoded[1:2] == codec.ZSTD_DICT
+
+        # a fresh process loads the new dictionary from Redis and can read the value
+        codec._dicts.clear()
+        codec._local.__dict__.clear()
+        assert decode_text(encoded) == DOCUMENT
+
+#tests that samples are only built when a dictionary has to be trained
+@pytest.mark.skipif(codec.zstandard is None, reason="needs zstandard")
+@patch('codec.STORAGE_CODEC', 'zstd')
+@patch('codec.current_dictionary', return_value=7)
+def test_document_encoder_skips_samples_with_dictionary(mock_current):
+    sample = MagicMock(return_value=[DOCUMENT] * 200)
+    assert codec.document_encoder(sample).dict_id == 7
+    sample.assert_not_called()
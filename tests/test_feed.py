@@ -0,0 +1,23 @@
+import sys
+import os
+#the synthetic feed lives with the benchmarks
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../benchmarks')))
+from feed import SyntheticCatalog
+from utils import parse_earthquake
+
+def test_catalog_is_deterministic(): #same size and seed give the same quakes
+    assert SyntheticCatalog(50, seed=7).feature(12) == SyntheticCatalog(50, seed=7).feature(12)
+    assert SyntheticCatalog(50, seed=7).feature(12) != SyntheticCatalog(50, seed=8).feature(12)
+
+def test_features_parse_like_usgs(): #every generated quake is accepted by ingest
+    catalog = SyntheticCatalog(500)
+    for feature in catalog.features(range(catalog.size)):
+        assert parse_earthquake(feature) is not None
+
+def test_select_time_window(): #windows are newest first and honor limit
+    catalog = SyntheticCatalog(1000)
+    start, end = int(catalog.time[100]), int(catalog.time[199])
+    indexes, offset = catalog.select(start, end, limit=10)
+    assert offset == 0
+    assert list(indexes) == list(range(199, 189, -1))
@@ -0,0 +1,62 @@
+import gzip
+from flask import Flask, Response, jsonify, request
+import os
+import sys
+
+#gets related modules from src directory
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+from http_cache import conditional, not_modified, init_app
+
+VERSION = {'value': '1'}
+CALLS = []
+
+app = Flask(__name__)
+init_app(app)
+
+@app.route('/items')
+@conditional(lambda: VERSION['value'])
+def items(): #large enough body to be compressed
+    CALLS.append(1)
+    return jsonify(list(range(2000)))
+
+@app.route('/image.svg')
+def image(): #tags its own response, like /download
+    cached = not_modified('abc')
+    if cached is not None:
+        return cached
+    response = Response('<svg>' + ' ' * 2000 + '</svg>', mimetype='image/svg+xml')
+    response.set_etag('abc')
+    return response.make_conditional(request)
+
+def test_not_modified_skips_view():
+    client = app.test_client()
+    first = client.get('/items')
+    assert first.status_code == 200
+    etag = first.headers['ETag']
+
+    CALLS.clear()
+    again = client.get('/items', headers={'If-None-Match': etag})
+    assert again.status_code == 304
+    assert CALLS == []
+
+    VERSION['value'] = '2'
+    changed = client.get('/items', headers={'If-None-Match': etag})
+    assert changed.status_code == 200
+
+def test_gzip_compression():
+    client = app.test_client()
+    response = client.get('/items', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert response.headers['ETag'].endswith('-gzip"')
+    assert gzip.decompress(response.data).startswith(b'[0,')
+
+    cached = client.get('/items', headers={'Accept-Encoding': 'gzip', 'If-None-Match': response.headers['ETag']})
+    assert cached.status_code == 304
+
+def test_compressed_tag_revalidates(): #a view that sets its own ETag still answers the gzip tag with 304
+    client = app.test_client()
+    response = client.get('/image.svg', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['ETag'] == '"abc-gzip"'
+
+    cached = client.get('/image.svg', headers={'Accept-Encoding': 'gzip', 'If-None-Match': response.headers['ETag']})
+    assert cached.status_code == 304
@@ -0,0 +1,73 @@
+import pytest
+import io
+import numpy as np
+from unittest.mock import patch
+import os
+import sys
+
+#gets related modules from src directory
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+from images import get_image, content_etag, variant_width
+
+def make_png(width=40, height=20): #small in-memory PNG for tests
+    from PIL import Image
+    buf = io.BytesIO()
+    Image.new('RGB', (width, height), 'white').save(buf, format='PNG')
+    return buf.getvalue()
+
+@patch('images.res') #mock object for test
+def test_get_image_original(mock_res):
+    png = make_png()
+    mock_res.hmget.return_value = [png, b'abc']
+
+    content, etag = get_image("job-1")
+    assert content == png
+    assert etag == 'abc'
+    mock_res.hset.assert_not_called()
+
+@patch('images.res') #mock object for test
+def test_get_image_variant_is_cached(mock_res):
+    png = make_png()
+    mock_res.hmget.return_value = [None, None]
+    mock_res.hget.return_value = png
+
+    content, etag = get_image("job-1", 'webp', 32)
+    assert content[8:12] == b'WEBP'
+    assert etag == content_etag(content)
+    mapping = mock_res.hset.call_args.kwargs['mapping']
+    assert mapping == {'content:webp:32': content, 'etag:webp:32': etag}
+
+def test_variant_width(): #requested widths share a few cached variants
+    assert variant_width(16) == 16
+    assert variant_width(17) == 32
+    assert variant_width(400) == 512
+    assert variant_width(4096) == 4096
+
+@patch('images.res') #mock object for test
+def test_get_image_width_is_rounded(mock_res):
+    mock_res.hmget.return_value = [None, None]
+    mock_res.hget.return_value = make_png()
+
+    get_image("job-1", 'png', 30)
+    mock_res.hmget.assert_called_once_with("job-1", ['content:png:32', 'etag:png:32'])
+
+@patch('images.res') #mock object for test
+def test_get_image_svg_from_stored_chart(mock_res):
+    import json
+    from plots import render_magnitude_histogram
+    image = render_magnitude_histogram(np.array([1.5, 2.5, 2.7]), "2025-03-01", "2025-03-02")
+    mock_res.hmget.return_value = [None, None]
+    mock_res.hget.return_value = json.dumps(image.chart).encode()
+
+    content, etag = get_image("job-1", 'svg')
+    assert content.startswith(b'<?xml')
+    assert b'2025-03-01' in content
+    mock_res.hget.assert_called_once_with("job-1", 'chart')
+
+@patch('images.res') #mock object for test
+def test_get_image_svg_needs_chart(mock_res):
+    mock_res.hmget.return_value = [None, None]
+    mock_res.hget.return_value = None
+
+    with pytest.raises(ValueError):
+        get_image("job-1", 'svg')
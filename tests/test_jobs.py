@@ -5,7 +5,9 @@ import sys
 import os
 #get related jobs files/functionalities from src directory
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
-from jobs import _generate_jid, _instantiate_job, add_job, get_job_by_id, update_job_status
+import redis
+import jobs
+from jobs import _generate_jid, _instantiate_job, add_job, add_jobs, get_job_by_id, get_jobs_by_ids, update_job_status, cancel_job, check_params, QueueFullError
 
 TEST_JOB_DATA = {
     "id": "abc-123",
@@ -15,6 +17,11 @@ TEST_JOB_DATA = {
     "type": "test_job_type"
 }
 
+def _watched(mock_jdb, *records): #pipeline used for WATCH/MULTI updates; each read returns the next record
+    pipe = mock_jdb.pipeline.return_value.__enter__.return_value
+    pipe.get.side_effect = [json.dumps(record) for record in records]
+    return pipe
+
 def test_generate_jid(): #tests job_id is the correct length/format
     jid = _generate_jid()
     assert isinstance(jid, str)
@@ -26,9 +33,11 @@ def test_instantiate_job(): #tests the validity of job creation
     assert job == TEST_JOB_DATA
 
 #tests that jobs are being added to the queue and redis db
-@patch('jobs.q') #patch creates mock objects for test
+@patch('jobs.lanes') #patch creates mock objects for test
 @patch('jobs.jdb')
-def test_add_job(mock_jdb, mock_q): # patch decorator affect db order
+def test_add_job(mock_jdb, mock_lanes): # patch decorator affect db order
+    mock_q = mock_lanes["interactive"]
+    mock_q.__len__.return_value = 0
     mock_jdb.set = MagicMock()
     mock_q.put = MagicMock()
 
@@ -48,9 +57,125 @@ def test_get_job_by_id(mock_jdb): #tests that a user can get the correct info fo
 
 @patch('jobs.jdb') #mock object for test
 def test_update_job_status(mock_jdb): #tests that accurate job statuses are being given
-    mock_jdb.get.return_value = json.dumps(TEST_JOB_DATA)
-    mock_jdb.set = MagicMock()
+    pipe = _watched(mock_jdb, TEST_JOB_DATA)
 
     update_job_status("abc-123", "complete")
-    updated = json.loads(mock_jdb.set.call_args[0][1])
+    updated = json.loads(pipe.set.call_args[0][1])
     assert updated["status"] == "complete"
+
+#tests that new jobs are rejected once the queue is full
+@patch('jobs.lanes')
+@patch('jobs.jdb')
+def test_add_job_rejects_when_queue_full(mock_jdb, mock_lanes):
+    mock_q = mock_lanes["interactive"]
+    mock_q.__len__.return_value = jobs.MAX_QUEUE_DEPTH
+
+    with pytest.raises(QueueFullError) as excinfo:
+        add_job("2025-03-01", "2025-03-03", "test_job_type")
+    assert excinfo.value.retry_after == jobs.QUEUE_RETRY_AFTER
+    mock_jdb.set.assert_not_called()
+    mock_q.put.assert_not_called()
+
+#tests that a queued job is removed from the queue and marked cancelled
+@patch('jobs.qdb')
+@patch('jobs.lanes')
+@patch('jobs.jdb')
+def test_cancel_queued_job(mock_jdb, mock_lanes, mock_qdb):
+    mock_jdb.get.return_value = json.dumps(TEST_JOB_DATA)
+    _watched(mock_jdb, TEST_JOB_DATA)
+    mock_qdb.lrem.return_value = 1
+
+    job = cancel_job("abc-123")
+    assert job["status"] == "cancelled"
+    mock_qdb.lrem.assert_called_once()
+
+#tests that a running job is flagged for the worker instead
+@patch('jobs.qdb')
+@patch('jobs.jdb')
+def test_cancel_running_job(mock_jdb, mock_qdb):
+    mock_jdb.get.return_value = json.dumps({**TEST_JOB_DATA, "status": "in progress"})
+    _watched(mock_jdb, {**TEST_JOB_DATA, "status": "in progress"})
+
+    job = cancel_job("abc-123")
+    assert job["status"] == "in progress"
+    assert job["cancel_requested"] is True
+    mock_qdb.lrem.assert_not_called()
+
+#tests that a cancel racing a worker's final status does not overwrite it
+@patch('jobs.qdb')
+@patch('jobs.jdb')
+def test_cancel_does_not_overwrite_completed_job(mock_jdb, mock_qdb):
+    running = {**TEST_JOB_DATA, "status": "in progress"}
+    mock_jdb.get.return_value = json.dumps(running)
+    #the worker saves "complete" after the first read, so the first EXEC fails
+    pipe = _watched(mock_jdb, running, {**TEST_JOB_DATA, "status": "complete"})
+    pipe.execute.side_effect = [redis.WatchError()]
+
+    job = cancel_job("abc-123")
+    assert job["status"] == "complete"
+    assert "cancel_requested" not in job
+    assert pipe.execute.call_count == 1
+
+#tests that a batch is saved through one pipeline and queued with one push
+@patch('jobs.lanes')
+@patch('jobs.jdb')
+def test_add_jobs(mock_jdb, mock_lanes):
+    mock_q = mock_lanes["interactive"]
+    mock_q.__len__.return_value = 0
+    specs = [{"start": "2025-03-01", "end": "2025-03-03", "type": "test_job_type"}] * 3
+
+    created = add_jobs(specs)
+    assert len(created) == 3
+    assert len(mock_jdb.pipeline.return_value.set.call_args_list) == 3
+    mock_jdb.pipeline.return_value.execute.assert_called_once()
+    mock_q.put.assert_called_once_with(*(job["id"] for job in created))
+
+@patch('jobs.jdb') #tests that many jobs are looked up with one MGET
+def test_get_jobs_by_ids(mock_jdb):
+    mock_jdb.mget.return_value = [json.dumps(TEST_JOB_DATA), None]
+
+    found = get_jobs_by_ids(["abc-123", "missing"])
+    assert found == {"abc-123": TEST_JOB_DATA, "missing": None}
+
+@patch('jobs.jdb') #tests that start and finish times are recorded with the status
+def test_update_job_status_timestamps(mock_jdb):
+    pipe = _watched(mock_jdb, TEST_JOB_DATA, TEST_JOB_DATA)
+
+    update_job_status("abc-123", "in progress")
+    assert "started_at" in json.loads(pipe.set.call_args[0][1])
+
+    update_job_status("abc-123", "failed")
+    assert "finished_at" in json.loads(pipe.set.call_args[0][1])
+
+#tests that each priority has its own queue and its own depth limit
+@patch('jobs.lanes', {"interactive": MagicMock(), "bulk": MagicMock(), "background": MagicMock()})
+@patch('jobs.jdb')
+def test_add_job_priority_lanes(mock_jdb):
+    jobs.lanes["interactive"].__len__.return_value = 0
+    jobs.lanes["bulk"].__len__.return_value = jobs.MAX_QUEUE_DEPTH
+
+    job = add_job("2025-03-01", "2025-03-03", "test_job_type")
+    assert job["priority"] == "interactive"
+    jobs.lanes["interactive"].put.assert_called_once_with(job["id"])
+
+    with pytest.raises(QueueFullError) as excinfo:
+        add_job("2025-03-01", "2025-03-03", "test_job_type", priority="bulk")
+    assert excinfo.value.priority == "bulk"
+    jobs.lanes["bulk"].put.assert_not_called()
+
+def test_check_params(): #params are checked against the handler's keyword arguments
+    assert check_params("gutenberg_richter", {"bin_width": 0.1, "mc": None}) is None
+    assert check_params("depth_histogram", {"bin_width": 5}) is None
+    assert "Unknown param" in check_params("depth_histogram", {"bins": 5})
+    assert "Unknown param" in check_params("magnitude_distribution", {"bin_width": 0.1})
+    assert "must be a number" in check_params("depth_histogram", {"bin_width": "10"})
+    assert "must be a number" in check_params("depth_histogram", {"bin_width": True})
+    assert "must be an integer" in check_params("tile_pyramid", {"max_zoom": 6.5})
+
+def test_check_params_bin_limit(): #histograms that would allocate too many bins are rejected
+    assert "at most 10000" in check_params("depth_histogram", {"bin_width": 1e-9})
+    assert "at most 10000" in check_params("depth_histogram", {"min_depth": -1e9, "max_depth": 1e9})
+    assert "at most 10000" in check_params("gutenberg_richter", {"bin_width": 1e-6})
+    assert "grid cells" in check_params("magnitude_depth_histogram", {"mag_bin_width": 0.01, "depth_bin_width": 0.5})
+    assert "must be positive" in check_params("depth_histogram", {"bin_width": 0})
+    assert check_params("depth_histogram", {"bin_width": 0.1, "min_depth": 0, "max_depth": 700}) is None
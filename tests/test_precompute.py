@@ -0,0 +1,81 @@
+from unittest.mock import patch
+from datetime import datetime
+import sys
+import os
+
+#gets related modules from src directory
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+import precompute
+from precompute import report_windows, plan_reports, find_report
+
+DAYS = [f"2025-03-{day:02d}" for day in range(1, 11)]
+
+def _ms(day, hour=12): #local time, like utils.parse_date_range
+    return datetime.fromisoformat(f"{day} {hour:02d}:00:00").timestamp() * 1000
+
+def test_report_windows(): #one window per day, the last 7 days and the whole range
+    windows = report_windows(DAYS)
+    assert ("2025-03-01", "2025-03-01", ["2025-03-01"]) in windows
+    assert ("2025-03-04", "2025-03-10", DAYS[3:]) in windows
+    assert ("2025-03-01", "2025-03-10", DAYS) in windows
+    assert len(windows) == len(DAYS) + 2
+
+#tests that only reports covering a changed day are queued again
+@patch('precompute.get_dataset_version', return_value='7')
+@patch('precompute.get_jobs_by_ids')
+@patch('precompute.add_jobs')
+@patch('precompute.rd')
+def test_plan_reports_only_changed_days(mock_rd, mock_add_jobs, mock_get_jobs, mock_version):
+    quakes = [(f"q{i}", _ms(day)) for i, day in enumerate(DAYS)]
+    mock_rd.zrange.side_effect = lambda key, *args, **kwargs: (
+        quakes if key == 'earthquakes:by_time' else [(quake_id, 2.0) for quake_id, _ in quakes])
+    previous = precompute.day_fingerprints()
+
+    # one quake on the 2nd changes magnitude
+    mock_rd.zrange.side_effect = lambda key, *args, **kwargs: (
+        quakes if key == 'earthquakes:by_time' else
+        [(quake_id, 5.0 if quake_id == "q1" else 2.0) for quake_id, _ in quakes])
+    mock_rd.hgetall.return_value = previous
+    mock_rd.hmget.side_effect = lambda key, fields: [f"job-{i}" for i in range(len(fields))]
+    mock_get_jobs.side_effect = lambda jids: {jid: {"id": jid, "status": "complete"} for jid in jids}
+    mock_add_jobs.side_effect = lambda specs: [{**spec, "id": f"new-{i}"} for i, spec in enumerate(specs)]
+
+    with patch('precompute.PRECOMPUTE_REPORTS', ['magnitude_distribution']):
+        summary = plan_reports("2025-03-01", "2025-03-10")
+
+    assert summary["changed_days"] == ["2025-03-02"]
+    queued = [(spec["start"], spec["end"]) for spec in mock_add_jobs.call_args[0][0]]
+    #the day itself and the whole range; the last 7 days do not include the 2nd
+    assert queued == [("2025-03-02", "2025-03-02"), ("2025-03-01", "2025-03-10")]
+    assert all(spec["priority"] == "background" for spec in mock_add_jobs.call_args[0][0])
+    mock_rd.pipeline.return_value.set.assert_called_once_with(precompute.PLANNED_VERSION_KEY, '7')
+
+#tests that the registry stays out of the job database, where GET /jobs lists every key
+@patch('precompute.get_dataset_version', return_value='7')
+@patch('precompute.get_jobs_by_ids', return_value={})
+@patch('precompute.add_jobs', side_effect=lambda specs: [{**spec, "id": f"new-{i}"} for i, spec in enumerate(specs)])
+@patch('precompute.rd')
+@patch('jobs.jdb')
+def test_plan_reports_keeps_registry_out_of_job_db(mock_job_db, mock_rd, mock_add_jobs, mock_get_jobs, mock_version):
+    mock_rd.zrange.return_value = [("q1", _ms("2025-03-01"))]
+    mock_rd.hgetall.return_value = {}
+    mock_rd.hmget.side_effect = lambda key, fields: [None] * len(fields)
+
+    plan_reports("2025-03-01", "2025-03-01")
+    registry = mock_rd.pipeline.return_value.hset.call_args_list[0]
+    assert registry.args[0] == precompute.REGISTRY_KEY
+    assert mock_job_db.method_calls == []
+
+#tests that a report is only served once the current dataset has been planned
+@patch('precompute.get_job_by_id', return_value={"id": "job-1", "status": "complete"})
+@patch('precompute.rd')
+def test_find_report(mock_rd, mock_get_job):
+    mock_rd.pipeline.return_value.execute.return_value = ['7', '7', 'job-1']
+    assert find_report("magnitude_distribution", "2025-03-01", "2025-03-01")["id"] == "job-1"
+
+    mock_rd.pipeline.return_value.execute.return_value = ['7', '6', 'job-1']
+    assert find_report("magnitude_distribution", "2025-03-01", "2025-03-01") is None
+
+def test_city_chart_not_precomputed(): #the city chart reads live USGS data, which the fingerprints do not track
+    assert "earthquake_count_by_city" not in precompute.PRECOMPUTE_REPORTS
+    assert find_report("earthquake_count_by_city", "2025-03-01 00:00:00", "2025-03-01 23:59:59") is None
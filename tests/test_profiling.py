@@ -0,0 +1,40 @@
+from flask import Flask, jsonify
+import os
+import sys
+
+#gets related modules from src directory
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+import profiling
+from profiling import init_app
+from request_stats import timed, current
+
+app = Flask(__name__)
+init_app(app)
+
+@app.route('/work')
+def work(): #records a timed section and some fake redis traffic
+    with timed('json'):
+        pass
+    current().redis_commands += 3
+    return jsonify({'ok': True})
+
+def test_server_timing_header():
+    response = app.test_client().get('/work')
+    timing = response.headers['Server-Timing']
+    assert timing.startswith('total;dur=')
+    assert 'redis;dur=0.0;desc="3 cmds"' in timing
+    assert 'json;dur=' in timing
+    assert current() is None  # stats are cleared after the request
+
+def test_profile_on_header(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, 'PROFILE_ALLOW_HEADER', True)
+    monkeypatch.setattr(profiling, 'PROFILE_DIR', str(tmp_path))
+
+    response = app.test_client().get('/work', headers={'X-Profile': '1'})
+    profile_id = response.headers['X-Profile-Id']
+    assert (tmp_path / f"{profile_id}.prof").exists()
+    assert (tmp_path / f"{profile_id}.folded").exists()
+
+def test_profile_header_ignored_by_default():
+    response = app.test_client().get('/work', headers={'X-Profile': '1'})
+    assert 'X-Profile-Id' not in response.headers
@@ -0,0 +1,64 @@
+from unittest.mock import patch, MagicMock
+import os
+import sys
+
+#gets related modules from src directory
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+from quake_cache import QuakeCache
+
+MEMBERS = [('a', 1000.0), ('b', 2000.0), ('c', 3000.0)]
+
+def mock_dataset(mock_rd): #three quakes, one second apart
+    mock_rd.zcard.return_value = len(MEMBERS)
+    mock_rd.zrange.return_value = MEMBERS
+    mock_pipe = MagicMock()
+    mock_pipe.execute.return_value = [[1.0, 2.0, 3.0], [10.0, 20.0, 30.0], [(1, 2), (3, 4), None]]
+    mock_rd.pipeline.return_value = mock_pipe
+
+@patch('quake_cache.get_dataset_version', return_value='1')
+@patch('quake_cache.rd') #creates mock redis object for test
+def test_cache_range_lookup(mock_rd, mock_version):
+    mock_dataset(mock_rd)
+    cache = QuakeCache(max_bytes=2**20)
+    cache.enabled = True
+
+    result = cache.range(1500, 3000, fields=('mag', 'depth'))
+    assert list(result['ids']) == ['b', 'c']
+    assert result['mag'].tolist() == [2.0, 3.0]
+    assert result['depth'].tolist() == [20.0, 30.0]
+
+    # served from memory until the dataset version changes
+    cache.range(0, 5000)
+    assert mock_rd.zrange.call_count == 1
+    mock_version.return_value = '2'
+    cache.range(0, 5000)
+    assert mock_rd.zrange.call_count == 2
+
+#tests that a version change is seen even when its pub/sub message was missed
+@patch('quake_cache.get_dataset_version', return_value='1')
+@patch('quake_cache.rd') #creates mock redis object for test
+def test_cache_reloads_on_version_with_live_listener(mock_rd, mock_version):
+    mock_dataset(mock_rd)
+    cache = QuakeCache(max_bytes=2**20)
+    cache.enabled = True
+    cache._listener = MagicMock(is_alive=MagicMock(return_value=True))
+
+    cache.range(0, 5000)
+    mock_version.return_value = '2'  # no event arrives
+    cache.range(0, 5000)
+    assert mock_rd.zrange.call_count == 2
+    assert cache.stats()['version'] == '2'
+
+@patch('quake_cache.get_dataset_version', return_value='1')
+@patch('quake_cache.rd') #creates mock redis object for test
+def test_cache_over_cap_falls_back(mock_rd, mock_version):
+    mock_dataset(mock_rd)
+    cache = QuakeCache(max_bytes=10)
+    cache.enabled = True
+
+    assert cache.range(0, 5000) is None
+    assert cache.stats()['over_cap'] is True
+    mock_rd.zrange.assert_not_called()
+
+def test_disabled_cache_returns_none():
+    assert QuakeCache(max_bytes=2**20).range(0, 5000) is None
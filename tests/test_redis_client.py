@@ -0,0 +1,43 @@
+import pytest
+from unittest.mock import patch
+import os
+import sys
+
+#gets related modules from src directory
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+import redis_client
+from redis_client import pool_stats
+
+#tests that pool usage is counted without redis-py's private pool attributes
+@patch('redis_client.InstrumentedConnection.can_read', return_value=False)
+@patch('redis_client.InstrumentedConnection.connect')
+def test_pool_stats(mock_connect, mock_can_read):
+    pool = redis_client._pool('test', 'localhost', 6379, 0)
+    try:
+        first = pool.get_connection('GET')
+        second = pool.get_connection('GET')
+        pool.release(first)
+        assert pool_stats()['test'] == {'max_connections': pool.max_connections, 'created': 2, 'in_use': 1, 'idle': 1}
+
+        #a connection that fails to connect is not counted as in use
+        pool.release(second)
+        mock_connect.side_effect = ConnectionError("refused")
+        pool.reset()
+        with pytest.raises(ConnectionError):
+            pool.get_connection('GET')
+        assert pool_stats()['test']['in_use'] == 0
+    finally:
+        del redis_client.POOLS['test']
+
+#tests that a full pool makes the caller wait for a free connection instead of failing at once
+@patch('redis_client.InstrumentedConnection.can_read', return_value=False)
+@patch('redis_client.InstrumentedConnection.connect')
+def test_full_pool_waits(mock_connect, mock_can_read):
+    import threading
+    pool = redis_client._pool('test', 'localhost', 6379, 0, max_connections=1)
+    try:
+        held = pool.get_connection('GET')
+        threading.Timer(0.1, pool.release, [held]).start()
+        assert pool.get_connection('GET') is held
+    finally:
+        del redis_client.POOLS['test']
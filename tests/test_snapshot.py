@@ -0,0 +1,54 @@
+import json
+from unittest.mock import patch, MagicMock
+import os
+import sys
+
+#gets related modules from src directory
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+from snapshot import export_snapshot, import_snapshot
+from codec import DocumentEncoder, decode_text
+
+MOCK_FEATURES = {
+    "earthquake:1": json.dumps({
+        "id": "1",
+        "properties": {"mag": 1.7, "time": 1740959984000, "magType": "ml"},
+        "geometry": {"coordinates": [-148.4734, 69.1513, 0.6]}
+    }),
+    "earthquake:2": json.dumps({
+        "id": "2",
+        "properties": {"mag": 3.2, "time": 1740959985000, "magType": "mb"},
+        "geometry": {"coordinates": [-120.1234, 35.6789, 10.0]}
+    }),
+}
+
+@patch('snapshot.schedule_precompute')
+@patch('snapshot.document_encoder', return_value=DocumentEncoder(None))
+@patch('snapshot.bump_dataset_version')
+@patch('snapshot.rd_bin')
+@patch('snapshot.rd') #creates mock redis object for test
+def test_snapshot_round_trip(mock_rd, mock_rd_bin, mock_bump, mock_encoder, mock_precompute, tmp_path):
+    prefix = str(tmp_path / "quakes")
+    mock_rd.zcard.return_value = 2
+    mock_rd.zrange.return_value = ['1', '2']
+    mock_rd_bin.mget.side_effect = lambda keys: [MOCK_FEATURES.get(key).encode() for key in keys]
+
+    assert export_snapshot(prefix) == 2
+
+    mock_pipe = MagicMock()
+    mock_rd.pipeline.return_value = mock_pipe
+
+    assert import_snapshot(prefix) == 2
+
+    # raw documents are written back byte for byte, after decompression
+    stored = {c.args[0]: decode_text(c.args[1]) for c in mock_pipe.set.call_args_list}
+    assert stored["earthquake:1"] == MOCK_FEATURES["earthquake:1"]
+    assert stored["earthquake:2"] == MOCK_FEATURES["earthquake:2"]
+    assert len(json.loads(stored['earthquakes:raw_data'])) == 2
+
+    # indexes are rebuilt from the columns
+    mock_pipe.zadd.assert_any_call('earthquakes:by_mag', {'2': 3.2})
+    mock_pipe.zadd.assert_any_call('earthquakes:by_time', {'1': 1740959984000})
+    mock_pipe.geoadd.assert_any_call('earthquakes:geo', (-120.1234, 35.6789, '2'))
+    mock_pipe.execute.assert_called()
+    mock_bump.assert_called_once()
+    mock_precompute.assert_called_once()
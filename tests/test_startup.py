@@ -0,0 +1,16 @@
+import subprocess
+import sys
+import os
+
+SRC_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '../src'))
+
+def loaded_modules(module): #imports a module in a fresh interpreter
+    probe = f"import sys, {module}; print(' '.join(sys.modules))"
+    out = subprocess.run([sys.executable, '-c', probe], cwd=SRC_DIR, capture_output=True,
+                         text=True, check=True, env=dict(os.environ, PYTHONPATH=SRC_DIR))
+    return set(out.stdout.split())
+
+def test_api_import_skips_rendering_modules(): #catches regressions in API cold start
+    modules = loaded_modules('api')
+    for heavy in ['matplotlib', 'numpy', 'geopy', 'PIL']:
+        assert heavy not in modules
@@ -56,7 +56,7 @@ MOCK_JOB_DATA = {
 MOCK_RESULTS_BYTES = b"mock_image_data"
 MOCK_RESULTS_JSON = {"key":"value"}
 
-@patch('utils.rd') #creates mock utils object for test
+@patch('utils.rd_bin') #creates mock utils object for test
 def test_calculate_stats(mock_rd):
     mock_rd.get.side_effect = lambda key: MOCK_EARTHQUAKE_DATA.get(key)
 
@@ -68,3 +68,95 @@ def test_calculate_stats(mock_rd):
     assert result['max_depth'] == 10.0
     assert result['min_depth'] == 0.6
     assert result['magtype_counts'] == {'ml': 1, 'mb': 2}
+
+def test_select_overlapping():
+    from worker import _select_overlapping
+    lead = {"id": "lead", "type": "magnitude_distribution"}
+    candidates = [
+        ("e1", {"id": "1", "type": "magnitude_distribution"}, (50, 150)),  #overlaps the lead
+        ("e2", {"id": "2", "type": "magnitude_distribution"}, (140, 200)), #overlaps only after e1 widens the range
+        ("e3", {"id": "3", "type": "depth_histogram"}, (0, 100)),          #other job type
+        ("e4", {"id": "4", "type": "magnitude_distribution"}, (500, 600)), #disjoint
+    ]
+
+    chosen = _select_overlapping(lead, (0, 100), candidates, limit=10)
+    assert [c[0] for c in chosen] == ["e1", "e2"]
+
+    #limit caps how many jobs are claimed
+    assert len(_select_overlapping(lead, (0, 100), candidates, limit=1)) == 1
+
+def test_lane_scheduler_weights():
+    from worker import LaneScheduler
+    queued = {"interactive": ["i"] * 20, "bulk": ["b"] * 20, "background": []}
+
+    def lpop(key):
+        lane = key.split(":")[-1] if key.count(":") > 1 else "interactive"
+        return queued[lane].pop(0).encode() if queued[lane] else None
+
+    with patch('worker.qdb') as mock_qdb, patch('worker.lanes') as mock_lanes:
+        mock_lanes.__getitem__.side_effect = lambda lane: MagicMock(
+            key="hotqueue:queue" if lane == "interactive" else f"hotqueue:queue:{lane}",
+            serializer=MagicMock(loads=lambda entry: entry.decode()))
+        mock_qdb.lpop.side_effect = lpop
+        scheduler = LaneScheduler({"interactive": 3, "bulk": 1, "background": 1})
+        picked = [scheduler.next_job()[0] for _ in range(8)]
+
+    #both backlogged lanes are served in proportion to their weights
+    assert picked.count("interactive") == 6
+    assert picked.count("bulk") == 2
+
+def test_job_params_match_handlers(): #the API's params table must follow the handler signatures
+    import inspect
+    from jobs import JOB_PARAMS, BINNED_AXES
+    from worker import JOB_HANDLERS
+    from precompute import PLAN_JOB_TYPE
+    assert set(JOB_PARAMS) == set(JOB_HANDLERS) - {PLAN_JOB_TYPE}
+    for job_type, accepted in JOB_PARAMS.items():
+        arguments = inspect.signature(JOB_HANDLERS[job_type]).parameters
+        assert set(accepted) == set(arguments) - {"start_date", "end_date", "fmt"}, job_type
+    for job_type, axes in BINNED_AXES.items():
+        arguments = inspect.signature(JOB_HANDLERS[job_type]).parameters
+        for width_name, default_width, *_ in axes:
+            assert arguments[width_name].default == default_width, job_type
+
+#tests that the latest-pyramid pointer stays out of the results database, where every key is a result hash
+def test_store_tile_result_pointer():
+    from worker import _store_result
+    from utils import LATEST_TILES_KEY
+    with patch('worker.res') as mock_res, patch('worker.rd') as mock_rd:
+        _store_result("job-1", {"zooms": [0], "tiles": {"0/0/0": {"count": 1}}})
+    mock_rd.set.assert_called_once_with(LATEST_TILES_KEY, "job-1")
+    mock_res.set.assert_not_called()
+    assert "tile:0/0/0" in mock_res.hset.call_args.kwargs["mapping"]
+
+#tests that a cancel signal arriving while the guard cleans up is ignored and the handlers are restored
+def test_job_guard_ignores_late_cancel():
+    import signal
+    import threading
+    from worker import job_guard
+    setitimer = signal.setitimer
+
+    def late_cancel(which, seconds): #the watcher fires just as the deadline is cleared
+        setitimer(which, seconds)
+        if seconds == 0:
+            signal.pthread_kill(threading.main_thread().ident, signal.SIGUSR1)
+
+    previous = signal.getsignal(signal.SIGUSR1)
+    with patch('worker.is_cancel_requested', return_value=False), patch('signal.setitimer', late_cancel):
+        with job_guard("job-1", 60):
+            pass
+    assert signal.getsignal(signal.SIGUSR1) is previous
+    assert signal.getitimer(signal.ITIMER_REAL) == (0.0, 0.0)
+
+#tests that the fetch of a coalesced batch runs under every merged job's deadline, not just the lead's
+def test_coalesced_deadline_scales_with_batch():
+    from worker import _run_coalesced, job_deadline
+    batch = [({"id": f"job-{i}", "start": "2025-03-01", "end": "2025-03-02"}, (i, i + 10)) for i in range(4)]
+    with patch('worker.update_job_status'), patch('worker.record_queue_wait'), \
+            patch('worker.is_cancel_requested', return_value=False), \
+            patch('worker._run_guarded') as mock_run:
+        _run_coalesced(batch)
+
+    deadlines = [call.args[1] for call in mock_run.call_args_list]
+    assert deadlines[0] == 4 * job_deadline('magnitude_distribution')
+    assert deadlines[1:] == [job_deadline('magnitude_distribution')] * 3